@@ -8,9 +8,25 @@ this demo project.
 
 from __future__ import annotations
 
-import random
-from dataclasses import dataclass
-from typing import Any, Dict, Iterable, List
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from . import datasets, peer, similarity, tracing
+from .adaptive import SequentialStopper, StoppingRule
+from .analytics import AnalyticsEngine, ResultMatrix, correlate
+from .cache import AnswerCache
+from .engine import AnswerCallback, ExecutionEngine, PriorAnswers
+from .limits import LimiterRegistry, ModelLimiter, RateLimitError, estimate_tokens
+from .resilience import BreakerRegistry, CircuitBreaker
+from .results import ColumnarResult
 
 
 @dataclass
@@ -27,12 +43,22 @@ class ModelAgent:
         Number of attempts for the ``ask`` call.
     response_format: str
         Expected answer format ("letter", etc.).
+    limiter: ModelLimiter, optional
+        Rate and concurrency limiter applied to every call by the engine.
+    breaker: CircuitBreaker, optional
+        Makes the engine fail calls fast while the model keeps failing.
     """
 
     model_id: int
     name: str
     max_retries: int = 2
     response_format: str = "letter"
+    limiter: Optional[ModelLimiter] = field(default=None, repr=False, compare=False)
+    breaker: Optional[CircuitBreaker] = field(default=None, repr=False, compare=False)
+
+    # Subclasses with a native batch endpoint override ``ask_batch`` and set
+    # this so the engine groups their calls into micro-batches.
+    supports_batch = False
 
     def ask(self, question: str, options: Iterable[str]) -> str:
         """Return an answer to ``question``.
@@ -44,66 +70,270 @@ class ModelAgent:
         # The simplistic policy used for testing.
         return next(iter(options))
 
+    def ask_batch(self, batch: List[Tuple[str, List[str]]]) -> List[Optional[Any]]:
+        """Answer several ``(question, options)`` pairs in one call.
+
+        Returns one entry per pair, in order.  An entry that is ``None`` or an
+        exception marks a question the call could not answer; it is retried
+        on its own.  The default implementation simply calls :meth:`ask`.
+        """
+
+        answers: List[Optional[Any]] = []
+        for question, options in batch:
+            try:
+                answers.append(self.ask(question, options))
+            except Exception as exc:
+                answers.append(exc)
+        return answers
+
+    def estimate_tokens(self, question: str, options: Iterable[str]) -> int:
+        """Tokens one call is expected to use, charged to the token bucket."""
+
+        return estimate_tokens(question, options)
+
+    def replica(self) -> "ModelAgent":
+        """Agent that answers a hedged duplicate of a slow call.
+
+        The same agent by default: the duplicate request usually reaches
+        another replica behind the provider's load balancer.
+        """
+
+        return self
+
+    def cache_identity(self) -> Dict[str, Any]:
+        """Settings that influence answers; part of every answer cache key."""
+
+        return {
+            "model_id": self.model_id,
+            "name": self.name,
+            "response_format": self.response_format,
+        }
+
 
 @dataclass
 class EvaluationAgent:
-    """Orchestrates the evaluation process across models."""
+    """Orchestrates the evaluation process across models.
+
+    Model calls are executed concurrently by :class:`ExecutionEngine`;
+    ``max_concurrency`` bounds the calls in flight across all models and
+    ``per_model_concurrency`` bounds them for each model.  ``timeout`` applies
+    to every individual ``ask`` attempt.  With a ``cache`` previously seen
+    questions are answered without calling the model unless ``bypass_cache``
+    is set.  Failed attempts are retried after a jittered exponential backoff
+    of ``retry_backoff`` seconds (capped at ``retry_backoff_max``); throttled
+    ones up to ``throttle_retries`` extra times.  Models that support
+    ``ask_batch`` receive micro-batches of up to ``max_batch_size`` questions,
+    each waiting at most ``max_batch_wait`` seconds to fill.  The blocking
+    calls run on threads named after ``thread_name_prefix``.  Single calls
+    slower than the ``hedge_percentile`` of a model's latencies get a hedged
+    duplicate (``0`` disables hedging), and models with a ``breaker`` fail
+    fast while it is open.
+
+    With ``mode="peer"`` every model additionally grades the answers of all
+    models (see :mod:`backend.agents.peer`); the grader × gradee matrix is
+    returned under ``extra["peer"]`` of the result.  With ``mode="adaptive"``
+    each model stops answering the questions of a KU once ``stopping`` (see
+    :mod:`backend.agents.adaptive`) is met; the criteria, the per-KU
+    intervals and the calls saved are returned under ``extra["adaptive"]``.
+    Any other mode asks every pair.
+    """
 
     models: List[ModelAgent]
     timeout: int = 30
-    mode: str = "peer"
+    mode: str = "parallel"
+    max_concurrency: int = 16
+    per_model_concurrency: int = 4
+    cache: Optional[AnswerCache] = None
+    bypass_cache: bool = False
+    retry_backoff: float = 0.5
+    retry_backoff_max: float = 30.0
+    throttle_retries: int = 8
+    max_batch_size: int = 8
+    max_batch_wait: float = 0.01
+    thread_name_prefix: str = "eval"
+    stopping: Optional[StoppingRule] = None
+    hedge_percentile: float = 0
+    hedge_min_samples: int = 20
 
-    def evaluate(self, questions: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
-        """Run an evaluation over ``questions`` using the configured models."""
+    def evaluate(
+        self,
+        questions: Iterable[Dict[str, Any]],
+        on_answer: Optional[AnswerCallback] = None,
+        cancel_event: Optional[threading.Event] = None,
+        prior: Optional[PriorAnswers] = None,
+    ) -> Dict[str, Any]:
+        """Run an evaluation over ``questions`` using the configured models.
 
-        model_stats: Dict[int, Dict[str, Any]] = {
-            m.model_id: {"correct": 0, "total": 0, "name": m.name}
-            for m in self.models
-        }
-        question_results: List[Dict[str, Any]] = []
-
-        for q in questions:
-            q_res = {"id": q["id"], "answers": {}, "correct": q["correct"]}
-            for m in self.models:
-                answer = m.ask(q["text"], q["options"])
-                q_res["answers"][m.model_id] = answer
-                model_stats[m.model_id]["total"] += 1
-                if answer == q["correct"]:
-                    model_stats[m.model_id]["correct"] += 1
-            question_results.append(q_res)
-
-        model_results = []
-        for mid, stats in model_stats.items():
-            total = stats["total"] or 1
-            accuracy = stats["correct"] / total
-            model_results.append(
-                {
-                    "id": mid,
-                    "name": stats["name"],
-                    "correct": stats["correct"],
-                    "total": total,
-                    "accuracy": accuracy,
-                }
-            )
-
-        return {"models": model_results, "questions": question_results}
+        ``on_answer`` receives progress notifications and ``cancel_event``
+        stops the run early.  ``prior`` holds answers from a checkpoint or an
+        earlier run, keyed by ``(model_id, question_id)``; only the remaining
+        pairs are asked.  See :class:`ExecutionEngine`.
+        """
+
+        return self.evaluate_columnar(questions, on_answer, cancel_event, prior).to_dict()
+
+    def evaluate_columnar(
+        self,
+        questions: Iterable[Dict[str, Any]],
+        on_answer: Optional[AnswerCallback] = None,
+        cancel_event: Optional[threading.Event] = None,
+        prior: Optional[PriorAnswers] = None,
+    ) -> ColumnarResult:
+        """Like :meth:`evaluate` but return the compact :class:`ColumnarResult`."""
+
+        return asyncio.run(self.evaluate_async(questions, on_answer, cancel_event, prior))
+
+    async def evaluate_async(
+        self,
+        questions: Iterable[Dict[str, Any]],
+        on_answer: Optional[AnswerCallback] = None,
+        cancel_event: Optional[threading.Event] = None,
+        prior: Optional[PriorAnswers] = None,
+    ) -> ColumnarResult:
+        """Asynchronous variant of :meth:`evaluate_columnar`."""
+
+        engine = ExecutionEngine(
+            max_concurrency=self.max_concurrency,
+            per_model_concurrency=self.per_model_concurrency,
+            timeout=self.timeout,
+            on_answer=on_answer,
+            cancel_event=cancel_event,
+            cache=self.cache,
+            read_cache=not self.bypass_cache,
+            retry_backoff=self.retry_backoff,
+            retry_backoff_max=self.retry_backoff_max,
+            throttle_retries=self.throttle_retries,
+            max_batch_size=self.max_batch_size,
+            max_batch_wait=self.max_batch_wait,
+            thread_name_prefix=self.thread_name_prefix,
+            hedge_percentile=self.hedge_percentile,
+            hedge_min_samples=self.hedge_min_samples,
+        )
+        stopper = SequentialStopper(self.stopping) if self.mode == "adaptive" else None
+        result = await engine.run(self.models, list(questions), prior, schedule=stopper)
+        if stopper is not None:
+            result.extra["adaptive"] = stopper.summary()
+        cancelled = cancel_event is not None and cancel_event.is_set()
+        if self.mode == "peer" and len(self.models) > 1 and not cancelled:
+            with tracing.span("peer_grading") as span:
+                result.extra["peer"] = await self._grade(engine, result)
+                span.set(items=result.extra["peer"]["items"])
+        return result
+
+    async def _grade(self, engine: ExecutionEngine, result: ColumnarResult) -> Dict[str, Any]:
+        """Let every model grade the distinct answers in ``result``."""
+
+        items, index = peer.grading_items(result)
+        # Grader calls share the limits, cache and batching of the answer
+        # pass but are not answers of the evaluation.
+        grades = await replace(engine, on_answer=None, count_answers=False).run(self.models, items)
+        matrix = peer.peer_matrix(result, grades, index)
+        if "cache" in grades.extra:
+            matrix["cache"] = grades.extra["cache"]
+        return matrix
 
 
 @dataclass
 class QuestionCurationAgent:
-    """Provides basic question review utilities."""
+    """Reviews questions for near duplicates in the bank.
+
+    The agent keeps a :class:`~backend.agents.similarity.MinHashIndex` over
+    the text and options of the bank's questions; fill it with :meth:`load`
+    and keep it current with :meth:`add` and :meth:`remove`.  Questions whose
+    estimated Jaccard similarity reaches ``threshold`` are near duplicates.
+    """
+
+    threshold: float = 0.8
+    index: similarity.MinHashIndex = field(init=False, repr=False)
+    loaded: bool = field(default=False, init=False)
+
+    def __post_init__(self) -> None:
+        self.index = similarity.MinHashIndex(self.threshold)
+        self._clusters: Dict[Optional[float], Tuple[int, List[List[int]]]] = {}
+        self._version = 0
+
+    @staticmethod
+    def signature(question: Dict[str, Any]) -> Any:
+        return similarity.signature(question.get("text") or "", question.get("options") or ())
+
+    def load(self, questions: Iterable[Dict[str, Any]]) -> None:
+        """Rebuild the index from every question of the bank."""
+
+        self.index.clear()
+        batch: List[Dict[str, Any]] = []
+        for question in questions:
+            batch.append(question)
+            if len(batch) >= 1000:
+                self._add_batch(batch)
+                batch = []
+        self._add_batch(batch)
+        self.loaded = True
+
+    def _add_batch(self, questions: List[Dict[str, Any]]) -> None:
+        sigs = similarity.signatures((q.get("text") or "", q.get("options") or ()) for q in questions)
+        for question, sig in zip(questions, sigs):
+            self.add(question, sig)
+
+    def add(self, question: Dict[str, Any], signature: Any = None) -> None:
+        """Index ``question`` (with its ``id``), reusing a computed ``signature``."""
+
+        self.index.add(question["id"], signature if signature is not None else self.signature(question))
+        self._version += 1
+
+    def remove(self, question_id: int) -> None:
+        self.index.remove(question_id)
+        self._version += 1
+
+    def similar(self, question: Dict[str, Any], threshold: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Indexed questions similar to ``question``, most similar first."""
+
+        matches = self.index.query(self.signature(question), threshold, exclude=question.get("id"))
+        return [{"id": key, "similarity": score} for key, score in matches]
 
     def review(self, question: Dict[str, Any]) -> Dict[str, Any]:
-        """Return a trivial review result."""
-        return {"id": question.get("id"), "status": "ok"}
+        """Flag ``question`` as ``"duplicate"`` when the bank holds near duplicates of it."""
+
+        duplicates = self.similar(question)
+        return {
+            "id": question.get("id"),
+            "status": "duplicate" if duplicates else "ok",
+            "duplicates": duplicates,
+        }
+
+    def clusters(self, threshold: Optional[float] = None) -> List[List[int]]:
+        """Sorted id lists of the near-duplicate groups in the bank.
+
+        The result is cached until the index changes.
+        """
+
+        cached = self._clusters.get(threshold)
+        if cached is not None and cached[0] == self._version:
+            return cached[1]
+        version = self._version
+        clusters = self.index.clusters(threshold)
+        self._clusters[threshold] = (version, clusters)
+        return clusters
+
+    def redundant_ids(self, threshold: Optional[float] = None) -> Set[int]:
+        """Ids of every clustered question except the oldest of its cluster."""
+
+        return {qid for cluster in self.clusters(threshold) for qid in cluster[1:]}
 
 
 @dataclass
 class AnalyticsAgent:
-    """Performs simple analytics on evaluation results."""
+    """Performs analytics on evaluation results.
+
+    :meth:`summary` gives a quick overview from the per-model accuracies while
+    :meth:`analyze` runs the full :class:`~backend.agents.analytics.AnalyticsEngine`
+    (per-KU scores, confidence intervals, ANOVA, agreement and correlation).
+    """
 
     enable_anova: bool = True
     export_format: str = "csv"
+    bootstrap_samples: int = 1000
+    confidence: float = 0.95
+    seed: Optional[int] = None
 
     def summary(self, evaluation_result: Dict[str, Any]) -> Dict[str, Any]:
         models = evaluation_result.get("models", [])
@@ -112,17 +342,131 @@ class AnalyticsAgent:
         )
         return {"model_count": len(models), "average_accuracy": average_accuracy}
 
+    def analyze(self, evaluation_result: Union[Dict[str, Any], ColumnarResult]) -> Dict[str, Any]:
+        """Return the detailed statistics for ``evaluation_result``."""
+
+        engine = AnalyticsEngine(
+            bootstrap_samples=self.bootstrap_samples,
+            confidence=self.confidence,
+            enable_anova=self.enable_anova,
+            seed=self.seed,
+        )
+        if isinstance(evaluation_result, ColumnarResult):
+            matrix = evaluation_result.to_matrix()
+        else:
+            matrix = ResultMatrix.from_result(evaluation_result)
+        return engine.analyze(matrix)
+
 
 @dataclass
 class BenchmarkAgent:
-    """Runs external benchmarks for a model."""
+    """Runs local benchmark datasets against a model.
+
+    The dataset (see :mod:`backend.agents.datasets`) is split into byte-range
+    shards of about ``shard_bytes`` that run on a pool of ``processes``
+    worker processes (all cores by default; ``1`` runs in this process).
+    Each worker streams its shard and answers it in chunks of ``chunk_size``
+    items with up to ``max_concurrency`` calls in flight.  With a
+    ``checkpoint_dir`` every shard saves its progress after each chunk, so
+    running the same dataset against the same model again resumes an
+    interrupted run; the checkpoints are removed once it completes.
+
+    Workers receive a copy of the model without its limiter, so provider
+    rate limits are not enforced across processes.
+    """
+
+    processes: Optional[int] = None
+    shard_bytes: int = 1 << 20
+    chunk_size: int = 256
+    max_concurrency: int = 4
+    timeout: float = 30
+    checkpoint_dir: Optional[str] = None
+
+    def run(self, model: ModelAgent, dataset: str) -> Dict[str, Any]:
+        """Score ``model`` on the JSONL file ``dataset``.
+
+        ``benchmark_score`` is the chance-normalized accuracy
+        ``(accuracy - chance) / (1 - chance)``: 0 for guessing, 1 for a
+        perfect score, whatever the number of options per item.
+        """
+
+        started = time.perf_counter()
+        ranges = datasets.shard_ranges(dataset, self.shard_bytes)
+        checkpoints = self._checkpoints(model, dataset, len(ranges))
+        processes = max(1, min(self.processes or os.cpu_count() or 1, len(ranges)))
+        worker = datasets.portable(model) if processes > 1 else model
+        calls = [
+            (worker, dataset, start, end, checkpoints[i] if checkpoints else None,
+             self.chunk_size, self.max_concurrency, self.timeout)
+            for i, (start, end) in enumerate(ranges)
+        ]
+        total = datasets.ShardProgress(start=0, end=0, offset=0)
+        if processes == 1:
+            for args in calls:
+                total.merge(datasets.run_shard(*args))
+        else:
+            with ProcessPoolExecutor(max_workers=processes) as pool:
+                futures = [pool.submit(datasets.run_shard, *args) for args in calls]
+                for future in as_completed(futures):
+                    total.merge(future.result())
+        if checkpoints:
+            shutil.rmtree(os.path.dirname(checkpoints[0]), ignore_errors=True)
+
+        accuracy = total.correct / total.items if total.items else 0.0
+        chance = total.chance / total.items if total.items else 0.0
+        score = (accuracy - chance) / (1.0 - chance) if chance < 1.0 else 0.0
+        elapsed = time.perf_counter() - started
+        return {
+            "model_id": model.model_id,
+            "items": total.items,
+            "correct": total.correct,
+            "errors": total.errors,
+            "skipped": total.skipped,
+            "accuracy": accuracy,
+            "chance": chance,
+            "benchmark_score": score,
+            "shards": len(ranges),
+            "processes": processes,
+            "seconds": elapsed,
+            "items_per_second": total.items / elapsed if elapsed > 0 else 0.0,
+        }
+
+    def _checkpoints(self, model: ModelAgent, dataset: str, shards: int) -> Optional[List[str]]:
+        if not self.checkpoint_dir:
+            return None
+        stat = os.stat(dataset)
+        key = json.dumps(
+            [os.path.abspath(dataset), stat.st_size, stat.st_mtime_ns, shards, model.cache_identity()],
+            sort_keys=True,
+            default=str,
+        )
+        directory = os.path.join(self.checkpoint_dir, hashlib.sha1(key.encode()).hexdigest()[:16])
+        os.makedirs(directory, exist_ok=True)
+        return [os.path.join(directory, f"shard-{i:05d}.json") for i in range(shards)]
+
+    @staticmethod
+    def correlate(
+        benchmark_scores: Dict[int, float], mcq_accuracy: Dict[int, float]
+    ) -> Dict[str, Any]:
+        """Correlation of benchmark scores with MCQ accuracy across models."""
 
-    def run(self, model: ModelAgent) -> Dict[str, Any]:
-        # Placeholder benchmark run producing a random score
-        return {"model_id": model.model_id, "benchmark_score": random.random()}
+        return correlate(benchmark_scores, mcq_accuracy)
 
 
 __all__ = [
+    "AnalyticsEngine",
+    "AnswerCache",
+    "BreakerRegistry",
+    "CircuitBreaker",
+    "ColumnarResult",
+    "ExecutionEngine",
+    "LimiterRegistry",
+    "ModelLimiter",
+    "PriorAnswers",
+    "RateLimitError",
+    "ResultMatrix",
+    "SequentialStopper",
+    "StoppingRule",
     "ModelAgent",
     "EvaluationAgent",
     "QuestionCurationAgent",
@@ -0,0 +1,330 @@
+"""Model adapters that reach real inference backends.
+
+Adapters are :class:`~backend.agents.ModelAgent` subclasses registered under
+a ``Model.type`` value:
+
+``local``
+    The built-in demo agent (answers with the first option).
+``openai``
+    OpenAI-compatible ``/chat/completions`` endpoints.
+``tgi``
+    HuggingFace text-generation-inference style ``/generate`` endpoints.
+``http``
+    A generic JSON API: ``POST {base_url}/answer`` with the question and
+    options, and ``POST {base_url}/answer/batch`` for batches.
+
+Every HTTP adapter uses one process-wide ``httpx.Client`` with a keep-alive
+connection pool (and HTTP/2 when the ``h2`` package is installed), so calls
+reuse connections instead of paying TCP and TLS setup each time.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import string
+import threading
+import time
+from dataclasses import dataclass, field, replace
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Type
+
+import httpx
+
+from . import ModelAgent
+from .limits import RateLimitError
+
+ADAPTERS: Dict[str, Type[ModelAgent]] = {}
+
+_client: Optional[httpx.Client] = None
+_client_lock = threading.Lock()
+_http_config: Dict[str, Any] = {}
+
+# A bare letter or a letter followed by ")", "." or ":" and whitespace:
+# "B", "B.", "(b)", "B) Paris", "B: Paris" -- but not "I think" or "A lot".
+_LETTER = re.compile(r"^\(?([A-Za-z])(?:[).:](?:\s|$)|$)")
+
+
+def register_adapter(model_type: str) -> Callable[[Type[ModelAgent]], Type[ModelAgent]]:
+    """Class decorator registering an adapter for ``Model.type == model_type``."""
+
+    def decorator(cls: Type[ModelAgent]) -> Type[ModelAgent]:
+        ADAPTERS[model_type] = cls
+        return cls
+
+    return decorator
+
+
+def create_agent(model_type: str, **settings: Any) -> ModelAgent:
+    """Instantiate the adapter for ``model_type``.
+
+    Settings the adapter does not know (e.g. ``api_key`` for ``local``) are
+    ignored, so callers can pass every column of the ``Model`` record.
+    """
+
+    try:
+        cls = ADAPTERS[model_type]
+    except KeyError:
+        raise ValueError(f"Unknown model type '{model_type}'") from None
+    fields = cls.__dataclass_fields__
+    return cls(**{k: v for k, v in settings.items() if k in fields and v is not None})
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def configure_http(cfg: Dict[str, Any]) -> None:
+    """Set the options of the shared client (the ``http`` config section).
+
+    Takes effect for the next client created; call :func:`close_http_client`
+    to apply it to a running process.
+    """
+
+    _http_config.clear()
+    _http_config.update(cfg)
+
+
+def http_client() -> httpx.Client:
+    """Return the shared, lazily created HTTP client."""
+
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                cfg = _http_config
+                _client = httpx.Client(
+                    http2=cfg.get("http2", True) and _http2_available(),
+                    limits=httpx.Limits(
+                        max_connections=cfg.get("max_connections", 100),
+                        max_keepalive_connections=cfg.get("max_keepalive_connections", 20),
+                        keepalive_expiry=cfg.get("keepalive_expiry", 30.0),
+                    ),
+                    timeout=httpx.Timeout(
+                        cfg.get("timeout", 30.0), connect=cfg.get("connect_timeout", 5.0)
+                    ),
+                )
+    return _client
+
+
+def close_http_client() -> None:
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
+def _forget_client() -> None:
+    # A forked child (e.g. a benchmark worker) must not share the parent's
+    # connections; it builds its own client on first use.
+    global _client, _client_lock
+    _client = None
+    _client_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_forget_client)
+
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    try:
+        return float(response.headers["retry-after"])
+    except (KeyError, ValueError):
+        return None
+
+
+def format_prompt(question: str, options: Iterable[str]) -> str:
+    """Multiple-choice prompt asking for the letter of the answer."""
+
+    lines = [question, ""]
+    lines += [f"{letter}. {option}" for letter, option in zip(string.ascii_uppercase, options)]
+    lines += ["", "Answer with the letter of the correct option only."]
+    return "\n".join(lines)
+
+
+def parse_answer(text: Optional[str], options: List[str]) -> Optional[str]:
+    """Map a model reply to one of ``options``.
+
+    Accepts a letter, bare or followed by ``)``, ``.`` or ``:`` (``"B"``,
+    ``"B."``, ``"(b)"``, ``"B) Paris"``), or the option text itself; other
+    replies are returned stripped so they are kept as given.
+    """
+
+    if text is None:
+        return None
+    reply = text.strip()
+    if reply in options:
+        return reply
+    match = _LETTER.match(reply)
+    if match:
+        index = string.ascii_uppercase.index(match.group(1).upper())
+        if index < len(options):
+            return options[index]
+    for option in options:
+        if reply.casefold() == option.casefold():
+            return option
+    return reply or None
+
+
+register_adapter("local")(ModelAgent)
+
+
+@dataclass
+class HTTPModelAgent(ModelAgent):
+    """Base class for adapters talking JSON over HTTP.
+
+    Parameters
+    ----------
+    base_url: str
+        Root URL of the backend.
+    api_key: str, optional
+        Sent as a bearer token.
+    model_name: str, optional
+        Provider-side model name.
+    client: httpx.Client, optional
+        Client to use instead of the shared pool (mainly for tests).
+    replica_urls: list of str
+        Alternate root URLs serving the same model; hedged duplicates of
+        slow calls go to them in turn.
+    """
+
+    base_url: str = ""
+    api_key: Optional[str] = field(default=None, repr=False)
+    model_name: Optional[str] = None
+    client: Optional[httpx.Client] = field(default=None, repr=False, compare=False)
+    replica_urls: List[str] = field(default_factory=list)
+    _hedges: int = field(default=0, init=False, repr=False, compare=False)
+
+    def _headers(self) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+
+    def _post(self, path: str, payload: Dict[str, Any]) -> Any:
+        client = self.client or http_client()
+        url = self.base_url.rstrip("/") + path
+        response = client.post(url, json=payload, headers=self._headers())
+        # A 503 only signals throttling when it says when to come back; a
+        # plain 503 is an outage and counts against the breaker.
+        retry_after = _retry_after(response)
+        if response.status_code == 429 or (response.status_code == 503 and retry_after is not None):
+            raise RateLimitError(f"{url} returned {response.status_code}", retry_after)
+        response.raise_for_status()
+        return response.json()
+
+    def replica(self) -> ModelAgent:
+        if not self.replica_urls:
+            return self
+        url = self.replica_urls[self._hedges % len(self.replica_urls)]
+        self._hedges += 1
+        return replace(self, base_url=url, replica_urls=[])
+
+    def cache_identity(self) -> Dict[str, Any]:
+        identity = super().cache_identity()
+        identity.update(base_url=self.base_url, model_name=self.model_name)
+        return identity
+
+
+@register_adapter("openai")
+@dataclass
+class OpenAIAdapter(HTTPModelAgent):
+    """OpenAI-compatible chat completions (also vLLM, llama.cpp, ...)."""
+
+    base_url: str = "https://api.openai.com/v1"
+    max_tokens: int = 8
+
+    def ask(self, question: str, options: Iterable[str]) -> Optional[str]:
+        options = list(options)
+        data = self._post(
+            "/chat/completions",
+            {
+                "model": self.model_name or self.name,
+                "messages": [{"role": "user", "content": format_prompt(question, options)}],
+                "max_tokens": self.max_tokens,
+                "temperature": 0,
+            },
+        )
+        return parse_answer(data["choices"][0]["message"]["content"], options)
+
+
+@register_adapter("tgi")
+@dataclass
+class TGIAdapter(HTTPModelAgent):
+    """HuggingFace text-generation-inference ``/generate`` endpoint."""
+
+    # Where the TGI container listens by default.
+    base_url: str = "http://localhost:8080"
+    max_new_tokens: int = 8
+
+    def ask(self, question: str, options: Iterable[str]) -> Optional[str]:
+        options = list(options)
+        data = self._post(
+            "/generate",
+            {
+                "inputs": format_prompt(question, options),
+                "parameters": {"max_new_tokens": self.max_new_tokens, "do_sample": False},
+            },
+        )
+        return parse_answer(data["generated_text"], options)
+
+
+@register_adapter("http")
+@dataclass
+class GenericHTTPAdapter(HTTPModelAgent):
+    """Generic JSON API answering ``{"question", "options"}`` with ``{"answer"}``."""
+
+    supports_batch = True
+
+    def ask(self, question: str, options: Iterable[str]) -> Optional[str]:
+        options = list(options)
+        data = self._post("/answer", {"model": self.model_name, "question": question, "options": options})
+        return parse_answer(data.get("answer"), options)
+
+    def ask_batch(self, batch: List[Tuple[str, List[str]]]) -> List[Optional[Any]]:
+        items = [{"question": q, "options": list(o)} for q, o in batch]
+        data = self._post("/answer/batch", {"model": self.model_name, "items": items})
+        return [parse_answer(a, list(o)) for a, (_, o) in zip(data.get("answers", []), batch)]
+
+
+def probe(agent: ModelAgent, attempts: int = 3) -> Dict[str, Any]:
+    """Send a trivial question through ``agent`` and time the round trips.
+
+    The first call includes connection setup, later ones reuse the pooled
+    connection; both latencies are reported in milliseconds.
+    """
+
+    latencies: List[float] = []
+    answer = None
+    try:
+        for _ in range(max(1, attempts)):
+            started = time.perf_counter()
+            answer = agent.ask("Connectivity check: which option is 'yes'?", ["yes", "no"])
+            latencies.append((time.perf_counter() - started) * 1000)
+    except Exception as exc:
+        return {"status": "error", "error": f"{type(exc).__name__}: {exc}", "latency_ms": latencies}
+    return {
+        "status": "ok",
+        "answer": answer,
+        "latency_ms": [round(v, 2) for v in latencies],
+        "first_ms": round(latencies[0], 2),
+        "warm_ms": round(min(latencies[1:] or latencies), 2),
+    }
+
+
+__all__ = [
+    "ADAPTERS",
+    "GenericHTTPAdapter",
+    "HTTPModelAgent",
+    "OpenAIAdapter",
+    "TGIAdapter",
+    "close_http_client",
+    "configure_http",
+    "create_agent",
+    "format_prompt",
+    "http_client",
+    "parse_answer",
+    "probe",
+    "register_adapter",
+]
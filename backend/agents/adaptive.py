@@ -0,0 +1,234 @@
+"""Sequential early stopping for adaptive evaluations.
+
+In ``adaptive`` mode the engine still walks the sampled questions in order,
+but every pending ``(model, question)`` pair is checked against
+:class:`SequentialStopper` right before it is scheduled.  The stopper tracks
+each model's answers per KU and stops a ``(model, KU)`` group once its
+accuracy is known well enough:
+
+* ``precision``: the Wilson interval of the group's accuracy is no wider
+  than ``± precision``.
+* ``compare`` additionally stops a group as soon as its interval no longer
+  overlaps the interval of any other model in the same KU, i.e. its ranking
+  within the KU is settled.
+
+The interval is examined at looks on a geometric grid of sample sizes
+(``min_samples``, then ``growth`` times larger each time) rather than after
+every answer, and the confidence level is Bonferroni-corrected for the
+number of looks the group can take, so peeking repeatedly does not inflate
+the error rate.  Answers that were asked concurrently while a group stopped
+are kept; the overshoot is bounded by the concurrency limits.
+"""
+
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from statistics import NormalDist
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .results import NOT_ASKED, OTHER, ColumnarResult
+
+RULES = ("precision", "compare")
+RUNNING = "running"
+
+
+@dataclass(frozen=True)
+class StoppingRule:
+    """Parameters of :class:`SequentialStopper`.
+
+    Parameters
+    ----------
+    precision: float
+        Target half-width of the accuracy interval of every model and KU.
+    confidence: float
+        Overall confidence of the intervals, across all looks.
+    min_samples: int
+        Answers per model and KU before the first look.
+    growth: float
+        Ratio between the sample sizes of consecutive looks.
+    rule: str
+        ``"precision"`` or ``"compare"`` (see the module docstring).
+    """
+
+    precision: float = 0.02
+    confidence: float = 0.95
+    min_samples: int = 30
+    growth: float = 1.5
+    rule: str = "precision"
+
+    def __post_init__(self) -> None:
+        if self.rule not in RULES:
+            raise ValueError(f"stopping rule must be one of {', '.join(RULES)}")
+        if not 0 < self.confidence < 1 or self.precision <= 0 or self.growth <= 1:
+            raise ValueError("need 0 < confidence < 1, precision > 0 and growth > 1")
+
+    def looks(self, available: int) -> List[int]:
+        """Sample sizes at which a group with ``available`` questions is examined."""
+
+        points: List[int] = []
+        n = max(1, self.min_samples)
+        while n < available:
+            points.append(n)
+            n = max(n + 1, math.ceil(n * self.growth))
+        return points
+
+    def z(self, looks: int) -> float:
+        alpha = (1 - self.confidence) / max(1, looks)
+        return NormalDist().inv_cdf(1 - alpha / 2)
+
+
+def wilson(correct: int, n: int, z: float) -> Tuple[float, float]:
+    """Wilson score interval of ``correct / n``."""
+
+    if n <= 0:
+        return 0.0, 1.0
+    p = correct / n
+    denominator = 1 + z * z / n
+    centre = (p + z * z / (2 * n)) / denominator
+    half = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denominator
+    return max(0.0, centre - half), min(1.0, centre + half)
+
+
+class SequentialStopper:
+    """Schedule for :meth:`ExecutionEngine.run` that stops settled groups.
+
+    Groups are ``(model, KU)`` pairs; :meth:`summary` reports why and after
+    how many answers each of them stopped and the calls that were saved.
+    """
+
+    def __init__(self, rule: Optional[StoppingRule] = None) -> None:
+        self.rule = rule or StoppingRule()
+        self.result: Optional[ColumnarResult] = None
+
+    def bind(self, result: ColumnarResult) -> None:
+        self.result = result
+        models, kus = len(result.model_ids), max(1, len(result.kus))
+        self.available = np.bincount(result.ku_codes, minlength=kus).astype(np.int64)
+        asked = result.asked
+        correct = result.correct & asked
+        self.asked = np.zeros((models, kus), dtype=np.int64)
+        self.correct = np.zeros((models, kus), dtype=np.int64)
+        for k in range(kus):
+            columns = result.ku_codes == k
+            self.asked[:, k] = asked[:, columns].sum(axis=1)
+            self.correct[:, k] = correct[:, columns].sum(axis=1)
+        self.prior = int(asked.sum())
+        self._looks = [self.rule.looks(int(n)) for n in self.available]
+        self._z = [self.rule.z(len(points)) for points in self._looks]
+        self.next_look = np.zeros((models, kus), dtype=np.int64)
+        self.status = np.full((models, kus), RUNNING, dtype=object)
+        for m in range(models):
+            for k in range(kus):
+                self._advance(m, k)
+
+    # ------------------------------------------------------------------
+    # Schedule protocol
+    # ------------------------------------------------------------------
+    def wanted(self, question_index: int, model_index: int) -> bool:
+        return self.status[model_index, self.result.ku_codes[question_index]] == RUNNING
+
+    def observe(self, question_index: int, model_index: int) -> None:
+        result = self.result
+        k = result.ku_codes[question_index]
+        code = result.answers[model_index, question_index]
+        if code == OTHER:
+            right = result.other[(model_index, question_index)] == result.questions[question_index]["correct"]
+        else:
+            # Failed calls count as wrong answers.
+            right = code >= 0 and code == result.correct_index[question_index]
+        self.asked[model_index, k] += 1
+        self.correct[model_index, k] += bool(right)
+        if self.status[model_index, k] == RUNNING:
+            self._advance(model_index, k)
+
+    # ------------------------------------------------------------------
+    # Decisions
+    # ------------------------------------------------------------------
+    def interval(self, m: int, k: int) -> Tuple[float, float]:
+        return wilson(int(self.correct[m, k]), int(self.asked[m, k]), self._z[k])
+
+    def _advance(self, m: int, k: int) -> None:
+        n = int(self.asked[m, k])
+        if n >= self.available[k]:
+            self._stop(m, k, "exhausted")
+            return
+        if n < self.next_look[m, k]:
+            return
+        points = self._looks[k]
+        if n >= self.rule.min_samples:
+            low, high = self.interval(m, k)
+            if (high - low) / 2 <= self.rule.precision:
+                self._stop(m, k, "precision")
+                return
+            if self.rule.rule == "compare" and self._separated(m, k, low, high):
+                self._stop(m, k, "separated")
+                return
+        self.next_look[m, k] = next((p for p in points if p > n), int(self.available[k]))
+
+    def _separated(self, m: int, k: int, low: float, high: float) -> bool:
+        others = [o for o in range(self.asked.shape[0]) if o != m]
+        if not others:
+            return False
+        for o in others:
+            other_low, other_high = self.interval(o, k)
+            if low <= other_high and other_low <= high:
+                return False
+        return True
+
+    def _stop(self, m: int, k: int, reason: str) -> None:
+        self.status[m, k] = reason
+
+    # ------------------------------------------------------------------
+    # Reporting
+    # ------------------------------------------------------------------
+    def summary(self) -> Dict[str, Any]:
+        """Stopping criteria, per-group outcome and the calls saved.
+
+        ``accuracy`` of a model weights its per-KU accuracies by the KU's
+        share of the sampled questions, since KUs stop after different
+        numbers of answers.
+        """
+
+        result = self.result
+        pairs = int(result.answers.size)
+        asked = int(np.count_nonzero(result.answers != NOT_ASKED))
+        weights = self.available / max(1, int(self.available.sum()))
+        kus = result.kus or [""]
+        models = []
+        for m, model_id in enumerate(result.model_ids.tolist()):
+            groups: Dict[str, Any] = {}
+            estimate = weight = 0.0
+            for k, ku in enumerate(kus):
+                n = int(self.asked[m, k])
+                low, high = self.interval(m, k)
+                accuracy = int(self.correct[m, k]) / n if n else None
+                if accuracy is not None:
+                    estimate += float(weights[k]) * accuracy
+                    weight += float(weights[k])
+                groups[ku] = {
+                    "answered": n,
+                    "available": int(self.available[k]),
+                    "accuracy": accuracy,
+                    "low": round(low, 6),
+                    "high": round(high, 6),
+                    "stopped": self.status[m, k],
+                }
+            models.append({"id": model_id, "accuracy": estimate / weight if weight else None, "kus": groups})
+        return {
+            "rule": self.rule.rule,
+            "precision": self.rule.precision,
+            "confidence": self.rule.confidence,
+            "min_samples": self.rule.min_samples,
+            "pairs": pairs,
+            "asked": asked,
+            "reused": self.prior,
+            "saved": pairs - asked,
+            "saved_fraction": (pairs - asked) / pairs if pairs else 0.0,
+            "models": models,
+        }
+
+
+__all__ = ["RULES", "SequentialStopper", "StoppingRule", "wilson"]
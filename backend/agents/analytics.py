@@ -0,0 +1,328 @@
+"""Vectorized analytics over evaluation results.
+
+Results are turned into dense ``models x questions`` NumPy matrices once and
+every statistic is computed with array reductions or small matrix products
+over them: per-model and per-KU accuracy, bootstrap confidence intervals,
+one-way ANOVA across models and across KUs, and pairwise agreement and
+correlation matrices.
+"""
+
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+
+@dataclass
+class ResultMatrix:
+    """Dense view of an evaluation result.
+
+    ``correct`` and ``answered`` are boolean ``(models, questions)`` matrices
+    and ``ku_codes`` maps every question to an entry of ``kus``.  ``choices``
+    holds a small integer per answer (``-1`` when unanswered); within one
+    question two models share a code exactly when they gave the same answer.
+    """
+
+    model_ids: np.ndarray
+    question_ids: np.ndarray
+    kus: List[str]
+    ku_codes: np.ndarray
+    correct: np.ndarray
+    answered: np.ndarray
+    choices: np.ndarray
+
+    @classmethod
+    def from_result(cls, result: Dict[str, Any]) -> "ResultMatrix":
+        """Build the matrices from the ``{"models": ..., "questions": ...}`` shape."""
+
+        model_ids = [m["id"] for m in result.get("models", [])]
+        questions = result.get("questions", [])
+        row = {mid: i for i, mid in enumerate(model_ids)}
+        shape = (len(model_ids), len(questions))
+        correct = np.zeros(shape, dtype=bool)
+        answered = np.zeros(shape, dtype=bool)
+        choices = np.full(shape, -1, dtype=np.int16)
+        kus: Dict[str, int] = {}
+        ku_codes = np.zeros(len(questions), dtype=np.int32)
+        for j, q in enumerate(questions):
+            ku_codes[j] = kus.setdefault(q.get("ku") or "", len(kus))
+            codes: Dict[str, int] = {}
+            for mid, answer in q["answers"].items():
+                i = row.get(mid)
+                if i is None or answer is None:
+                    continue
+                answered[i, j] = True
+                correct[i, j] = answer == q["correct"]
+                choices[i, j] = codes.setdefault(answer, len(codes))
+        return cls(
+            model_ids=np.asarray(model_ids, dtype=np.int64),
+            question_ids=np.asarray([q["id"] for q in questions], dtype=np.int64),
+            kus=list(kus),
+            ku_codes=ku_codes,
+            correct=correct,
+            answered=answered,
+            choices=choices,
+        )
+
+
+def _safe_div(num: np.ndarray, den: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(den > 0, num / np.where(den > 0, den, 1), np.nan)
+
+
+def _betacf(a: float, b: float, x: float) -> float:
+    """Continued fraction for the incomplete beta function (Lentz's method)."""
+
+    tiny = 1e-300
+    qab, qap, qam = a + b, a + 1.0, a - 1.0
+    c, d = 1.0, 1.0 - qab * x / qap
+    d = 1.0 / (d if abs(d) > tiny else tiny)
+    h = d
+    for m in range(1, 300):
+        m2 = 2 * m
+        aa = m * (b - m) * x / ((qam + m2) * (a + m2))
+        d = 1.0 + aa * d
+        d = 1.0 / (d if abs(d) > tiny else tiny)
+        c = 1.0 + aa / c
+        c = c if abs(c) > tiny else tiny
+        h *= d * c
+        aa = -(a + m) * (qab + m) * x / ((a + m2) * (qap + m2))
+        d = 1.0 + aa * d
+        d = 1.0 / (d if abs(d) > tiny else tiny)
+        c = 1.0 + aa / c
+        c = c if abs(c) > tiny else tiny
+        delta = d * c
+        h *= delta
+        if abs(delta - 1.0) < 3e-14:
+            break
+    return h
+
+
+def betainc(a: float, b: float, x: float) -> float:
+    """Regularized incomplete beta function ``I_x(a, b)``."""
+
+    if x <= 0.0:
+        return 0.0
+    if x >= 1.0:
+        return 1.0
+    front = math.exp(
+        math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b)
+        + a * math.log(x) + b * math.log1p(-x)
+    )
+    if x < (a + 1.0) / (a + b + 2.0):
+        return front * _betacf(a, b, x) / a
+    return 1.0 - front * _betacf(b, a, 1.0 - x) / b
+
+
+def f_sf(f: float, df1: float, df2: float) -> float:
+    """Survival function (p-value) of the F distribution."""
+
+    if not math.isfinite(f):
+        return 0.0 if f > 0 else 1.0
+    if f <= 0:
+        return 1.0
+    return betainc(df2 / 2.0, df1 / 2.0, df2 / (df2 + df1 * f))
+
+
+def anova_from_counts(successes: np.ndarray, totals: np.ndarray) -> Optional[Dict[str, Any]]:
+    """One-way ANOVA over groups of 0/1 outcomes given per-group counts.
+
+    For binary data each group's sum of squares is ``n * p * (1 - p)``, so the
+    test only needs the success and trial counts per group.
+    """
+
+    keep = totals > 0
+    successes, totals = successes[keep].astype(float), totals[keep].astype(float)
+    groups, n = len(totals), totals.sum()
+    if groups < 2 or n <= groups:
+        return None
+    means = successes / totals
+    grand = successes.sum() / n
+    ss_between = float(np.sum(totals * (means - grand) ** 2))
+    ss_within = float(np.sum(totals * means * (1.0 - means)))
+    df1, df2 = groups - 1, n - groups
+    if ss_within == 0:
+        f = math.inf if ss_between > 0 else 0.0
+    else:
+        f = (ss_between / df1) / (ss_within / df2)
+    return {"f": float(f), "p_value": float(f_sf(f, df1, df2)), "df": [int(df1), int(df2)]}
+
+
+def _jsonable(values: np.ndarray) -> Any:
+    """Nested lists with NaN/inf mapped to ``None`` so results stay valid JSON."""
+
+    out = values.astype(object)
+    out[~np.isfinite(values.astype(float))] = None
+    return out.tolist()
+
+
+@dataclass
+class AnalyticsEngine:
+    """Compute summary statistics for a :class:`ResultMatrix`.
+
+    Parameters
+    ----------
+    bootstrap_samples: int
+        Resamples used for the confidence intervals.
+    confidence: float
+        Coverage of the confidence intervals.
+    enable_anova: bool
+        Whether to run the ANOVA tests.
+    seed: int, optional
+        Seed for the bootstrap generator.
+    """
+
+    bootstrap_samples: int = 1000
+    confidence: float = 0.95
+    enable_anova: bool = True
+    seed: Optional[int] = None
+
+    def analyze(self, matrix: ResultMatrix) -> Dict[str, Any]:
+        correct = matrix.correct.astype(np.float32)
+        answered = matrix.answered.astype(np.float32)
+        # (questions, KUs) one-hot map turns per-KU sums into one matmul.
+        ku_onehot = np.zeros((len(matrix.ku_codes), len(matrix.kus)), dtype=np.float32)
+        ku_onehot[np.arange(len(matrix.ku_codes)), matrix.ku_codes] = 1.0
+
+        # float32 products are exact for counts below 2**24; divide in float64.
+        hits = correct.sum(axis=1, dtype=np.float64)
+        trials = answered.sum(axis=1, dtype=np.float64)
+        hits_ku = (correct @ ku_onehot).astype(np.float64)
+        trials_ku = (answered @ ku_onehot).astype(np.float64)
+        accuracy = _safe_div(hits, trials)
+        accuracy_ku = _safe_div(hits_ku, trials_ku)
+        ci = self._bootstrap(hits, trials)
+        ci_ku = self._bootstrap(hits_ku, trials_ku)
+
+        accuracy, ci = _jsonable(accuracy), _jsonable(ci.T)
+        accuracy_ku, ci_ku = _jsonable(accuracy_ku), _jsonable(ci_ku.transpose(1, 2, 0))
+        models = [
+            {
+                "id": mid,
+                "accuracy": accuracy[i],
+                "ci": ci[i],
+                "scores_by_ku": dict(zip(matrix.kus, accuracy_ku[i])),
+                "ci_by_ku": dict(zip(matrix.kus, ci_ku[i])),
+            }
+            for i, mid in enumerate(matrix.model_ids.tolist())
+        ]
+
+        summary: Dict[str, Any] = {
+            "confidence": self.confidence,
+            "models": models,
+            "kus": matrix.kus,
+            "agreement": self._agreement(matrix, answered),
+            "correlation": self._correlation(matrix, correct, answered),
+        }
+        if self.enable_anova:
+            summary["anova"] = {
+                "models": anova_from_counts(hits, trials),
+                "kus": anova_from_counts(hits_ku.sum(axis=0), trials_ku.sum(axis=0)),
+            }
+        return summary
+
+    def _bootstrap(self, hits: np.ndarray, trials: np.ndarray) -> np.ndarray:
+        """Percentile bootstrap interval of ``hits / trials``, elementwise.
+
+        Resampling ``n`` Bernoulli outcomes with replacement yields a
+        ``Binomial(n, p_hat)`` success count, so the resamples are drawn
+        directly from that distribution instead of materializing index
+        arrays.  Returns an array of shape ``(2,) + hits.shape``.
+        """
+
+        rng = np.random.default_rng(self.seed)
+        n = trials.astype(np.int64)
+        p = np.nan_to_num(_safe_div(hits, trials))
+        draws = rng.binomial(n, p, size=(self.bootstrap_samples,) + n.shape)
+        rates = _safe_div(draws, np.broadcast_to(n, draws.shape))
+        alpha = (1.0 - self.confidence) / 2.0
+        with np.errstate(invalid="ignore"):
+            return np.quantile(rates, [alpha, 1.0 - alpha], axis=0)
+
+    @staticmethod
+    def _agreement(matrix: ResultMatrix, answered: np.ndarray) -> Dict[str, Any]:
+        """Share of commonly answered questions where two models chose alike."""
+
+        same = np.zeros((len(matrix.model_ids),) * 2, dtype=np.float64)
+        for code in np.unique(matrix.choices[matrix.choices >= 0]):
+            chose = (matrix.choices == code).astype(np.float32)
+            same += chose @ chose.T
+        both = answered @ answered.T
+        return {"model_ids": matrix.model_ids.tolist(), "matrix": _jsonable(_safe_div(same, both))}
+
+    @staticmethod
+    def _correlation(matrix: ResultMatrix, correct: np.ndarray, answered: np.ndarray) -> Dict[str, Any]:
+        """Pearson correlation of correctness over commonly answered questions.
+
+        All pairwise sums come from matrix products, so missing answers are
+        handled without looping over model pairs.
+        """
+
+        n = answered @ answered.T
+        sx = correct @ answered.T  # sum of x_i over questions both answered
+        sxy = correct @ correct.T
+        mean_x = _safe_div(sx, n)
+        mean_y = mean_x.T
+        # Correctness is 0/1, so sum(x^2) == sum(x).
+        var_x = mean_x - mean_x ** 2
+        var_y = mean_y - mean_y ** 2
+        cov = _safe_div(sxy, n) - mean_x * mean_y
+        with np.errstate(divide="ignore", invalid="ignore"):
+            corr = cov / np.sqrt(var_x * var_y)
+        return {"model_ids": matrix.model_ids.tolist(), "matrix": _jsonable(corr)}
+
+
+def _ranks(values: np.ndarray) -> np.ndarray:
+    """Ranks starting at 1, ties sharing their average rank."""
+
+    order = np.argsort(values, kind="mergesort")
+    ranks = np.empty(len(values), dtype=np.float64)
+    ranks[order] = np.arange(1, len(values) + 1)
+    _, inverse, counts = np.unique(values, return_inverse=True, return_counts=True)
+    sums = np.bincount(inverse, weights=ranks)
+    return sums[inverse] / counts[inverse]
+
+
+def _pearson(x: np.ndarray, y: np.ndarray) -> Optional[float]:
+    dx = x - x.mean()
+    dy = y - y.mean()
+    den = np.sqrt((dx * dx).sum() * (dy * dy).sum())
+    return float((dx * dy).sum() / den) if den > 0 else None
+
+
+def correlate(x: Dict[Any, float], y: Dict[Any, float]) -> Dict[str, Any]:
+    """Pearson and Spearman correlation of two scores over their common keys.
+
+    Coefficients are ``None`` with fewer than three common keys or when one
+    side is constant.
+    """
+
+    keys = [k for k in x if k in y and x[k] is not None and y[k] is not None]
+    result: Dict[str, Any] = {"n": len(keys), "pearson": None, "spearman": None}
+    if len(keys) < 3:
+        return result
+    a = np.array([x[k] for k in keys], dtype=np.float64)
+    b = np.array([y[k] for k in keys], dtype=np.float64)
+    result["pearson"] = _pearson(a, b)
+    result["spearman"] = _pearson(_ranks(a), _ranks(b))
+    return result
+
+
+def analyze_result(result: Dict[str, Any], **options: Any) -> Dict[str, Any]:
+    """Convenience wrapper: build the matrix for ``result`` and analyse it."""
+
+    return AnalyticsEngine(**options).analyze(ResultMatrix.from_result(result))
+
+
+__all__ = [
+    "AnalyticsEngine",
+    "ResultMatrix",
+    "analyze_result",
+    "anova_from_counts",
+    "correlate",
+    "betainc",
+    "f_sf",
+]
@@ -0,0 +1,120 @@
+"""Micro-batching of model calls.
+
+A :class:`MicroBatcher` collects the questions pending for one model and
+sends them through ``ModelAgent.ask_batch`` once ``max_batch_size`` of them
+are waiting or the oldest has waited ``max_wait`` seconds.  A batch call that
+fails as a whole is split in halves and retried, down to single calls; items
+a successful batch left unanswered are retried as single calls, so answers
+already obtained are never thrown away.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Set, Tuple
+
+if TYPE_CHECKING:  # pragma: no cover - imported for type hints only
+    from . import ModelAgent
+    from .engine import CallPool, ExecutionEngine
+
+_Pending = Tuple[Dict[str, Any], "asyncio.Future[Optional[str]]"]
+
+
+class MicroBatcher:
+    """Group the calls of one model into batches.
+
+    Parameters
+    ----------
+    engine: ExecutionEngine
+        Performs the actual batch and single calls (limits, retries, timeout).
+    executor: CallPool
+        Pool the blocking calls run on.
+    model: ModelAgent
+        Model whose ``ask_batch`` is used.
+    max_batch_size: int
+        A batch is sent as soon as this many questions are pending.
+    max_wait: float
+        Seconds the first pending question may wait for the batch to fill.
+    concurrency: int
+        Batches of this model in flight at the same time.
+    """
+
+    def __init__(
+        self,
+        engine: "ExecutionEngine",
+        executor: "CallPool",
+        model: "ModelAgent",
+        max_batch_size: int,
+        max_wait: float,
+        concurrency: int,
+    ) -> None:
+        self.engine = engine
+        self.executor = executor
+        self.model = model
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait
+        self._slots = asyncio.Semaphore(max(1, concurrency))
+        self._pending: List[_Pending] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set["asyncio.Task[None]"] = set()
+        self.batches = 0
+
+    async def ask(self, question: Dict[str, Any]) -> Optional[str]:
+        loop = asyncio.get_running_loop()
+        future: "asyncio.Future[Optional[str]]" = loop.create_future()
+        self._pending.append((question, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._dispatch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self, batch: List[_Pending]) -> None:
+        try:
+            await self._run(batch)
+        finally:
+            # Never leave a caller waiting, whatever went wrong above.
+            for _, future in batch:
+                if not future.done():
+                    future.set_result(None)
+
+    async def _run(self, batch: List[_Pending]) -> None:
+        if len(batch) == 1:
+            question, future = batch[0]
+            answer = await self.engine._call_single(self.executor, self.model, question)
+            if not future.done():
+                future.set_result(answer)
+            return
+
+        async with self._slots:
+            self.batches += 1
+            answers = await self.engine._call_batch(
+                self.executor, self.model, [q for q, _ in batch]
+            )
+        if answers is None:
+            # The whole call failed: bisect so one bad item cannot sink the rest.
+            middle = len(batch) // 2
+            await asyncio.gather(self._run(batch[:middle]), self._run(batch[middle:]))
+            return
+
+        missing: List[_Pending] = []
+        for (question, future), answer in zip(batch, answers):
+            if answer is None or isinstance(answer, Exception):
+                missing.append((question, future))
+            elif not future.done():
+                future.set_result(answer)
+        if missing:
+            await asyncio.gather(*(self._run([item]) for item in missing))
+
+
+__all__ = ["MicroBatcher"]
@@ -0,0 +1,186 @@
+"""Persistent answer cache for :class:`ModelAgent` calls.
+
+Answers are keyed by a hash of the model's identity and settings plus the
+normalized question text and options.  Lookups go through an in-memory LRU
+tier first and fall back to an SQLite file on disk, which survives restarts
+and is shared by every process pointing at the same path.  Disk entries
+expire after ``ttl`` seconds and the oldest entries are evicted once the
+file holds more than ``max_entries`` answers.  The two tiers have separate
+locks, so memory lookups never wait for disk I/O of another thread.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional
+
+# How many writes happen between two size checks of the disk tier.
+_EVICTION_INTERVAL = 1000
+
+
+def cache_key(identity: Dict[str, Any], question: str, options: Iterable[str]) -> str:
+    """Return the cache key for ``question`` asked to the model ``identity``.
+
+    Runs of whitespace in the question and options are collapsed so purely
+    cosmetic edits do not invalidate cached answers.
+    """
+
+    payload = json.dumps(
+        [identity, " ".join(question.split()), [" ".join(str(o).split()) for o in options]],
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class AnswerCache:
+    """Two-tier (memory LRU + SQLite) answer cache.
+
+    Parameters
+    ----------
+    path: str, optional
+        SQLite file backing the disk tier.  ``None`` keeps the cache in memory.
+    memory_entries: int
+        Capacity of the in-memory LRU tier.
+    ttl: float
+        Seconds after which a disk entry is considered stale.
+    max_entries: int
+        Maximum number of entries kept on disk.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        memory_entries: int = 10000,
+        ttl: float = 7 * 24 * 3600,
+        max_entries: int = 1_000_000,
+    ) -> None:
+        self.path = path
+        self.memory_entries = memory_entries
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._writes = 0
+        self._db: Optional[sqlite3.Connection] = None
+        if path:
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS answers ("
+                "key TEXT PRIMARY KEY, answer TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS ix_answers_created ON answers (created)")
+
+    @classmethod
+    def from_config(cls, cfg: Dict[str, Any], directory: Optional[str] = None) -> Optional["AnswerCache"]:
+        """Build a cache from the ``cache`` config section, ``None`` if disabled.
+
+        A relative ``path`` is resolved against ``directory`` when given.
+        """
+
+        if not cfg.get("enabled", True):
+            return None
+        path = cfg.get("path") or None
+        if path and directory:
+            path = os.path.join(directory, path)
+        return cls(
+            path=path,
+            memory_entries=cfg.get("memory_entries", 10000),
+            ttl=cfg.get("ttl", 7 * 24 * 3600),
+            max_entries=cfg.get("max_entries", 1_000_000),
+        )
+
+    @property
+    def persistent(self) -> bool:
+        """Whether lookups and writes may touch the disk tier."""
+
+        return self._db is not None
+
+    def get(self, key: str, memory_only: bool = False) -> Optional[str]:
+        """Return the cached answer for ``key``.
+
+        With ``memory_only`` the disk tier is skipped, so the call never
+        blocks on I/O; a miss then only means "not in memory".
+        """
+
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if now - entry[1] < self.ttl:
+                    self._memory.move_to_end(key)
+                    return entry[0]
+                del self._memory[key]
+        if memory_only:
+            return None
+        with self._db_lock:
+            if self._db is None:
+                return None
+            row = self._db.execute(
+                "SELECT answer, created FROM answers WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[1] >= self.ttl:
+                self._db.execute("DELETE FROM answers WHERE key = ?", (key,))
+                return None
+        self._remember(key, row[0], row[1])
+        return row[0]
+
+    def set(self, key: str, answer: str) -> None:
+        now = time.time()
+        self._remember(key, answer, now)
+        with self._db_lock:
+            if self._db is None:
+                return
+            self._db.execute(
+                "INSERT OR REPLACE INTO answers (key, answer, created) VALUES (?, ?, ?)",
+                (key, answer, now),
+            )
+            self._writes += 1
+            if self._writes % _EVICTION_INTERVAL == 0:
+                self._evict(now)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+        with self._db_lock:
+            if self._db is not None:
+                self._db.execute("DELETE FROM answers")
+
+    def close(self) -> None:
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _remember(self, key: str, answer: str, created: float) -> None:
+        with self._lock:
+            self._memory[key] = (answer, created)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def _evict(self, now: float) -> None:
+        assert self._db is not None
+        self._db.execute("DELETE FROM answers WHERE created < ?", (now - self.ttl,))
+        (count,) = self._db.execute("SELECT COUNT(*) FROM answers").fetchone()
+        excess = count - self.max_entries
+        if excess > 0:
+            self._db.execute(
+                "DELETE FROM answers WHERE key IN "
+                "(SELECT key FROM answers ORDER BY created LIMIT ?)",
+                (excess,),
+            )
+
+
+__all__ = ["AnswerCache", "cache_key"]
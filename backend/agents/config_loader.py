@@ -1,54 +1,344 @@
-"""Lightweight YAML configuration loader for the agent package."""
+"""Typed, cached configuration for the agent package.
+
+``agents/config.yaml`` is parsed once into an immutable :class:`AgentConfig`
+whose sections are dataclasses with the defaults below; a section that is
+only partly specified keeps the defaults of its other keys.  Values are
+type-checked, so a typo fails loudly instead of being carried around as a
+string.
+
+:func:`get_config` serves the cached object and re-reads the file only when
+its mtime changes or a reload was requested (see
+:func:`install_reload_signal`).  An :class:`AgentConfig` never changes after
+it is built: an evaluation that holds one keeps a consistent view even if the
+file is reloaded while it runs.
+"""
 
 from __future__ import annotations
 
+import logging
 import os
-from typing import Any, Dict
+import signal
+import threading
+from dataclasses import asdict, dataclass, field, fields, replace
+from typing import Any, Dict, Iterable, Mapping, Optional
 
-DEFAULT_CONFIG = {
-    "evaluation": {"timeout": 30, "mode": "peer"},
-    "model": {"max_retries": 2, "response_format": "letter"},
-    "analytics": {"enable_anova": True, "export_format": "csv"},
-}
+logger = logging.getLogger(__name__)
 
 CONFIG_PATH = os.path.join(os.path.dirname(__file__), "config.yaml")
 
 
+class ConfigError(ValueError):
+    """Raised for unknown keys or values of the wrong type."""
+
+
+@dataclass(frozen=True)
+class EvaluationConfig:
+    timeout: float = 30
+    mode: str = "peer"
+    max_concurrency: int = 16
+    per_model_concurrency: int = 4
+    max_batch_size: int = 8
+    max_batch_wait: float = 0.01
+    adaptive_rule: str = "precision"
+    adaptive_precision: float = 0.02
+    adaptive_confidence: float = 0.95
+    adaptive_min_samples: int = 30
+    hedge_percentile: float = 0
+    hedge_min_samples: int = 20
+
+
+@dataclass(frozen=True)
+class ModelConfig:
+    max_retries: int = 2
+    response_format: str = "letter"
+
+
+@dataclass(frozen=True)
+class AnalyticsConfig:
+    enable_anova: bool = True
+    export_format: str = "csv"
+    bootstrap_samples: int = 1000
+    confidence: float = 0.95
+
+
+@dataclass(frozen=True)
+class LimitsConfig:
+    requests_per_minute: float = 0
+    tokens_per_minute: float = 0
+    initial_concurrency: int = 4
+    min_concurrency: int = 1
+    max_concurrency: int = 16
+    latency_spike: float = 3.0
+    retry_backoff: float = 0.5
+    retry_backoff_max: float = 30.0
+    throttle_retries: int = 8
+    breaker_window: int = 20
+    breaker_min_calls: int = 10
+    breaker_error_rate: float = 0.5
+    breaker_cooldown: float = 30.0
+
+
+@dataclass(frozen=True)
+class HTTPConfig:
+    http2: bool = True
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+    timeout: float = 30.0
+    connect_timeout: float = 5.0
+
+
+@dataclass(frozen=True)
+class CacheConfig:
+    enabled: bool = True
+    path: str = "answer_cache.sqlite3"
+    memory_entries: int = 10000
+    ttl: int = 604800
+    max_entries: int = 1000000
+
+
+@dataclass(frozen=True)
+class AgentConfig:
+    """Validated agent configuration, one attribute per section.
+
+    ``config["cache"]`` returns a section as a plain dictionary for code that
+    takes the raw section (e.g. ``AnswerCache.from_config``).
+    """
+
+    evaluation: EvaluationConfig = field(default_factory=EvaluationConfig)
+    model: ModelConfig = field(default_factory=ModelConfig)
+    analytics: AnalyticsConfig = field(default_factory=AnalyticsConfig)
+    limits: LimitsConfig = field(default_factory=LimitsConfig)
+    http: HTTPConfig = field(default_factory=HTTPConfig)
+    cache: CacheConfig = field(default_factory=CacheConfig)
+
+    def __getitem__(self, section: str) -> Dict[str, Any]:
+        if section not in _SECTIONS:
+            raise KeyError(section)
+        return asdict(getattr(self, section))
+
+    def to_dict(self) -> Dict[str, Dict[str, Any]]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, Any]) -> "AgentConfig":
+        """Build a config from (possibly partial) sections over the defaults."""
+
+        return cls().merged(data)
+
+    def merged(self, overrides: Optional[Mapping[str, Any]], locked: Iterable[str] = ()) -> "AgentConfig":
+        """Return a copy with ``overrides`` deep-merged into it.
+
+        Sections (``"http"``) or keys (``"limits.max_concurrency"``) named in
+        ``locked`` may not be overridden.
+
+        Raises
+        ------
+        ConfigError
+            For unknown or locked sections and keys and for values of the
+            wrong type.
+        """
+
+        if not overrides:
+            return self
+        if not isinstance(overrides, Mapping):
+            raise ConfigError("configuration overrides must be a mapping of sections")
+        changes = {}
+        for name, values in overrides.items():
+            if name not in _SECTIONS:
+                raise ConfigError(f"unknown config section '{name}'")
+            if name in locked:
+                raise ConfigError(f"config section '{name}' cannot be overridden")
+            if not isinstance(values, Mapping):
+                raise ConfigError(f"config section '{name}' must be a mapping")
+            section = getattr(self, name)
+            types = {f.name: f.type for f in fields(section)}
+            checked = {}
+            for key, value in values.items():
+                if key not in types:
+                    raise ConfigError(f"unknown config key '{name}.{key}'")
+                if f"{name}.{key}" in locked:
+                    raise ConfigError(f"config key '{name}.{key}' cannot be overridden")
+                checked[key] = _check(f"{name}.{key}", types[key], value)
+            changes[name] = replace(section, **checked)
+        return replace(self, **changes)
+
+
+_SECTIONS = {f.name for f in fields(AgentConfig)}
+
+# Settings of process-wide resources (the HTTP client, the answer cache and
+# the per-model limiters and circuit breakers); a run cannot override them.
+# The retry settings in ``limits`` only apply to the run and stay open.
+PROCESS_SETTINGS = frozenset(
+    {"http", "cache"}
+    | {
+        f"limits.{f.name}"
+        for f in fields(LimitsConfig)
+        if not f.name.startswith("retry_") and f.name != "throttle_retries"
+    }
+)
+
+DEFAULT_CONFIG = AgentConfig().to_dict()
+
+
+def _check(name: str, kind: str, value: Any) -> Any:
+    # Field types are strings because of ``from __future__ import annotations``.
+    if kind == "bool":
+        if isinstance(value, bool):
+            return value
+    elif kind == "int":
+        if isinstance(value, int) and not isinstance(value, bool):
+            return value
+    elif kind == "float":
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return value
+    elif kind == "str":
+        if isinstance(value, str):
+            return value
+    raise ConfigError(f"{name} must be of type {kind}, got {value!r}")
+
+
 def _parse_value(raw: str) -> Any:
     raw = raw.strip()
     if raw.lower() in {"true", "false"}:
         return raw.lower() == "true"
-    try:
-        return int(raw)
-    except ValueError:
-        return raw.strip('"')
-
+    for cast in (int, float):
+        try:
+            return cast(raw)
+        except ValueError:
+            pass
+    return raw.strip('"')
 
-def load_config(path: str = CONFIG_PATH) -> Dict[str, Any]:
-    """Parse the configuration file into a dictionary."""
 
-    if not os.path.exists(path):
-        return DEFAULT_CONFIG.copy()
+def parse_yaml(path: str) -> Dict[str, Any]:
+    """Parse the indentation-based subset of YAML used by ``config.yaml``."""
 
-    data: Dict[str, Any] = {}
-    current = None
+    root: Dict[str, Any] = {}
+    stack = [(-1, root)]
     with open(path, "r") as fh:
         for line in fh:
-            line = line.rstrip()
-            if not line or line.lstrip().startswith("#"):
+            stripped = line.strip()
+            if not stripped or stripped.startswith("#"):
                 continue
             indent = len(line) - len(line.lstrip())
-            key_val = line.strip()
-            if key_val.endswith(":"):
-                key = key_val[:-1]
-                if indent == 0 and key == "agents":
-                    continue  # root section
-                elif indent == 2:
-                    current = key
-                    data[current] = {}
+            while stack[-1][0] >= indent:
+                stack.pop()
+            parent = stack[-1][1]
+            key, _, val = stripped.partition(":")
+            key = key.strip()
+            if val.strip():
+                parent[key] = _parse_value(val)
             else:
-                if current is None:
-                    continue
-                key, val = map(str.strip, key_val.split(":", 1))
-                data[current][key] = _parse_value(val)
-    return {**DEFAULT_CONFIG, **data}
+                child: Dict[str, Any] = {}
+                parent[key] = child
+                stack.append((indent, child))
+    return root.get("agents", root)
+
+
+def load_typed_config(path: str = CONFIG_PATH) -> AgentConfig:
+    """Parse and validate ``path``; the defaults apply when it is missing."""
+
+    if not os.path.exists(path):
+        return AgentConfig()
+    return AgentConfig.from_dict(parse_yaml(path))
+
+
+def load_config(path: str = CONFIG_PATH) -> Dict[str, Any]:
+    """Parse the configuration file into a dictionary."""
+
+    return load_typed_config(path).to_dict()
+
+
+class ConfigStore:
+    """Cache of the parsed config file, reloaded when the file changes.
+
+    Parameters
+    ----------
+    path: str
+        The YAML file.
+    """
+
+    def __init__(self, path: str = CONFIG_PATH) -> None:
+        self.path = path
+        self._config: Optional[AgentConfig] = None
+        self._mtime: Optional[int] = None
+        self._reload = False
+        self._lock = threading.Lock()
+
+    def _stat(self) -> Optional[int]:
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def get(self) -> AgentConfig:
+        mtime = self._stat()
+        if self._config is not None and mtime == self._mtime and not self._reload:
+            return self._config
+        with self._lock:
+            mtime = self._stat()
+            if self._config is None or mtime != self._mtime or self._reload:
+                self._reload = False
+                try:
+                    self._config = load_typed_config(self.path)
+                except (ConfigError, OSError, ValueError):
+                    if self._config is None:
+                        raise
+                    # Keep serving the last good config rather than failing
+                    # every request because of a bad edit.
+                    logger.exception("invalid agent config %s, keeping the previous one", self.path)
+                self._mtime = mtime
+            return self._config
+
+    def request_reload(self) -> None:
+        """Re-read the file on the next :meth:`get`, even if unchanged."""
+
+        self._reload = True
+
+
+_store = ConfigStore()
+
+
+def get_config() -> AgentConfig:
+    """The cached configuration of ``agents/config.yaml``."""
+
+    return _store.get()
+
+
+def reload_config() -> AgentConfig:
+    _store.request_reload()
+    return _store.get()
+
+
+def install_reload_signal(signum: int = getattr(signal, "SIGHUP", 0)) -> bool:
+    """Reload the config when the process receives ``signum`` (SIGHUP).
+
+    Only possible from the main thread and on platforms with the signal;
+    returns whether the handler was installed.
+    """
+
+    if not signum or threading.current_thread() is not threading.main_thread():
+        return False
+    previous = signal.getsignal(signum)
+
+    def handler(received, frame):
+        _store.request_reload()
+        if callable(previous):
+            previous(received, frame)
+
+    signal.signal(signum, handler)
+    return True
+
+
+__all__ = [
+    "AgentConfig",
+    "ConfigError",
+    "ConfigStore",
+    "DEFAULT_CONFIG",
+    "PROCESS_SETTINGS",
+    "get_config",
+    "install_reload_signal",
+    "load_config",
+    "load_typed_config",
+    "reload_config",
+]
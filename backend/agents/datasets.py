@@ -0,0 +1,257 @@
+"""Streaming and sharding of local benchmark datasets.
+
+Datasets are JSONL files with one multiple choice item per line, in the
+shape of CyberSecEval's MCQ suites.  Each item needs a question, its options
+and the correct answer; the common spellings of those keys are accepted (see
+:func:`normalize_item`), and lines that are not usable items are counted as
+skipped.
+
+A file is never loaded as a whole.  It is cut into byte ranges
+(:func:`shard_ranges`); a line belongs to the shard that contains its first
+byte, so every shard can be read independently by seeking to its start
+(:func:`iter_shard`).  :func:`run_shard` answers the items of one shard in
+chunks through an :class:`~backend.agents.EvaluationAgent` and rewrites a
+small JSON checkpoint after every chunk, so an interrupted run continues
+from the last finished chunk instead of starting over.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import string
+from dataclasses import asdict, dataclass, fields, replace
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Tuple
+
+from .results import FAILED
+
+_TEXT_KEYS = ("question", "prompt", "text", "test_case_prompt", "mutated_prompt")
+_OPTION_KEYS = ("options", "choices", "answers")
+_CORRECT_KEYS = ("correct_answer", "answer", "correct", "expected_answer", "label")
+
+
+def _first(raw: Mapping[str, Any], keys: Tuple[str, ...]) -> Any:
+    for key in keys:
+        value = raw.get(key)
+        if value not in (None, "", [], {}):
+            return value
+    return None
+
+
+def normalize_item(raw: Any, default_id: Any = None) -> Optional[Dict[str, Any]]:
+    """Return ``{"id", "text", "options", "correct"}`` or ``None``.
+
+    Options may be a list or a mapping of letters to texts; the correct
+    answer may be the option text, its letter or its index.
+    """
+
+    if not isinstance(raw, Mapping):
+        return None
+    text = _first(raw, _TEXT_KEYS)
+    options = _first(raw, _OPTION_KEYS)
+    correct = _first(raw, _CORRECT_KEYS)
+    if not isinstance(text, str) or options is None or correct is None:
+        return None
+    if isinstance(options, Mapping):
+        labels = sorted(options)
+        options = [str(options[k]) for k in labels]
+    elif isinstance(options, list):
+        labels = list(string.ascii_uppercase[: len(options)])
+        options = [str(o) for o in options]
+    else:
+        return None
+    if len(options) < 2:
+        return None
+    if isinstance(correct, list):
+        if len(correct) != 1:
+            return None
+        correct = correct[0]
+    if isinstance(correct, bool):
+        return None
+    if isinstance(correct, int):
+        if not 0 <= correct < len(options):
+            return None
+        correct = options[correct]
+    else:
+        correct = str(correct).strip()
+        if correct not in options:
+            letter = correct.rstrip(").").upper()
+            if letter not in labels:
+                return None
+            correct = options[labels.index(letter)]
+    item_id = raw.get("id", raw.get("question_id", default_id))
+    return {"id": item_id, "text": text, "options": options, "correct": correct}
+
+
+def shard_ranges(path: str, shard_bytes: int = 1 << 20, max_shards: int = 1024) -> List[Tuple[int, int]]:
+    """Split ``path`` into byte ranges of about ``shard_bytes``.
+
+    The split only depends on the file size, so a resumed run finds the same
+    shards (and checkpoints) whatever the number of worker processes.
+    """
+
+    size = os.path.getsize(path)
+    count = max(1, min(max_shards, -(-size // max(1, shard_bytes))))
+    bounds = [size * i // count for i in range(count + 1)]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def iter_shard(path: str, start: int, end: int) -> Iterator[Tuple[int, int, bytes]]:
+    """Yield ``(offset, next_offset, line)`` for the lines starting in ``[start, end)``."""
+
+    with open(path, "rb") as fh:
+        if start > 0:
+            # Skip the line that started in the previous shard; when byte
+            # ``start - 1`` is a newline this only consumes that newline.
+            fh.seek(start - 1)
+            fh.readline()
+        offset = fh.tell()
+        while offset < end:
+            line = fh.readline()
+            if not line:
+                break
+            following = offset + len(line)
+            yield offset, following, line
+            offset = following
+
+
+@dataclass
+class ShardProgress:
+    """Counts of one shard; also its checkpoint format.
+
+    ``offset`` is where the next unanswered line starts.  ``chance`` sums
+    ``1 / len(options)`` over the answered items, i.e. the expected number
+    of correct answers when guessing.
+    """
+
+    start: int
+    end: int
+    offset: int
+    items: int = 0
+    correct: int = 0
+    errors: int = 0
+    skipped: int = 0
+    chance: float = 0.0
+
+    @property
+    def done(self) -> bool:
+        return self.offset >= self.end
+
+    def merge(self, other: "ShardProgress") -> None:
+        self.items += other.items
+        self.correct += other.correct
+        self.errors += other.errors
+        self.skipped += other.skipped
+        self.chance += other.chance
+
+
+def load_checkpoint(path: Optional[str], start: int, end: int) -> ShardProgress:
+    """The saved progress of the shard ``[start, end)``, or a fresh one."""
+
+    if path and os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as fh:
+                data = json.load(fh)
+            known = {f.name for f in fields(ShardProgress)}
+            progress = ShardProgress(**{k: v for k, v in data.items() if k in known})
+            if (progress.start, progress.end) == (start, end):
+                return progress
+        except (OSError, ValueError, TypeError):
+            pass  # unreadable checkpoint: redo the shard
+    return ShardProgress(start=start, end=end, offset=start)
+
+
+def save_checkpoint(path: Optional[str], progress: ShardProgress) -> None:
+    if not path:
+        return
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(asdict(progress), fh)
+    os.replace(tmp, path)
+
+
+def portable(model: Any) -> Any:
+    """A copy of ``model`` that can be sent to a worker process.
+
+    Limiters and injected HTTP clients hold locks and sockets; the worker
+    runs without a limiter and uses its own shared client.
+    """
+
+    changes = {f.name: None for f in fields(model) if f.name in ("limiter", "client")}
+    return replace(model, **changes) if changes else model
+
+
+def run_shard(
+    model: Any,
+    path: str,
+    start: int,
+    end: int,
+    checkpoint: Optional[str] = None,
+    chunk_size: int = 256,
+    max_concurrency: int = 4,
+    timeout: float = 30,
+) -> ShardProgress:
+    """Answer the items of one shard and return its counts.
+
+    A module-level function so process pools can pickle it.
+    """
+
+    from . import EvaluationAgent  # the package imports this module
+
+    progress = load_checkpoint(checkpoint, start, end)
+    if progress.done:
+        return progress
+    agent = EvaluationAgent(
+        [model],
+        timeout=timeout,
+        max_concurrency=max_concurrency,
+        per_model_concurrency=max_concurrency,
+        retry_backoff=0.1,
+    )
+    chunk: List[Dict[str, Any]] = []
+    skipped = 0
+    next_offset = progress.offset
+
+    def flush() -> None:
+        nonlocal skipped
+        if chunk:
+            result = agent.evaluate_columnar(chunk)
+            asked = result.asked[0]
+            progress.items += int(asked.sum())
+            progress.correct += int((result.correct[0] & asked).sum())
+            progress.errors += int((result.answers[0] == FAILED).sum())
+            progress.chance += sum(1.0 / len(q["options"]) for q in chunk)
+            chunk.clear()
+        progress.skipped += skipped
+        skipped = 0
+        progress.offset = next_offset
+        save_checkpoint(checkpoint, progress)
+
+    for offset, following, line in iter_shard(path, progress.offset, end):
+        next_offset = following
+        try:
+            item = normalize_item(json.loads(line), default_id=offset)
+        except ValueError:
+            item = None
+        if item is None:
+            skipped += 1 if line.strip() else 0
+        else:
+            item["id"] = len(chunk)  # positions are unique within a chunk
+            chunk.append(item)
+        if len(chunk) >= chunk_size:
+            flush()
+    next_offset = max(next_offset, end)
+    flush()
+    return progress
+
+
+__all__ = [
+    "ShardProgress",
+    "iter_shard",
+    "load_checkpoint",
+    "normalize_item",
+    "portable",
+    "run_shard",
+    "save_checkpoint",
+    "shard_ranges",
+]
@@ -0,0 +1,585 @@
+"""Concurrent execution engine for model evaluations.
+
+The engine fans ``ModelAgent.ask`` calls out across models and questions at the
+same time while keeping two limits in place: a global cap on the number of
+in-flight calls and a per-model cap so a single provider is never flooded.
+Every call is bounded by ``timeout`` and retried up to the model's
+``max_retries`` attempts.  A model's circuit breaker fails its calls fast
+while the model keeps failing, and calls slower than usual are hedged with a
+duplicate call (see :mod:`backend.agents.resilience`).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import Executor, Future
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Callable, Deque, Dict, Iterator, List, Mapping, Optional, Protocol, Set, Tuple
+
+import numpy as np
+
+from . import metrics, tracing
+from .batching import MicroBatcher
+from .cache import AnswerCache, cache_key
+from .limits import ModelLimiter, RateLimitError, backoff_delay
+from .resilience import LatencyWindow
+from .results import NOT_ASKED, ColumnarResult
+
+if TYPE_CHECKING:  # pragma: no cover - imported for type hints only
+    from . import ModelAgent
+
+# Called with the question index, the model and its answer after every call.
+AnswerCallback = Callable[[int, "ModelAgent", Optional[str]], None]
+
+# Answers already obtained, keyed by ``(model_id, question_id)``.
+PriorAnswers = Mapping[Tuple[int, int], Optional[str]]
+
+
+class CallPool(Executor):
+    """Threads for the blocking model calls of one run.
+
+    Up to ``size`` threads run the calls the engine is waiting for.  A call
+    it gave up on (timed out, or a hedge that lost) cannot be interrupted and
+    keeps its thread until it returns, but it no longer counts against
+    ``size``: another thread is started in its place, so abandoned calls do
+    not hold up the calls that are still wanted.  Threads are daemons, so a
+    call that never returns does not block the interpreter from exiting.
+    """
+
+    def __init__(self, size: int, thread_name_prefix: str = "eval") -> None:
+        self.size = max(1, size)
+        self.thread_name_prefix = thread_name_prefix
+        self._cond = threading.Condition()
+        self._pending: Deque[Tuple[Future, Callable[..., Any], Tuple[Any, ...]]] = deque()
+        self._abandoned: Set[Future] = set()
+        self._threads = 0
+        self._idle = 0
+        self._closed = False
+
+    def submit(self, fn: Callable[..., Any], /, *args: Any, **kwargs: Any) -> Future:
+        if kwargs:
+            raise TypeError("CallPool.submit takes positional arguments only")
+        future: Future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("cannot schedule new calls after shutdown")
+            self._pending.append((future, fn, args))
+            self._dispatch()
+        return future
+
+    def run(self, fn: Callable[..., Any], *args: Any) -> "asyncio.Future[Any]":
+        """``fn(*args)`` on the pool as an asyncio future of the running loop.
+
+        Cancelling the returned future (``wait_for`` timing out, a lost
+        hedge) abandons the call.
+        """
+
+        call = self.submit(fn, *args)
+        wrapped = asyncio.wrap_future(call)
+        wrapped.add_done_callback(lambda f: self.abandon(call) if f.cancelled() else None)
+        return wrapped
+
+    def abandon(self, call: Future) -> None:
+        """Stop counting a running ``call`` against ``size``."""
+
+        with self._cond:
+            if call.done() or not call.running():
+                return  # finished, or cancelled before it started
+            self._abandoned.add(call)
+            self._dispatch()
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        with self._cond:
+            self._closed = True
+            if cancel_futures:
+                while self._pending:
+                    self._pending.popleft()[0].cancel()
+            self._cond.notify_all()
+            if wait:
+                while self._threads - len(self._abandoned) > 0:
+                    self._cond.wait()
+
+    @property
+    def threads(self) -> int:
+        return self._threads
+
+    def _dispatch(self) -> None:
+        # Called with the lock held.  ``_idle`` counts waiting threads,
+        # including those notified that have not taken their call yet.
+        if len(self._pending) <= self._idle:
+            self._cond.notify()
+        elif self._threads - len(self._abandoned) < self.size:
+            self._threads += 1
+            threading.Thread(
+                target=self._work, name=f"{self.thread_name_prefix}_{self._threads}", daemon=True
+            ).start()
+
+    def _work(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._idle += 1
+                    self._cond.wait()
+                    self._idle -= 1
+                if not self._pending:
+                    self._threads -= 1
+                    self._cond.notify_all()
+                    return
+                future, fn, args = self._pending.popleft()
+            if future.set_running_or_notify_cancel():
+                try:
+                    result = fn(*args)
+                except BaseException as exc:
+                    future.set_exception(exc)
+                else:
+                    future.set_result(result)
+            with self._cond:
+                self._abandoned.discard(future)
+                if self._threads - len(self._abandoned) > self.size:
+                    # This call was abandoned and its place has been taken.
+                    self._threads -= 1
+                    self._cond.notify_all()
+                    return
+
+
+class Schedule(Protocol):
+    """Decides lazily which pending pairs are asked (see :meth:`ExecutionEngine.run`)."""
+
+    def bind(self, result: ColumnarResult) -> None: ...
+
+    def wanted(self, question_index: int, model_index: int) -> bool: ...
+
+    def observe(self, question_index: int, model_index: int) -> None: ...
+
+
+@dataclass
+class ExecutionEngine:
+    """Run model calls concurrently with global and per-model limits.
+
+    Parameters
+    ----------
+    max_concurrency: int
+        Maximum number of ``ask`` calls in flight across all models.
+    per_model_concurrency: int
+        Maximum number of ``ask`` calls in flight for any single model.
+    timeout: float
+        Seconds allowed for a single ``ask`` attempt.
+    on_answer: callable, optional
+        Invoked on the event loop thread after every completed call.
+    cancel_event: threading.Event, optional
+        When set, no further calls are scheduled and the partial result is
+        returned.
+    cache: AnswerCache, optional
+        Answers are looked up here before calling the model and stored after
+        a successful call.  Hit and miss counts are reported under
+        ``"cache"`` in the result.
+    read_cache: bool
+        ``False`` skips lookups (fresh answers are still written), which is
+        how an evaluation bypasses the cache.
+    retry_backoff, retry_backoff_max: float
+        Base and cap, in seconds, of the jittered exponential backoff between
+        attempts.
+    throttle_retries: int
+        Throttled attempts (:class:`RateLimitError`) allowed per call on top
+        of the model's ``max_retries``.
+    max_batch_size, max_batch_wait: int, float
+        Micro-batching of models that support ``ask_batch``: questions are
+        grouped into batches of up to ``max_batch_size`` and a batch waits at
+        most ``max_batch_wait`` seconds to fill.  ``max_batch_size <= 1``
+        disables batching.  ``max_concurrency`` and ``per_model_concurrency``
+        then count batch calls rather than questions.
+    thread_name_prefix: str
+        Name prefix of the threads that run the blocking calls, which lets a
+        profiler tell the threads of one evaluation apart.
+    hedge_percentile: float
+        A single call still unanswered after this percentile of the model's
+        recent latencies gets a duplicate sent to ``model.replica()``; the
+        first answer wins.  ``0`` disables hedging.  Hedges only go out when
+        the model's rate limits have room for them right away.
+    hedge_min_samples: int
+        Successful calls of a model in this run before its calls are hedged.
+    count_answers: bool
+        ``False`` keeps the calls out of the answers metric, for runs whose
+        calls are not answers of the evaluation (peer grading).
+    """
+
+    max_concurrency: int = 16
+    per_model_concurrency: int = 4
+    timeout: float = 30
+    on_answer: Optional[AnswerCallback] = None
+    cancel_event: Optional[threading.Event] = None
+    cache: Optional[AnswerCache] = None
+    read_cache: bool = True
+    retry_backoff: float = 0.5
+    retry_backoff_max: float = 30.0
+    throttle_retries: int = 8
+    max_batch_size: int = 8
+    max_batch_wait: float = 0.01
+    thread_name_prefix: str = "eval"
+    hedge_percentile: float = 0
+    hedge_min_samples: int = 20
+    count_answers: bool = True
+
+    async def run(
+        self,
+        models: List["ModelAgent"],
+        questions: List[Dict[str, Any]],
+        prior: Optional[PriorAnswers] = None,
+        schedule: Optional[Schedule] = None,
+    ) -> ColumnarResult:
+        """Evaluate ``questions`` against ``models``.
+
+        Answers are written straight into a :class:`ColumnarResult`; call its
+        ``to_dict()`` for the ``{"models": ..., "questions": ...}`` shape.  A
+        call that keeps failing or timing out after all attempts is recorded
+        as a ``None`` answer and counted in the model's ``errors``.
+
+        ``prior`` maps ``(model_id, question_id)`` to an answer obtained
+        earlier (a checkpoint or a previous run).  Those pairs are copied into
+        the result without calling the model or ``on_answer``; their count is
+        reported as ``"reused"``.
+
+        A ``schedule`` sees the result once the prior answers are loaded
+        (``bind``), is asked whether each pending pair is still wanted right
+        before it would be scheduled (``wanted``) and is told about every new
+        answer (``observe``), so it can stop asking as answers come in.
+
+        Hedged calls are reported per model id under ``"hedges"`` (``sent``
+        and ``won``) and calls failed by an open circuit breaker under
+        ``"rejected"``.
+        """
+
+        result = ColumnarResult(models, questions)
+        self._cache_stats = {"hits": 0, "misses": 0}
+        self._latencies: Dict[int, LatencyWindow] = {}
+        self._hedges: Dict[int, Dict[str, int]] = {}
+        self._rejected: Dict[int, int] = {}
+        if prior:
+            result.extra["reused"] = result.preload(prior)
+        if schedule is not None:
+            schedule.bind(result)
+        if models and questions:
+            await self._execute(models, questions, result, schedule)
+        if self.cache is not None:
+            result.extra["cache"] = dict(self._cache_stats)
+        if self._hedges:
+            result.extra["hedges"] = self._hedges
+        if self._rejected:
+            result.extra["rejected"] = self._rejected
+        return result
+
+    async def _execute(
+        self,
+        models: List["ModelAgent"],
+        questions: List[Dict[str, Any]],
+        result: ColumnarResult,
+        schedule: Optional[Schedule] = None,
+    ) -> None:
+        todo = int(np.count_nonzero(result.answers == NOT_ASKED))
+        if not todo:
+            return
+        calls = max(1, min(self.max_concurrency, todo))
+        batch_size = max(1, self.max_batch_size)
+        batching = {
+            mi for mi, m in enumerate(models) if m.supports_batch and batch_size > 1
+        }
+        # With batching a worker waits for its batch to fill, so there must be
+        # enough workers (pending questions) to fill batches across models.
+        workers = min(todo, calls * (batch_size if batching else 1))
+        per_model = max(1, self.per_model_concurrency)
+        model_slots = [
+            asyncio.Semaphore(per_model * (batch_size if mi in batching else 1))
+            for mi in range(len(models))
+        ]
+        # Question-major order rotates consecutive work items across models so
+        # a saturated model does not starve the others of global slots.
+        pairs: Iterator[Tuple[int, int]] = (
+            (qi, mi)
+            for qi in range(len(questions))
+            for mi in range(len(models))
+            if result.answers[mi, qi] == NOT_ASKED
+            and (schedule is None or schedule.wanted(qi, mi))
+        )
+        # ``ask`` is blocking, so calls run on a dedicated pool sized to the
+        # global cap (twice that with hedges) instead of the loop's small
+        # default executor.  Calls that timed out do not take up its threads.
+        executor = CallPool(
+            calls * (2 if self.hedge_percentile > 0 else 1),
+            thread_name_prefix=self.thread_name_prefix,
+        )
+        self._call_slots = asyncio.Semaphore(calls)
+        batchers = {
+            mi: MicroBatcher(
+                self, executor, models[mi], batch_size, self.max_batch_wait, per_model
+            )
+            for mi in batching
+        }
+
+        cancel_event = self.cancel_event
+
+        async def worker() -> None:
+            for qi, mi in pairs:
+                m = models[mi]
+                async with model_slots[mi]:
+                    # Checked once the slot is free so waiting workers stop too.
+                    if cancel_event is not None and cancel_event.is_set():
+                        return
+                    answer = await self._ask(executor, m, questions[qi], batchers.get(mi))
+                result.record(qi, mi, answer)
+                if schedule is not None:
+                    schedule.observe(qi, mi)
+                if self.count_answers:
+                    metrics.ANSWERS.inc(str(m.model_id))
+                if self.on_answer is not None:
+                    self.on_answer(qi, m, answer)
+
+        try:
+            await asyncio.gather(*(worker() for _ in range(workers)))
+        finally:
+            # Timed-out calls may still be running; do not block on them.
+            executor.shutdown(wait=False)
+        if batchers:
+            result.extra["batches"] = {
+                models[mi].model_id: b.batches for mi, b in batchers.items()
+            }
+
+    async def _ask(
+        self,
+        executor: CallPool,
+        model: "ModelAgent",
+        q: Dict[str, Any],
+        batcher: Optional[MicroBatcher] = None,
+    ) -> Optional[str]:
+        key = None
+        if self.cache is not None:
+            key = cache_key(model.cache_identity(), q["text"], q["options"])
+            if self.read_cache:
+                # Memory hits are answered on the loop; the disk tier is
+                # read on a pool thread.
+                cached = self.cache.get(key, memory_only=True)
+                if cached is None and self.cache.persistent:
+                    cached = await executor.run(self.cache.get, key)
+                if cached is not None:
+                    self._cache_stats["hits"] += 1
+                    metrics.CACHE_REQUESTS.inc("hit")
+                    return cached
+            self._cache_stats["misses"] += 1
+            metrics.CACHE_REQUESTS.inc("miss")
+
+        if batcher is not None:
+            answer = await batcher.ask(q)
+        else:
+            answer = await self._call_single(executor, model, q)
+        if key is not None and answer is not None:
+            if self.cache.persistent:
+                await executor.run(self.cache.set, key, answer)
+            else:
+                self.cache.set(key, answer)
+        return answer
+
+    async def _call_single(
+        self, executor: CallPool, model: "ModelAgent", q: Dict[str, Any]
+    ) -> Optional[str]:
+        """``model.ask`` with limits, timeout, retries, backoff and hedging."""
+
+        loop = asyncio.get_running_loop()
+        limiter = model.limiter
+        tokens = model.estimate_tokens(q["text"], q["options"]) if limiter is not None else 0
+        failures = throttles = 0
+        while failures < max(1, model.max_retries):
+            ticket = self._admit(model)
+            if ticket is None:
+                return None
+            if limiter is not None:
+                await limiter.acquire(tokens)
+            outcome, started = "cancelled", loop.time()
+            error: Optional[BaseException] = None
+            try:
+                with tracing.span("model.ask", model_id=model.model_id, question_id=q["id"]) as span:
+                    async with self._call_slots:
+                        started = loop.time()
+                        try:
+                            answer = await self._first_answer(executor, model, q, tokens)
+                        except Exception as exc:  # timeouts and model errors both trigger a retry
+                            error = exc
+                    outcome = _observe(model, loop.time() - started, error)
+                    span.set(outcome=outcome)
+            finally:
+                _release(limiter, outcome, error, loop.time() - started)
+            _settle(model, ticket, outcome)
+            if isinstance(error, RateLimitError):
+                # Throttling says nothing about the question; it does not use
+                # up an attempt unless it keeps happening.
+                throttles += 1
+                if throttles > self.throttle_retries:
+                    return None
+                metrics.MODEL_RETRIES.inc(str(model.model_id), outcome)
+                delay = backoff_delay(throttles - 1, self.retry_backoff, self.retry_backoff_max)
+                await asyncio.sleep(max(delay, error.retry_after or 0))
+                continue
+            if error is not None:
+                failures += 1
+                if failures < max(1, model.max_retries):
+                    metrics.MODEL_RETRIES.inc(str(model.model_id), outcome)
+                    await asyncio.sleep(
+                        backoff_delay(failures - 1, self.retry_backoff, self.retry_backoff_max)
+                    )
+                continue
+            self._latencies.setdefault(model.model_id, LatencyWindow()).add(loop.time() - started)
+            return answer
+        return None
+
+    def _admit(self, model: "ModelAgent") -> Optional[int]:
+        """Breaker ticket of a call that may go out, ``None`` if it may not."""
+
+        if model.breaker is None:
+            return 0
+        ticket = model.breaker.allow()
+        if ticket is None:
+            metrics.MODEL_REJECTIONS.inc(str(model.model_id))
+            self._rejected[model.model_id] = self._rejected.get(model.model_id, 0) + 1
+        return ticket
+
+    def _hedge_delay(self, model: "ModelAgent") -> Optional[float]:
+        if self.hedge_percentile <= 0:
+            return None
+        window = self._latencies.get(model.model_id)
+        if window is None or len(window) < max(1, self.hedge_min_samples):
+            return None
+        delay = window.percentile(self.hedge_percentile)
+        return delay if delay is not None and delay < self.timeout else None
+
+    async def _first_answer(
+        self, executor: CallPool, model: "ModelAgent", q: Dict[str, Any], tokens: int
+    ) -> str:
+        """One ``ask`` attempt within ``timeout``, hedged once it is slow.
+
+        Raises the error of the last call to fail when no call answers, and
+        ``asyncio.TimeoutError`` when none finishes in time.
+        """
+
+        loop = asyncio.get_running_loop()
+        first = executor.run(model.ask, q["text"], q["options"])
+        delay = self._hedge_delay(model)
+        if delay is None:
+            return await asyncio.wait_for(first, self.timeout)
+        deadline = loop.time() + self.timeout
+        done, pending = await asyncio.wait({first}, timeout=delay)
+        if not done and (model.limiter is None or model.limiter.try_spare(tokens)):
+            replica = model.replica()
+            pending.add(executor.run(replica.ask, q["text"], q["options"]))
+            stats = self._hedges.setdefault(model.model_id, {"sent": 0, "won": 0})
+            stats["sent"] += 1
+            metrics.MODEL_HEDGES.inc(str(model.model_id), "sent")
+        pending |= done
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, timeout=max(0.0, deadline - loop.time()), return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    raise asyncio.TimeoutError()
+                for call in done:
+                    if call.exception() is None:
+                        if call is not first:
+                            self._hedges[model.model_id]["won"] += 1
+                            metrics.MODEL_HEDGES.inc(str(model.model_id), "won")
+                        return call.result()
+                    error = call.exception()
+            raise error
+        finally:
+            # The losing call is abandoned: it keeps its thread until it
+            # returns and its answer is dropped.
+            for call in pending:
+                call.cancel()
+
+    async def _call_batch(
+        self, executor: CallPool, model: "ModelAgent", qs: List[Dict[str, Any]]
+    ) -> Optional[List[Any]]:
+        """One ``model.ask_batch`` call; ``None`` when the call failed as a whole.
+
+        Throttled calls are retried after a backoff; other failures are left
+        to the :class:`MicroBatcher`, which splits the batch.
+        """
+
+        loop = asyncio.get_running_loop()
+        limiter = model.limiter
+        items = [(q["text"], q["options"]) for q in qs]
+        tokens = sum(model.estimate_tokens(t, o) for t, o in items) if limiter is not None else 0
+        throttles = 0
+        while True:
+            ticket = self._admit(model)
+            if ticket is None:
+                return None
+            if limiter is not None:
+                await limiter.acquire(tokens)
+            outcome, started = "cancelled", loop.time()
+            error: Optional[BaseException] = None
+            try:
+                with tracing.span("model.ask_batch", model_id=model.model_id, size=len(items)) as span:
+                    async with self._call_slots:
+                        started = loop.time()
+                        call = executor.run(model.ask_batch, items)
+                        try:
+                            answers = await asyncio.wait_for(call, self.timeout)
+                        except Exception as exc:
+                            error = exc
+                    outcome = _observe(model, loop.time() - started, error)
+                    span.set(outcome=outcome)
+            finally:
+                _release(limiter, outcome, error, loop.time() - started)
+            _settle(model, ticket, outcome)
+            if isinstance(error, RateLimitError):
+                throttles += 1
+                if throttles > self.throttle_retries:
+                    return None
+                metrics.MODEL_RETRIES.inc(str(model.model_id), outcome)
+                delay = backoff_delay(throttles - 1, self.retry_backoff, self.retry_backoff_max)
+                await asyncio.sleep(max(delay, error.retry_after or 0))
+                continue
+            if error is not None:
+                return None
+            answers = list(answers or [])
+            return answers if len(answers) == len(items) else None
+
+
+def _release(
+    limiter: Optional[ModelLimiter], outcome: str, error: Optional[BaseException], latency: float
+) -> None:
+    """Give a call's limiter slot back, also when the call was cancelled."""
+
+    if limiter is None:
+        return
+    retry_after = error.retry_after if isinstance(error, RateLimitError) else None
+    limiter.release(outcome, latency=latency if outcome == "ok" else None, retry_after=retry_after)
+
+
+def _settle(model: "ModelAgent", ticket: int, outcome: str) -> None:
+    """Report a call to the model's circuit breaker; throttling is not a failure."""
+
+    if model.breaker is not None and outcome != "throttled":
+        model.breaker.record(outcome == "ok", ticket)
+
+
+def _observe(model: "ModelAgent", seconds: float, error: Optional[BaseException]) -> str:
+    """Record one model call in the metrics and return its outcome."""
+
+    if error is None:
+        outcome = "ok"
+    elif isinstance(error, RateLimitError):
+        outcome = "throttled"
+    elif isinstance(error, asyncio.TimeoutError):
+        outcome = "timeout"
+    else:
+        outcome = "error"
+    label = str(model.model_id)
+    metrics.MODEL_ASK_SECONDS.observe(seconds, label, outcome)
+    if error is not None:
+        metrics.MODEL_ERRORS.inc(label, outcome)
+    return outcome
+
+
+__all__ = ["ExecutionEngine"]
@@ -0,0 +1,445 @@
+"""Per-model rate limiting and adaptive concurrency.
+
+Every model gets one :class:`ModelLimiter`, shared by all evaluations in the
+process.  It combines two token buckets (requests and tokens per minute) with
+an AIMD concurrency limit: each successful call raises the limit by
+``1 / limit`` and a throttled call, a timeout or a latency spike halves it.
+Limiters are thread safe and may be used from several event loops at once,
+since every evaluation job runs its own loop.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+
+# Latency samples needed before latency spikes start lowering the limit.
+_MIN_LATENCY_SAMPLES = 5
+
+
+class RateLimitError(Exception):
+    """Raised by ``ModelAgent.ask`` when the provider throttles a call.
+
+    Throttled calls are retried after backing off without using up one of the
+    model's ``max_retries`` attempts.
+
+    Parameters
+    ----------
+    retry_after: float, optional
+        Seconds the provider asked us to wait, e.g. from a ``Retry-After``
+        header.
+    """
+
+    def __init__(self, message: str = "rate limited", retry_after: Optional[float] = None) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def backoff_delay(attempt: int, base: float, cap: float, rng: Any = random) -> float:
+    """Exponential backoff with full jitter for the ``attempt``-th retry."""
+
+    return rng.uniform(0, min(cap, base * 2 ** max(0, attempt)))
+
+
+def estimate_tokens(question: str, options: Iterable[str], completion: int = 16) -> int:
+    """Rough token count of one call: about four characters per token."""
+
+    chars = len(question) + sum(len(str(o)) for o in options)
+    return max(1, chars // 4) + completion
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at ``per_minute / 60`` per second.
+
+    Callers reserve tokens up front and wait for the returned delay, so the
+    bucket never blocks and can be shared between threads and event loops.
+    ``per_minute <= 0`` disables the bucket.
+    """
+
+    def __init__(self, per_minute: float = 0) -> None:
+        self._lock = threading.Lock()
+        self.configure(per_minute)
+        self._blocked_until = 0.0
+
+    def configure(self, per_minute: float) -> None:
+        with self._lock:
+            self.per_minute = per_minute or 0
+            self.capacity = float(self.per_minute)
+            self._tokens = self.capacity
+            self._updated = time.monotonic()
+
+    @property
+    def enabled(self) -> bool:
+        return self.per_minute > 0
+
+    def _refill(self, now: float) -> None:
+        rate = self.per_minute / 60.0
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * rate)
+        self._updated = now
+
+    def reserve(self, amount: float = 1) -> float:
+        """Take ``amount`` tokens and return the seconds to wait before using them."""
+
+        now = time.monotonic()
+        with self._lock:
+            blocked = max(0.0, self._blocked_until - now)
+            if not self.enabled:
+                return blocked
+            self._refill(now)
+            self._tokens -= amount
+            if self._tokens >= 0:
+                return blocked
+            return max(blocked, -self._tokens / (self.per_minute / 60.0))
+
+    def try_take(self, amount: float = 1) -> bool:
+        """Take ``amount`` tokens only if they are available right now."""
+
+        now = time.monotonic()
+        with self._lock:
+            if self._blocked_until > now:
+                return False
+            if not self.enabled:
+                return True
+            self._refill(now)
+            if self._tokens < amount:
+                return False
+            self._tokens -= amount
+            return True
+
+    def refund(self, amount: float = 1) -> None:
+        with self._lock:
+            if self.enabled:
+                self._tokens = min(self.capacity, self._tokens + amount)
+
+    def block(self, seconds: float) -> None:
+        """Hold back every reservation for ``seconds`` (a provider ``Retry-After``)."""
+
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+    def state(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            if self.enabled:
+                self._refill(now)
+            return {
+                "per_minute": self.per_minute,
+                "available": round(self._tokens, 2) if self.enabled else None,
+                "blocked_for": round(max(0.0, self._blocked_until - now), 3),
+            }
+
+
+def _grant(future: "asyncio.Future[None]") -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class AdaptiveConcurrency:
+    """AIMD limit on the calls in flight for one model.
+
+    Parameters
+    ----------
+    initial, minimum, maximum: int
+        Starting value and bounds of the limit.
+    decrease: float
+        Factor applied to the limit on throttling, timeouts and latency spikes.
+    latency_spike: float
+        A call slower than this multiple of the average latency counts as a
+        spike.
+    decrease_interval: float
+        Minimum seconds between two decreases, so a burst of failures from one
+        overloaded moment only backs off once.
+    """
+
+    def __init__(
+        self,
+        initial: int = 4,
+        minimum: int = 1,
+        maximum: int = 16,
+        decrease: float = 0.5,
+        latency_spike: float = 3.0,
+        decrease_interval: float = 1.0,
+        smoothing: float = 0.2,
+    ) -> None:
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self._limit = float(min(self.maximum, max(self.minimum, initial)))
+        self.decrease = decrease
+        self.latency_spike = latency_spike
+        self.decrease_interval = decrease_interval
+        self.smoothing = smoothing
+        self.in_flight = 0
+        self.latency: Optional[float] = None
+        self._samples = 0
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+        self._waiters: Deque[Tuple[asyncio.AbstractEventLoop, "asyncio.Future[None]"]] = deque()
+
+    @property
+    def limit(self) -> int:
+        return max(self.minimum, int(self._limit))
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> None:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self.in_flight < self.limit and not self._waiters:
+                self.in_flight += 1
+                return
+            future = loop.create_future()
+            self._waiters.append((loop, future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                try:
+                    self._waiters.remove((loop, future))
+                    granted = False
+                except ValueError:
+                    granted = True
+            if granted:  # the slot was handed over while we were cancelled
+                self.release()
+            raise
+
+    def release(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            self._wake()
+
+    def _wake(self) -> None:
+        while self._waiters and self.in_flight < self.limit:
+            loop, future = self._waiters.popleft()
+            self.in_flight += 1
+            try:
+                loop.call_soon_threadsafe(_grant, future)
+            except RuntimeError:  # that loop has been closed
+                self.in_flight -= 1
+
+    def on_success(self, latency: float) -> None:
+        with self._lock:
+            spike = (
+                self._samples >= _MIN_LATENCY_SAMPLES
+                and self.latency is not None
+                and latency > self.latency_spike * self.latency
+            )
+            if spike:
+                self._decrease()
+            else:
+                self._limit = min(self.maximum, self._limit + 1.0 / self._limit)
+            if self.latency is None:
+                self.latency = latency
+            else:
+                self.latency += self.smoothing * (latency - self.latency)
+            self._samples += 1
+            self._wake()
+
+    def on_overload(self) -> None:
+        """Throttled or timed-out call: back off multiplicatively."""
+
+        with self._lock:
+            self._decrease()
+
+    def _decrease(self) -> None:
+        now = time.monotonic()
+        if now - self._last_decrease < self.decrease_interval:
+            return
+        self._last_decrease = now
+        self._limit = max(float(self.minimum), self._limit * self.decrease)
+
+
+class ModelLimiter:
+    """Request/token buckets plus adaptive concurrency for one model.
+
+    Parameters
+    ----------
+    model_id: int
+        Model the limiter belongs to.
+    requests_per_minute, tokens_per_minute: float
+        Bucket rates; ``0`` means unlimited.
+    initial_concurrency, min_concurrency, max_concurrency: int
+        See :class:`AdaptiveConcurrency`.
+    latency_spike: float
+        See :class:`AdaptiveConcurrency`.
+    """
+
+    def __init__(
+        self,
+        model_id: int,
+        requests_per_minute: float = 0,
+        tokens_per_minute: float = 0,
+        initial_concurrency: int = 4,
+        min_concurrency: int = 1,
+        max_concurrency: int = 16,
+        latency_spike: float = 3.0,
+    ) -> None:
+        self.model_id = model_id
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.concurrency = AdaptiveConcurrency(
+            initial=initial_concurrency,
+            minimum=min_concurrency,
+            maximum=max_concurrency,
+            latency_spike=latency_spike,
+        )
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.throttled = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.wait_seconds = 0.0
+
+    def configure(self, requests_per_minute: float, tokens_per_minute: float, max_concurrency: int) -> None:
+        """Apply changed settings, keeping the learned concurrency limit."""
+
+        if requests_per_minute != self.requests.per_minute:
+            self.requests.configure(requests_per_minute)
+        if tokens_per_minute != self.tokens.per_minute:
+            self.tokens.configure(tokens_per_minute)
+        self.concurrency.maximum = max(self.concurrency.minimum, max_concurrency)
+
+    async def acquire(self, tokens: int = 1) -> None:
+        """Wait for a concurrency slot and for both buckets; pair with :meth:`release`."""
+
+        started = time.monotonic()
+        await self.concurrency.acquire()
+        try:
+            delay = max(self.requests.reserve(1), self.tokens.reserve(tokens))
+            if delay > 0:
+                await asyncio.sleep(delay)
+        except BaseException:
+            self.concurrency.release()
+            raise
+        with self._lock:
+            self.wait_seconds += time.monotonic() - started
+
+    def try_spare(self, tokens: int = 1) -> bool:
+        """Charge an extra call (a hedge) only if both buckets allow it now.
+
+        The call does not take a concurrency slot: it runs in the slot of the
+        call it duplicates.
+        """
+
+        if not self.requests.try_take(1):
+            return False
+        if not self.tokens.try_take(tokens):
+            self.requests.refund(1)
+            return False
+        return True
+
+    def release(self, outcome: str, latency: Optional[float] = None, retry_after: Optional[float] = None) -> None:
+        """Report how the call ended: ``ok``, ``throttled``, ``timeout`` or ``error``.
+
+        ``cancelled`` only gives the concurrency slot back.
+        """
+
+        with self._lock:
+            if outcome != "cancelled":
+                self.calls += 1
+            if outcome == "throttled":
+                self.throttled += 1
+            elif outcome == "timeout":
+                self.timeouts += 1
+            elif outcome == "error":
+                self.errors += 1
+        if outcome == "ok" and latency is not None:
+            self.concurrency.on_success(latency)
+        elif outcome in ("throttled", "timeout"):
+            self.concurrency.on_overload()
+        if retry_after:
+            self.requests.block(retry_after)
+        self.concurrency.release()
+
+    def state(self) -> Dict[str, Any]:
+        concurrency = self.concurrency
+        with self._lock:
+            counters = {
+                "calls": self.calls,
+                "throttled": self.throttled,
+                "timeouts": self.timeouts,
+                "errors": self.errors,
+                "wait_seconds": round(self.wait_seconds, 3),
+            }
+        return {
+            "model_id": self.model_id,
+            "concurrency": {
+                "limit": concurrency.limit,
+                "in_flight": concurrency.in_flight,
+                "waiting": concurrency.waiting,
+                "max": concurrency.maximum,
+                "latency": round(concurrency.latency, 4) if concurrency.latency is not None else None,
+            },
+            "requests": self.requests.state(),
+            "tokens": self.tokens.state(),
+            **counters,
+        }
+
+
+class LimiterRegistry:
+    """Process-wide :class:`ModelLimiter` per model id.
+
+    ``defaults`` is the ``limits`` config section; per-model overrides (from
+    the ``Model`` record) are passed to :meth:`get`, which can also be given
+    the section of a specific config instead of ``defaults``.
+    """
+
+    def __init__(self, defaults: Optional[Dict[str, Any]] = None) -> None:
+        self.defaults = dict(defaults or {})
+        self._limiters: Dict[int, ModelLimiter] = {}
+        self._lock = threading.Lock()
+
+    def get(
+        self,
+        model_id: int,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        max_concurrency: Optional[int] = None,
+        defaults: Optional[Dict[str, Any]] = None,
+    ) -> ModelLimiter:
+        d = self.defaults if defaults is None else defaults
+        rpm = requests_per_minute if requests_per_minute is not None else d.get("requests_per_minute", 0)
+        tpm = tokens_per_minute if tokens_per_minute is not None else d.get("tokens_per_minute", 0)
+        ceiling = max_concurrency if max_concurrency is not None else d.get("max_concurrency", 16)
+        with self._lock:
+            limiter = self._limiters.get(model_id)
+            if limiter is None:
+                limiter = ModelLimiter(
+                    model_id,
+                    requests_per_minute=rpm,
+                    tokens_per_minute=tpm,
+                    initial_concurrency=min(ceiling, d.get("initial_concurrency", 4)),
+                    min_concurrency=d.get("min_concurrency", 1),
+                    max_concurrency=ceiling,
+                    latency_spike=d.get("latency_spike", 3.0),
+                )
+                self._limiters[model_id] = limiter
+            else:
+                limiter.configure(rpm, tpm, ceiling)
+        return limiter
+
+    def find(self, model_id: int) -> Optional[ModelLimiter]:
+        return self._limiters.get(model_id)
+
+    def state(self, model_ids: Optional[Iterable[int]] = None) -> List[Dict[str, Any]]:
+        if model_ids is None:
+            limiters = list(self._limiters.values())
+        else:
+            limiters = [self._limiters[i] for i in model_ids if i in self._limiters]
+        return [limiter.state() for limiter in limiters]
+
+
+__all__ = [
+    "AdaptiveConcurrency",
+    "LimiterRegistry",
+    "ModelLimiter",
+    "RateLimitError",
+    "TokenBucket",
+    "backoff_delay",
+    "estimate_tokens",
+]
@@ -0,0 +1,301 @@
+"""Low-overhead metrics in the Prometheus text format.
+
+Counters and histograms keep one shard per thread: the thread that records a
+value is the only writer of its shard, so the hot path takes no lock and
+never contends with other workers.  :meth:`Registry.render` sums the shards
+when ``/metrics`` is scraped; a scrape may miss an increment that is in
+progress, which only delays it to the next scrape.  Gauges are callbacks
+evaluated at scrape time, so they cost nothing in between.
+
+The metrics recorded by the execution engine are defined at the bottom of
+this module; the API defines its own in ``backend/metrics.py``.
+"""
+
+from __future__ import annotations
+
+import bisect
+import math
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+Labels = Tuple[str, ...]
+
+# Seconds; suits both sub-millisecond queries and slow model calls.
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(str(v))}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class _Sharded(_Metric):
+    """Base for metrics whose values live in per-thread shards."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._local = threading.local()
+        self._shards: List[Dict[Labels, object]] = []
+        self._lock = threading.Lock()
+
+    def _shard(self) -> Dict[Labels, object]:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard: Dict[Labels, object] = {}
+            with self._lock:
+                # Shards of finished threads stay: their counts must not vanish.
+                self._shards.append(shard)
+            self._local.shard = shard
+            return shard
+
+    def _snapshot(self) -> List[Dict[Labels, object]]:
+        with self._lock:
+            return [dict(s) for s in self._shards]
+
+    def clear(self) -> None:
+        with self._lock:
+            for shard in self._shards:
+                shard.clear()
+
+
+class Counter(_Sharded):
+    """Monotonic counter, optionally split by labels."""
+
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0.0) + amount
+
+    def values(self) -> Dict[Labels, float]:
+        totals: Dict[Labels, float] = {}
+        for shard in self._snapshot():
+            for labels, value in shard.items():
+                totals[labels] = totals.get(labels, 0.0) + value
+        return totals
+
+    def value(self, *labels: str) -> float:
+        return self.values().get(labels, 0.0)
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in sorted(self.values().items())
+        ]
+
+
+class Histogram(_Sharded):
+    """Cumulative histogram with fixed bucket bounds."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels: str) -> None:
+        shard = self._shard()
+        cell = shard.get(labels)
+        if cell is None:
+            # bucket counts, then +Inf, then sum
+            cell = shard[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        cell[bisect.bisect_left(self.buckets, value)] += 1
+        cell[-1] += value
+
+    def values(self) -> Dict[Labels, List[float]]:
+        totals: Dict[Labels, List[float]] = {}
+        for shard in self._snapshot():
+            for labels, cell in shard.items():
+                total = totals.setdefault(labels, [0] * (len(self.buckets) + 1) + [0.0])
+                for i, v in enumerate(list(cell)):
+                    total[i] += v
+        return totals
+
+    def count(self, *labels: str) -> int:
+        cell = self.values().get(labels)
+        return int(sum(cell[:-1])) if cell else 0
+
+    def samples(self) -> List[str]:
+        lines = []
+        for labels, cell in sorted(self.values().items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets + (math.inf,), cell[:-1]):
+                cumulative += n
+                names = self.labelnames + ("le",)
+                values = labels + (_format_value(bound),)
+                lines.append(f"{self.name}_bucket{_format_labels(names, values)} {cumulative}")
+            suffix = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{suffix} {_format_value(cell[-1])}")
+            lines.append(f"{self.name}_count{suffix} {cumulative}")
+        return lines
+
+
+class Gauge(_Metric):
+    """Value computed by ``function`` at scrape time.
+
+    ``function`` returns a number, or a mapping of label tuples to numbers.
+    """
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        function: Callable[[], object],
+        labelnames: Sequence[str] = (),
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.function = function
+
+    def samples(self) -> List[str]:
+        value = self.function()
+        items = value.items() if isinstance(value, dict) else [((), value)]
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(v)}"
+            for labels, v in sorted(items)
+        ]
+
+
+class Registry:
+    """Collection of metrics rendered together."""
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"metric {metric.name} already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(
+        self,
+        name: str,
+        documentation: str,
+        function: Callable[[], object],
+        labelnames: Sequence[str] = (),
+    ) -> Gauge:
+        return self.register(Gauge(name, documentation, function, labelnames))
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines += metric.header()
+            lines += metric.samples()
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+MODEL_ASK_SECONDS = REGISTRY.histogram(
+    "axiom_model_ask_seconds",
+    "Duration of model calls (ask or ask_batch) by outcome.",
+    ("model", "outcome"),
+)
+MODEL_ERRORS = REGISTRY.counter(
+    "axiom_model_errors_total",
+    "Failed model calls by kind (error, timeout, throttled).",
+    ("model", "kind"),
+)
+MODEL_RETRIES = REGISTRY.counter(
+    "axiom_model_retries_total",
+    "Model calls retried after a failure or throttling.",
+    ("model", "reason"),
+)
+MODEL_HEDGES = REGISTRY.counter(
+    "axiom_model_hedged_calls_total",
+    "Duplicate calls sent for slow model calls, and those that answered first.",
+    ("model", "result"),
+)
+MODEL_REJECTIONS = REGISTRY.counter(
+    "axiom_model_circuit_rejections_total",
+    "Model calls failed fast because the model's circuit breaker was open.",
+    ("model",),
+)
+ANSWERS = REGISTRY.counter(
+    "axiom_answers_total",
+    "Answers recorded by evaluations; rate() gives answers per second.",
+    ("model",),
+)
+CACHE_REQUESTS = REGISTRY.counter(
+    "axiom_answer_cache_requests_total",
+    "Answer cache lookups by result (hit or miss).",
+    ("result",),
+)
+
+
+__all__ = [
+    "ANSWERS",
+    "CACHE_REQUESTS",
+    "Counter",
+    "DEFAULT_BUCKETS",
+    "Gauge",
+    "Histogram",
+    "MODEL_ASK_SECONDS",
+    "MODEL_ERRORS",
+    "MODEL_HEDGES",
+    "MODEL_REJECTIONS",
+    "MODEL_RETRIES",
+    "REGISTRY",
+    "Registry",
+]
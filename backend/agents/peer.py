@@ -0,0 +1,136 @@
+"""Peer cross-evaluation: models grading each other's answers.
+
+After every model has answered, each distinct ``(question, answer)`` pair
+becomes one grading item, a two-option question ("correct" / "incorrect")
+built by :func:`grading_prompt`.  Every grader answers every item through
+the regular :class:`~backend.agents.engine.ExecutionEngine`, so grader calls
+get the same concurrency limits, retries, micro-batching and answer cache as
+normal calls.
+
+Models that gave the same answer share one item, so a grader makes at most
+one call per distinct answer of a question instead of one per model: the
+number of grader calls grows with ``models × distinct answers`` (bounded by
+the option count), not with ``models²``.  The answer cache key contains the
+grader and the item text, which dedups identical judgments across runs as
+well.
+
+:func:`peer_matrix` folds the verdicts into per-KU ``grader × gradee``
+count matrices.
+"""
+
+from __future__ import annotations
+
+import string
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .results import NOT_ASKED, ColumnarResult
+
+GRADE_OPTIONS = ["correct", "incorrect"]
+
+
+def grading_prompt(question: str, options: Iterable[str], answer: str) -> str:
+    """Question asking a grader whether ``answer`` is right."""
+
+    lines = [question, ""]
+    lines += [f"{letter}. {option}" for letter, option in zip(string.ascii_uppercase, options)]
+    lines += ["", f"Proposed answer: {answer}", "Is the proposed answer correct?"]
+    return "\n".join(lines)
+
+
+def grading_items(result: ColumnarResult) -> Tuple[List[Dict[str, Any]], np.ndarray]:
+    """Distinct answers to grade and where each model's answer maps to.
+
+    Returns the grading items (question payloads for the engine; the
+    ``correct`` option is the ground truth) and a ``(models, questions)``
+    array with the item index of every answer, ``-1`` where a model has no
+    answer to grade.
+    """
+
+    models, count = result.answers.shape
+    index = np.full((models, count), -1, dtype=np.int64)
+    items: List[Dict[str, Any]] = []
+    for j, q in enumerate(result.questions):
+        seen: Dict[str, int] = {}
+        for i in range(models):
+            text = result.answer_text(i, j)
+            if text is None:
+                continue
+            k = seen.get(text)
+            if k is None:
+                k = seen[text] = len(items)
+                items.append(
+                    {
+                        "id": k,
+                        "text": grading_prompt(q["text"], q.get("options") or (), text),
+                        "options": GRADE_OPTIONS,
+                        "correct": GRADE_OPTIONS[0] if text == q["correct"] else GRADE_OPTIONS[1],
+                    }
+                )
+            index[i, j] = k
+    return items, index
+
+
+def _matrix(counts: np.ndarray, totals: np.ndarray) -> List[List[Optional[float]]]:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rates = counts / totals
+    return [[None if t == 0 else float(r) for r, t in zip(row, trow)] for row, trow in zip(rates, totals)]
+
+
+def peer_matrix(result: ColumnarResult, grades: ColumnarResult, index: np.ndarray) -> Dict[str, Any]:
+    """Summarize the graders' verdicts on the answers of ``result``.
+
+    ``judged[k][g][m]`` counts the answers of model ``m`` in KU ``k`` that
+    grader ``g`` returned a verdict on and ``approved[k][g][m]`` those it
+    called correct; ``approval`` is the overall ``approved / judged`` rate.
+    ``peer_score`` is each model's approval by the *other* graders and
+    ``grader_accuracy`` how often a grader's verdicts match the answer key.
+    """
+
+    # Grade option 0 is "correct" and 1 "incorrect"; negative codes (failed
+    # calls, replies that are neither) give no verdict.
+    codes = grades.answers
+    if codes.shape[1] == 0:
+        codes = np.full((codes.shape[0], 1), NOT_ASKED, dtype=codes.dtype)  # nothing to grade
+    has = index >= 0
+    items = np.where(has, index, 0)
+
+    ku_count = len(result.kus)
+    onehot = np.zeros((len(result.questions), max(1, ku_count)), dtype=np.int64)
+    onehot[np.arange(len(result.questions)), result.ku_codes] = 1
+    graders = codes.shape[0]
+    judged_ku = np.zeros((onehot.shape[1], graders, len(result.model_ids)), dtype=np.int64)
+    approved_ku = np.zeros_like(judged_ku)
+    # One grader at a time keeps the working set at (models, questions).
+    for g in range(graders):
+        verdict = codes[g][items]
+        valid = has & ((verdict == 0) | (verdict == 1))
+        judged_ku[:, g] = (valid.astype(np.int64) @ onehot).T
+        approved_ku[:, g] = ((valid & (verdict == 0)).astype(np.int64) @ onehot).T
+
+    judged = judged_ku.sum(axis=0)
+    approved_total = approved_ku.sum(axis=0)
+    others = ~np.eye(len(result.model_ids), dtype=bool)
+    peer_judged = (judged * others).sum(axis=0)
+    peer_approved = (approved_total * others).sum(axis=0)
+    model_ids = result.model_ids.tolist()
+    return {
+        "model_ids": model_ids,
+        "kus": result.kus,
+        "judged": judged_ku.tolist(),
+        "approved": approved_ku.tolist(),
+        "approval": _matrix(approved_total, judged),
+        "peer_score": {
+            mid: (float(a) / n if n else None)
+            for mid, a, n in zip(model_ids, peer_approved.tolist(), peer_judged.tolist())
+        },
+        "grader_accuracy": {m["id"]: m["accuracy"] for m in grades.model_summary()},
+        "items": len(grades.questions),
+        "grader_calls": int(grades.asked.sum()),
+        # What grading every answer separately would have taken.
+        "pairwise_calls": int(has.sum()) * len(model_ids),
+    }
+
+
+__all__ = ["GRADE_OPTIONS", "grading_items", "grading_prompt", "peer_matrix"]
@@ -0,0 +1,255 @@
+"""Circuit breakers and latency tracking for hedged model calls.
+
+Every model gets one :class:`CircuitBreaker`, shared by all evaluations in the
+process like its :class:`~backend.agents.limits.ModelLimiter`.  The breaker
+watches the outcome of the last ``window`` calls and opens once at least
+``min_calls`` of them are known and the share of failures (errors and
+timeouts, not throttling) reaches ``error_rate``.  While it is open, calls
+fail immediately instead of waiting for their timeout and retries, so a
+provider that is down does not stall an evaluation.  After ``cooldown``
+seconds one probe call is let through (half open): a success closes the
+breaker, a failure opens it for another cooldown.  Every state change starts
+a new generation and :meth:`CircuitBreaker.allow` hands out tickets of the
+current one; a result reported with an older ticket is ignored, so a slow
+call started before the breaker opened can neither close it nor count
+against the next window.  ``on_change`` is told when a breaker opens or
+closes, which is how the ``models`` table marks a model ``degraded``.
+
+:class:`LatencyWindow` keeps the recent successful latencies of a model; the
+engine sends a duplicate (hedged) call once a call has taken longer than a
+percentile of them.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Called with the model id and the new state (``open`` or ``closed``).
+StateCallback = Callable[[int, str], None]
+
+
+class CircuitBreaker:
+    """Failure-rate circuit breaker of one model.
+
+    Parameters
+    ----------
+    model_id: int
+        Model the breaker belongs to.
+    window: int
+        Number of recent call outcomes considered.
+    min_calls: int
+        Outcomes needed in the window before the breaker can open.
+    error_rate: float
+        Share of failed calls in the window that opens the breaker; ``0``
+        disables the breaker.
+    cooldown: float
+        Seconds the breaker stays open before letting a probe call through.
+    on_change: callable, optional
+        Invoked as ``on_change(model_id, state)`` when the breaker opens or
+        closes again.
+    """
+
+    def __init__(
+        self,
+        model_id: int,
+        window: int = 20,
+        min_calls: int = 10,
+        error_rate: float = 0.5,
+        cooldown: float = 30.0,
+        on_change: Optional[StateCallback] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.model_id = model_id
+        self.on_change = on_change
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probe_at: Optional[float] = None
+        self._generation = 1
+        self._outcomes: Deque[bool] = deque(maxlen=max(1, window))
+        self.opened = 0
+        self.rejected = 0
+        self.configure(window, min_calls, error_rate, cooldown)
+
+    def configure(self, window: int, min_calls: int, error_rate: float, cooldown: float) -> None:
+        with self._lock:
+            self.window = max(1, window)
+            self.min_calls = max(1, min(min_calls, self.window))
+            self.error_rate = error_rate
+            self.cooldown = cooldown
+            if self._outcomes.maxlen != self.window:
+                self._outcomes = deque(self._outcomes, maxlen=self.window)
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and self._clock() - self._opened_at >= self.cooldown:
+                return HALF_OPEN
+            return self._state
+
+    def allow(self) -> Optional[int]:
+        """Ticket for a call that may go out now, ``None`` if it may not.
+
+        The ticket is passed back to :meth:`record` with the outcome.  Calls
+        turned away are counted.
+        """
+
+        with self._lock:
+            now = self._clock()
+            if self._state == OPEN and now - self._opened_at >= self.cooldown:
+                self._state = HALF_OPEN
+            if self._state == HALF_OPEN:
+                # One probe at a time; a probe that never reported back (its
+                # evaluation was cancelled) is replaced after a cooldown.
+                if self._probe_at is None or now - self._probe_at >= self.cooldown:
+                    self._probe_at = now
+                    self._generation += 1
+                    return self._generation
+            elif self._state == CLOSED:
+                return self._generation
+            self.rejected += 1
+            return None
+
+    def record(self, ok: bool, ticket: int) -> None:
+        """Report the outcome of a call allowed with ``ticket``."""
+
+        changed = None
+        with self._lock:
+            if ticket != self._generation:
+                # Late result of a call made before the last state change
+                # (or of a probe that was replaced).
+                pass
+            elif self._state == HALF_OPEN:
+                if ok:
+                    self._state, changed = CLOSED, CLOSED
+                    self._outcomes.clear()
+                    self._generation += 1
+                else:
+                    self._trip()
+                self._probe_at = None
+            elif self._state == CLOSED:
+                self._outcomes.append(ok)
+                failures = len(self._outcomes) - sum(self._outcomes)
+                if (
+                    self.error_rate > 0
+                    and len(self._outcomes) >= self.min_calls
+                    and failures >= self.error_rate * len(self._outcomes)
+                ):
+                    self._trip()
+                    changed = OPEN
+        if changed is not None and self.on_change is not None:
+            try:
+                self.on_change(self.model_id, changed)
+            except Exception:  # a failing listener must not fail the call
+                logger.exception("circuit breaker listener failed for model %s", self.model_id)
+
+    def _trip(self) -> None:
+        self._state = OPEN
+        self._opened_at = self._clock()
+        self._outcomes.clear()
+        self._generation += 1
+        self.opened += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        state = self.state
+        with self._lock:
+            calls = len(self._outcomes)
+            failures = calls - sum(self._outcomes)
+            return {
+                "model_id": self.model_id,
+                "state": state,
+                "calls": calls,
+                "failures": failures,
+                "opened": self.opened,
+                "rejected": self.rejected,
+                "retry_in": (
+                    round(max(0.0, self.cooldown - (self._clock() - self._opened_at)), 3)
+                    if state == OPEN
+                    else None
+                ),
+            }
+
+
+class BreakerRegistry:
+    """Process-wide :class:`CircuitBreaker` per model id.
+
+    ``defaults`` is the ``limits`` config section (its ``breaker_*`` keys);
+    :meth:`get` can be given the section of a specific config instead.
+    """
+
+    def __init__(self, defaults: Optional[Dict[str, Any]] = None, on_change: Optional[StateCallback] = None) -> None:
+        self.defaults = dict(defaults or {})
+        self.on_change = on_change
+        self._breakers: Dict[int, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, model_id: int, defaults: Optional[Dict[str, Any]] = None) -> CircuitBreaker:
+        d = self.defaults if defaults is None else defaults
+        settings = (
+            d.get("breaker_window", 20),
+            d.get("breaker_min_calls", 10),
+            d.get("breaker_error_rate", 0.5),
+            d.get("breaker_cooldown", 30.0),
+        )
+        with self._lock:
+            breaker = self._breakers.get(model_id)
+            if breaker is None:
+                breaker = CircuitBreaker(model_id, *settings, on_change=self.on_change)
+                self._breakers[model_id] = breaker
+            else:
+                breaker.configure(*settings)
+        return breaker
+
+    def find(self, model_id: int) -> Optional[CircuitBreaker]:
+        return self._breakers.get(model_id)
+
+    def state(self, model_ids: Optional[Iterable[int]] = None) -> List[Dict[str, Any]]:
+        if model_ids is None:
+            breakers = list(self._breakers.values())
+        else:
+            breakers = [self._breakers[i] for i in model_ids if i in self._breakers]
+        return [breaker.snapshot() for breaker in breakers]
+
+
+class LatencyWindow:
+    """The last ``size`` latencies of successful calls of one model."""
+
+    def __init__(self, size: int = 200) -> None:
+        self._values: Deque[float] = deque(maxlen=size)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def add(self, seconds: float) -> None:
+        self._values.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """The ``q``-th percentile (nearest rank), ``None`` without samples."""
+
+        if not self._values:
+            return None
+        ordered = sorted(self._values)
+        rank = max(1, math.ceil(q / 100.0 * len(ordered)))
+        return ordered[min(rank, len(ordered)) - 1]
+
+
+__all__ = [
+    "BreakerRegistry",
+    "CLOSED",
+    "CircuitBreaker",
+    "HALF_OPEN",
+    "LatencyWindow",
+    "OPEN",
+]
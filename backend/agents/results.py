@@ -0,0 +1,234 @@
+"""Columnar storage for evaluation results.
+
+A run is stored as a handful of NumPy arrays instead of one dictionary per
+question: question and model ids, a ``(models, questions)`` matrix of small
+integer answer codes and a packed correctness bitmap.  The familiar
+``{"models": ..., "questions": ...}`` shape is only produced on demand (for
+API responses), and the arrays can be written to ``.npy`` files or handed to
+other libraries as raw buffers without copying.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .analytics import ResultMatrix
+
+# Answer codes below zero; non-negative codes index the question's options.
+NOT_ASKED = -1
+FAILED = -2
+OTHER = -3  # an answer that is not one of the options, kept in ``other``
+
+
+class ColumnarResult:
+    """Evaluation result held as arrays.
+
+    Parameters
+    ----------
+    models: sequence
+        Objects with ``model_id`` and ``name`` attributes (``ModelAgent``).
+    questions: sequence of dict
+        The question payloads (``id``, ``options``, ``correct`` and optionally
+        ``ku``).  They are referenced, not copied, and only used to encode
+        answers and to rebuild the legacy dictionaries.
+    """
+
+    def __init__(self, models: Sequence[Any], questions: Sequence[Dict[str, Any]]) -> None:
+        self.model_ids = np.fromiter((m.model_id for m in models), dtype=np.int64, count=len(models))
+        self.model_names: List[str] = [m.name for m in models]
+        self.question_ids = np.fromiter(
+            (q["id"] for q in questions), dtype=np.int64, count=len(questions)
+        )
+        self.questions = questions
+        width = max((len(q.get("options") or ()) for q in questions), default=0)
+        dtype = np.int8 if width < np.iinfo(np.int8).max else np.int16
+        self.answers = np.full((len(models), len(questions)), NOT_ASKED, dtype=dtype)
+        self.correct_index = np.full(len(questions), NOT_ASKED, dtype=dtype)
+        kus: Dict[str, int] = {}
+        self.ku_codes = np.zeros(len(questions), dtype=np.int32)
+        self._option_codes: List[Dict[str, int]] = []
+        for j, q in enumerate(questions):
+            codes = {o: k for k, o in enumerate(q.get("options") or ())}
+            self._option_codes.append(codes)
+            self.correct_index[j] = codes.get(q["correct"], OTHER)
+            self.ku_codes[j] = kus.setdefault(q.get("ku") or "", len(kus))
+        self.kus: List[str] = list(kus)
+        self.other: Dict[Tuple[int, int], str] = {}
+        self.extra: Dict[str, Any] = {}
+        self._row = {mid: i for i, mid in enumerate(self.model_ids.tolist())}
+        self._bits: Optional[np.ndarray] = None
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+    def row(self, model_id: int) -> int:
+        return self._row[model_id]
+
+    def preload(self, prior: Mapping[Tuple[int, int], Optional[str]]) -> int:
+        """Record answers from an earlier run keyed by ``(model_id, question_id)``.
+
+        Pairs for models or questions outside this result are ignored; the
+        number of answers taken over is returned.
+        """
+
+        columns = {qid: j for j, qid in enumerate(self.question_ids.tolist())}
+        loaded = 0
+        for (model_id, question_id), answer in prior.items():
+            i, j = self._row.get(model_id), columns.get(question_id)
+            if i is None or j is None:
+                continue
+            self.record(j, i, answer)
+            loaded += 1
+        return loaded
+
+    def record(self, question_index: int, model_index: int, answer: Optional[str]) -> None:
+        """Store one answer; ``None`` marks a call that failed."""
+
+        if answer is None:
+            code = FAILED
+        else:
+            code = self._option_codes[question_index].get(answer, OTHER)
+            if code == OTHER:
+                self.other[(model_index, question_index)] = answer
+        self.answers[model_index, question_index] = code
+        self._bits = None
+
+    # ------------------------------------------------------------------
+    # Derived arrays
+    # ------------------------------------------------------------------
+    @property
+    def correct(self) -> np.ndarray:
+        """Boolean ``(models, questions)`` correctness matrix."""
+
+        matches = self.answers == self.correct_index
+        if self.other:
+            # Answers outside the options can still equal a free-form key.
+            for (i, j), answer in self.other.items():
+                matches[i, j] = answer == self.questions[j]["correct"]
+        return matches
+
+    @property
+    def correct_bits(self) -> np.ndarray:
+        """Correctness packed eight answers per byte along the question axis."""
+
+        if self._bits is None:
+            self._bits = np.packbits(self.correct, axis=1)
+        return self._bits
+
+    @property
+    def asked(self) -> np.ndarray:
+        return self.answers != NOT_ASKED
+
+    def answer_text(self, model_index: int, question_index: int) -> Optional[str]:
+        code = int(self.answers[model_index, question_index])
+        if code >= 0:
+            return self.questions[question_index]["options"][code]
+        if code == OTHER:
+            return self.other[(model_index, question_index)]
+        return None
+
+    # ------------------------------------------------------------------
+    # Conversions
+    # ------------------------------------------------------------------
+    def model_summary(self) -> List[Dict[str, Any]]:
+        """Per-model counts in the legacy ``models`` list format."""
+
+        asked = self.asked.sum(axis=1)
+        correct = (self.correct & self.asked).sum(axis=1)
+        errors = (self.answers == FAILED).sum(axis=1)
+        out = []
+        for i, mid in enumerate(self.model_ids.tolist()):
+            total = int(asked[i]) or 1
+            out.append(
+                {
+                    "id": mid,
+                    "name": self.model_names[i],
+                    "correct": int(correct[i]),
+                    "total": total,
+                    "errors": int(errors[i]),
+                    "accuracy": int(correct[i]) / total,
+                }
+            )
+        return out
+
+    def iter_questions(self) -> Iterator[Dict[str, Any]]:
+        """Yield the legacy per-question dictionaries one at a time."""
+
+        asked = self.asked
+        for j, q in enumerate(self.questions):
+            row = {"id": q["id"], "answers": {}, "correct": q["correct"]}
+            if "ku" in q:
+                row["ku"] = q["ku"]
+            for i in np.flatnonzero(asked[:, j]).tolist():
+                row["answers"][int(self.model_ids[i])] = self.answer_text(i, j)
+            yield row
+
+    def to_dict(self) -> Dict[str, Any]:
+        """The ``{"models": ..., "questions": ...}`` shape plus any extras."""
+
+        return {"models": self.model_summary(), "questions": list(self.iter_questions()), **self.extra}
+
+    def to_matrix(self) -> ResultMatrix:
+        """View for :class:`~backend.agents.analytics.AnalyticsEngine`."""
+
+        asked = self.asked
+        answered = asked & (self.answers != FAILED)
+        return ResultMatrix(
+            model_ids=self.model_ids,
+            question_ids=self.question_ids,
+            kus=self.kus,
+            ku_codes=self.ku_codes,
+            correct=self.correct & answered,
+            answered=answered,
+            choices=np.where(answered, self.answers, NOT_ASKED).astype(np.int16, copy=False),
+        )
+
+    def buffers(self) -> Dict[str, memoryview]:
+        """Raw, zero-copy buffers of the columns (Arrow-style)."""
+
+        return {
+            "question_ids": memoryview(self.question_ids),
+            "model_ids": memoryview(self.model_ids),
+            "ku_codes": memoryview(self.ku_codes),
+            "correct_index": memoryview(self.correct_index),
+            "answers": memoryview(np.ascontiguousarray(self.answers)),
+            "correct_bits": memoryview(self.correct_bits),
+        }
+
+    def save(self, directory: str) -> None:
+        """Write every column as an ``.npy`` file plus ``meta.json``."""
+
+        os.makedirs(directory, exist_ok=True)
+        for name in ("question_ids", "model_ids", "ku_codes", "correct_index", "answers", "correct_bits"):
+            np.save(os.path.join(directory, f"{name}.npy"), getattr(self, name))
+        meta = {
+            "model_names": self.model_names,
+            "kus": self.kus,
+            "questions": len(self.question_ids),
+            "other": [[i, j, a] for (i, j), a in self.other.items()],
+            "extra": self.extra,
+        }
+        with open(os.path.join(directory, "meta.json"), "w") as fh:
+            json.dump(meta, fh)
+
+
+def load_columns(directory: str, mmap: bool = True) -> Dict[str, Any]:
+    """Load columns written by :meth:`ColumnarResult.save`.
+
+    With ``mmap`` the arrays are memory-mapped rather than read into memory.
+    """
+
+    mode = "r" if mmap else None
+    columns: Dict[str, Any] = {}
+    for name in ("question_ids", "model_ids", "ku_codes", "correct_index", "answers", "correct_bits"):
+        columns[name] = np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mode)
+    with open(os.path.join(directory, "meta.json")) as fh:
+        columns["meta"] = json.load(fh)
+    return columns
+
+
+__all__ = ["ColumnarResult", "load_columns", "NOT_ASKED", "FAILED", "OTHER"]
@@ -0,0 +1,195 @@
+"""MinHash/LSH index for finding near-duplicate questions.
+
+A question is reduced to a set of shingles: the word bigrams of its text and
+each of its options as a whole, after folding case and punctuation, so option
+order does not matter.  The Jaccard similarity of two shingle sets is
+estimated from :data:`NUM_PERM` MinHash values per question, and
+locality-sensitive hashing over bands of those values finds the candidates of
+a query without comparing it with the whole bank.  Candidates are verified
+against the estimated similarity, so the bands only trade recall around the
+threshold for speed, never precision.
+"""
+
+from __future__ import annotations
+
+import re
+import threading
+import zlib
+from typing import Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+NUM_PERM = 128
+_PRIME = (1 << 31) - 1
+_WORD = re.compile(r"\w+")
+
+_rng = np.random.default_rng(20240611)
+_A = _rng.integers(1, _PRIME, NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, _PRIME, NUM_PERM, dtype=np.uint64)
+
+
+def shingles(text: str, options: Iterable[str] = ()) -> Set[str]:
+    """Word bigrams of ``text`` plus every option as one token."""
+
+    words = _WORD.findall(text.casefold())
+    found = {" ".join(pair) for pair in zip(words, words[1:])} or set(words)
+    found.update("\x1f" + " ".join(_WORD.findall(str(o).casefold())) for o in options)
+    return found
+
+
+def signature(text: str, options: Iterable[str] = ()) -> np.ndarray:
+    """MinHash signature (``NUM_PERM`` values) of a question."""
+
+    return signatures([(text, options)])[0]
+
+
+def signatures(questions: Iterable[Tuple[str, Iterable[str]]]) -> np.ndarray:
+    """Signatures of many ``(text, options)`` pairs as a ``(n, NUM_PERM)`` array.
+
+    The hashing of all shingles is one array operation, which makes bulk
+    loads much cheaper than calling :func:`signature` per question.
+    """
+
+    hashes: List[int] = []
+    starts: List[int] = []
+    for text, options in questions:
+        starts.append(len(hashes))
+        hashes.extend(zlib.crc32(t.encode("utf-8")) % _PRIME for t in shingles(text, options) or {""})
+    if not starts:
+        return np.empty((0, NUM_PERM), dtype=np.uint32)
+    x = np.array(hashes, dtype=np.uint64)
+    values = (_A[:, None] * x[None, :] + _B[:, None]) % _PRIME
+    return np.minimum.reduceat(values, starts, axis=1).T.astype(np.uint32)
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of two signatures."""
+
+    return float(np.count_nonzero(a == b)) / len(a)
+
+
+def band_rows(threshold: float, num_perm: int = NUM_PERM) -> int:
+    """Rows per LSH band for ``threshold``.
+
+    Two questions become candidates when all rows of any band agree, which
+    happens with probability ``1 - (1 - s**rows)**bands`` for similarity
+    ``s``.  The largest band whose 50% point lies a little below
+    ``threshold`` keeps recall high at the threshold with few candidates.
+    """
+
+    best = 1
+    for rows in (r for r in range(1, num_perm + 1) if num_perm % r == 0):
+        if (rows / num_perm) ** (1.0 / rows) <= threshold - 0.05:
+            best = rows
+    return best
+
+
+class MinHashIndex:
+    """Incrementally updated LSH index of question signatures.
+
+    Parameters
+    ----------
+    threshold: float
+        Estimated Jaccard similarity from which questions count as near
+        duplicates.  Queries may raise it; lowering it below the value the
+        bands were built for loses recall.
+    """
+
+    def __init__(self, threshold: float = 0.8) -> None:
+        self.threshold = threshold
+        self.rows = band_rows(threshold)
+        self._bands: List[Dict[bytes, Set[Hashable]]] = [{} for _ in range(NUM_PERM // self.rows)]
+        self._signatures: Dict[Hashable, np.ndarray] = {}
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._signatures
+
+    def _keys(self, sig: np.ndarray) -> Iterable[Tuple[int, bytes]]:
+        for band in range(len(self._bands)):
+            yield band, sig[band * self.rows : (band + 1) * self.rows].tobytes()
+
+    def add(self, key: Hashable, sig: np.ndarray) -> None:
+        """Index ``sig`` (from :func:`signature`) under ``key``, replacing an older entry."""
+
+        with self._lock:
+            self.remove(key)
+            self._signatures[key] = sig
+            for band, bucket in self._keys(sig):
+                self._bands[band].setdefault(bucket, set()).add(key)
+
+    def remove(self, key: Hashable) -> None:
+        with self._lock:
+            sig = self._signatures.pop(key, None)
+            if sig is None:
+                return
+            for band, bucket in self._keys(sig):
+                members = self._bands[band].get(bucket)
+                if members is not None:
+                    members.discard(key)
+                    if not members:
+                        del self._bands[band][bucket]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._signatures.clear()
+            for band in self._bands:
+                band.clear()
+
+    def query(
+        self, sig: np.ndarray, threshold: Optional[float] = None, exclude: Optional[Hashable] = None
+    ) -> List[Tuple[Hashable, float]]:
+        """Indexed keys similar to ``sig``, most similar first."""
+
+        threshold = self.threshold if threshold is None else threshold
+        with self._lock:
+            candidates: Set[Hashable] = set()
+            for band, bucket in self._keys(sig):
+                candidates.update(self._bands[band].get(bucket, ()))
+            candidates.discard(exclude)
+            scored = [(key, similarity(sig, self._signatures[key])) for key in candidates]
+        matches = [(key, round(s, 4)) for key, s in scored if s >= threshold]
+        return sorted(matches, key=lambda m: (-m[1], m[0]))
+
+    def clusters(self, threshold: Optional[float] = None) -> List[List[Hashable]]:
+        """Groups of keys linked by near-duplicate pairs, each sorted.
+
+        Only keys sharing an LSH bucket are compared, so the cost depends on
+        the number of candidate pairs rather than on the square of the size.
+        Keys must be sortable (question ids).
+        """
+
+        threshold = self.threshold if threshold is None else threshold
+        parent: Dict[Hashable, Hashable] = {}
+
+        def find(key: Hashable) -> Hashable:
+            root = parent.setdefault(key, key)
+            while parent[root] != root:
+                root = parent[root]
+            while parent[key] != root:
+                parent[key], key = root, parent[key]
+            return root
+
+        with self._lock:
+            for band in self._bands:
+                for members in band.values():
+                    if len(members) < 2:
+                        continue
+                    keys = list(members)
+                    sigs = np.stack([self._signatures[k] for k in keys])
+                    for i in range(len(keys) - 1):
+                        agree = (sigs[i + 1 :] == sigs[i]).mean(axis=1)
+                        for j in np.flatnonzero(agree >= threshold).tolist():
+                            a, b = find(keys[i]), find(keys[i + 1 + j])
+                            if a != b:
+                                parent[a] = b
+        groups: Dict[Hashable, List[Hashable]] = {}
+        for key in list(parent):
+            groups.setdefault(find(key), []).append(key)
+        return sorted(sorted(g) for g in groups.values() if len(g) > 1)
+
+
+__all__ = ["MinHashIndex", "NUM_PERM", "band_rows", "shingles", "signature", "signatures", "similarity"]
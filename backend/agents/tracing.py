@@ -0,0 +1,246 @@
+"""Lightweight span tracing with local exporters.
+
+Spans are opened with :func:`span` as a context manager; the current span is
+kept in a :mod:`contextvars` variable, so nesting works across ``await`` and
+asyncio tasks (which copy the context they are created in).  Finished spans
+go to the tracer's exporters: an in-memory :class:`RingBufferExporter` by
+default, or a :class:`JSONFileExporter` writing one JSON object per line.
+No external collector is involved.
+
+:meth:`Tracer.collect` additionally sums span durations by name for one
+trace, which gives the per-stage breakdown of a profiled evaluation.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import itertools
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional
+
+_current: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("axiom_span", default=None)
+_span_ids = itertools.count(1)
+
+
+def new_trace_id() -> str:
+    # 32 hex digits like ``uuid4().hex``; ids need not be unpredictable, and
+    # ``os.urandom`` would be a syscall per orphan span.
+    return f"{random.getrandbits(128):032x}"
+
+
+@dataclass
+class Span:
+    """One timed operation; use it as a context manager (see :meth:`Tracer.span`)."""
+
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str] = None
+    start: float = 0.0
+    duration: Optional[float] = None
+    thread: str = ""
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    _tracer: Optional["Tracer"] = field(default=None, repr=False, compare=False)
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.start,
+            "duration": self.duration,
+            "thread": self.thread,
+            "attributes": self.attributes,
+        }
+
+    def __enter__(self) -> "Span":
+        self._token = _current.set(self)
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.duration = time.perf_counter() - self._started
+        if exc is not None:
+            self.attributes.setdefault("error", f"{exc_type.__name__}: {exc}")
+        try:
+            _current.reset(self._token)
+        except ValueError:
+            # Exited from another context: a coroutine closed while its
+            # event loop is torn down.  That context is gone anyway.
+            pass
+        self._tracer._finish(self)
+
+
+class _NoopSpan:
+    """Stands in for spans while tracing is disabled."""
+
+    def set(self, **attributes: Any) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class RingBufferExporter:
+    """Keep the most recent ``size`` spans in memory."""
+
+    def __init__(self, size: int = 10000) -> None:
+        self._spans: Deque[Span] = deque(maxlen=max(1, size))
+
+    def export(self, span: Span) -> None:
+        self._spans.append(span)
+
+    def spans(self, trace_id: Optional[str] = None) -> List[Span]:
+        spans = list(self._spans)
+        if trace_id is not None:
+            spans = [s for s in spans if s.trace_id == trace_id]
+        return spans
+
+    def clear(self) -> None:
+        self._spans.clear()
+
+
+class JSONFileExporter:
+    """Append finished spans to ``path`` as JSON lines."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), default=str) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as fh:
+                fh.write(line)
+
+
+class Tracer:
+    """Create spans and hand finished ones to ``exporters``."""
+
+    def __init__(self, exporters: Optional[List[Any]] = None) -> None:
+        self.exporters: List[Any] = list(exporters or [])
+        self._stages: Dict[str, Dict[str, List[float]]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.exporters or self._stages)
+
+    def span(self, name: str, trace_id: Optional[str] = None, **attributes: Any) -> Span:
+        """A span timing the ``with`` block as a child of the current span.
+
+        ``trace_id`` starts the span in that trace instead (e.g. on a worker
+        thread that has no parent span); without either a new trace begins.
+        """
+
+        if not self.enabled:
+            return _NOOP  # type: ignore[return-value]
+        parent = _current.get()
+        if trace_id is None:
+            trace_id = parent.trace_id if parent is not None else new_trace_id()
+        elif parent is not None and parent.trace_id != trace_id:
+            parent = None
+        return Span(
+            name,
+            trace_id,
+            f"{next(_span_ids):x}",
+            parent.span_id if parent is not None else None,
+            time.time(),
+            None,
+            threading.current_thread().name,
+            attributes,
+            self,
+        )
+
+    def _finish(self, span: Span) -> None:
+        stages = self._stages.get(span.trace_id)
+        if stages is not None:
+            with self._lock:
+                total = stages.setdefault(span.name, [0, 0.0])
+                total[0] += 1
+                total[1] += span.duration or 0.0
+        for exporter in self.exporters:
+            exporter.export(span)
+
+    def collect(self, trace_id: str) -> None:
+        """Start summing span durations by name for ``trace_id``."""
+
+        with self._lock:
+            self._stages.setdefault(trace_id, {})
+
+    def stages(self, trace_id: str, stop: bool = True) -> Dict[str, Dict[str, float]]:
+        """Per-name span count and total seconds collected for ``trace_id``."""
+
+        with self._lock:
+            stages = self._stages.pop(trace_id, {}) if stop else dict(self._stages.get(trace_id, {}))
+        return {
+            name: {"count": int(count), "seconds": round(seconds, 6)}
+            for name, (count, seconds) in sorted(stages.items())
+        }
+
+    def spans(self, trace_id: str) -> List[Span]:
+        """Spans of ``trace_id`` still held by in-memory exporters."""
+
+        found: List[Span] = []
+        for exporter in self.exporters:
+            if isinstance(exporter, RingBufferExporter):
+                found += exporter.spans(trace_id)
+        return found
+
+
+TRACER = Tracer([RingBufferExporter()])
+
+
+def configure(exporter: str = "memory", path: str = "traces.jsonl", buffer_size: int = 10000) -> Tracer:
+    """Select the exporter of the global tracer: ``memory``, ``file`` or ``none``."""
+
+    if exporter == "memory":
+        TRACER.exporters = [RingBufferExporter(buffer_size)]
+    elif exporter == "file":
+        TRACER.exporters = [JSONFileExporter(path)]
+    elif exporter == "none":
+        TRACER.exporters = []
+    else:
+        raise ValueError(f"unknown trace exporter '{exporter}'")
+    return TRACER
+
+
+def span(name: str, trace_id: Optional[str] = None, **attributes: Any) -> Span:
+    """A span of the global tracer (see :meth:`Tracer.span`)."""
+
+    return TRACER.span(name, trace_id, **attributes)
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+__all__ = [
+    "JSONFileExporter",
+    "RingBufferExporter",
+    "Span",
+    "TRACER",
+    "Tracer",
+    "configure",
+    "current_span",
+    "new_trace_id",
+    "span",
+]
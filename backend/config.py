@@ -1,8 +1,11 @@
 """Simple configuration values for the demo backend implementation."""
 
-# In a real world project these values would be loaded from environment
-# variables or a dedicated configuration system.  To keep this example
-# self‑contained we simply define them here.
+import os
+
+# Tunables are read from environment variables and fall back to the defaults
+# below.  The demo credentials and token are fixed to keep this example
+# self‑contained; a real world project would load them from a dedicated
+# configuration system.
 
 # Dummy user credentials for the `/api/login` endpoint.
 DEFAULT_USERNAME = "admin"
@@ -12,6 +15,53 @@ DEFAULT_PASSWORD = "password"
 # API simply verifies that the incoming requests contain this token.
 ACCESS_TOKEN = "fake-token"
 
+# Number of evaluations executed concurrently by the background job runner.
+EVALUATION_WORKERS = int(os.getenv("EVALUATION_WORKERS", "2"))
+
+# Number of answers buffered before they are bulk inserted into the database.
+ANSWER_BATCH_SIZE = int(os.getenv("ANSWER_BATCH_SIZE", "500"))
+
+# Seconds a cached per-KU question id index may be reused before reloading.
+SAMPLER_INDEX_TTL = float(os.getenv("SAMPLER_INDEX_TTL", "300"))
+
+# Estimated Jaccard similarity of text and options from which two questions
+# are near duplicates (``GET /questions/duplicates``, ``reject_similar``
+# imports and ``skip_duplicates`` evaluations).
+DUPLICATE_THRESHOLD = float(os.getenv("DUPLICATE_THRESHOLD", "0.8"))
+
+# Rows validated and inserted per transaction by the bulk question importer.
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "5000"))
+
+# Answers read and encoded per chunk by ``GET /evaluations/{id}/export``.
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "10000"))
+
+# Live evaluation progress streams: answer events kept in memory per running
+# job, events buffered per subscriber before it has to catch up from history,
+# and the seconds between keep-alives and database polls.
+PROGRESS_HISTORY_SIZE = int(os.getenv("PROGRESS_HISTORY_SIZE", "10000"))
+PROGRESS_BUFFER_SIZE = int(os.getenv("PROGRESS_BUFFER_SIZE", "1000"))
+PROGRESS_KEEPALIVE = float(os.getenv("PROGRESS_KEEPALIVE", "15"))
+PROGRESS_POLL_INTERVAL = float(os.getenv("PROGRESS_POLL_INTERVAL", "1"))
+
+# Span tracing: ``memory`` keeps the last TRACE_BUFFER_SIZE spans for
+# ``GET /evaluations/{id}/trace``, ``file`` appends them to TRACE_FILE as JSON
+# lines and ``none`` disables tracing unless an evaluation is profiled.
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "memory")
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", "10000"))
+
+# Seconds between stack samples of a profiled evaluation and the number of
+# functions kept in its stored profile.
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.005"))
+PROFILE_TOP = int(os.getenv("PROFILE_TOP", "30"))
+
+# Local benchmark datasets: the directory registered dataset paths are
+# relative to, worker processes per run (0 uses every core) and where shard
+# checkpoints of unfinished runs are kept.
+BENCHMARK_DIR = os.getenv("BENCHMARK_DIR", "datasets")
+BENCHMARK_PROCESSES = int(os.getenv("BENCHMARK_PROCESSES", "0"))
+BENCHMARK_CHECKPOINT_DIR = os.getenv("BENCHMARK_CHECKPOINT_DIR", ".benchmark_checkpoints")
+
 
 def verify_credentials(username: str, password: str) -> bool:
     """Validate a username and password pair.
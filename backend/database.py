@@ -1,14 +1,147 @@
 import os
-from sqlalchemy import create_engine
+
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, declarative_base
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./axiom.db")
 
-connect_args = {}
-if DATABASE_URL.startswith("sqlite"):
-    connect_args = {"check_same_thread": False}
+# Connection pool of both engines (ignored for in-memory SQLite, which needs
+# a single shared connection).
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Seconds after which a pooled connection is replaced (-1 keeps it forever).
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in {"1", "true", "yes"}
+
+# SQLite runs in WAL mode so readers are not blocked while a job writes
+# answers; writers wait up to the busy timeout (ms) instead of failing.
+SQLITE_BUSY_TIMEOUT = int(os.getenv("SQLITE_BUSY_TIMEOUT", "5000"))
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "-65536"))  # KiB when negative
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+_ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+}
+
+
+def _is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+
+def _is_memory(url: str) -> bool:
+    path = url.partition("://")[2].lstrip("/").split("?", 1)[0]
+    return _is_sqlite(url) and (path in ("", ":memory:") or "mode=memory" in url)
+
+
+def async_database_url(url: str) -> str:
+    """The async driver URL (aiosqlite / asyncpg) for a sync ``url``."""
+
+    scheme, sep, rest = url.partition("://")
+    dialect = scheme.split("+", 1)[0]
+    return _ASYNC_DRIVERS.get(dialect, scheme) + sep + rest
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", async_database_url(DATABASE_URL))
+
+
+def data_directory(url: str) -> str:
+    """Directory of a SQLite database file, the working directory otherwise."""
+
+    if _is_sqlite(url) and not _is_memory(url):
+        path = url.partition("://")[2].split("?", 1)[0]
+        # ``sqlite:///rel.db`` is relative, ``sqlite:////abs.db`` absolute.
+        return os.path.dirname(os.path.abspath(path[1:]))
+    return os.path.abspath(".")
+
+
+# Local files that belong with the database (the answer cache) go here.
+DATA_DIR = os.getenv("DATA_DIR", data_directory(DATABASE_URL))
+
+
+def engine_options(url: str) -> dict:
+    """Keyword arguments for ``create_engine`` / ``create_async_engine``."""
+
+    options = {"pool_pre_ping": DB_POOL_PRE_PING}
+    if _is_sqlite(url):
+        options["connect_args"] = {"check_same_thread": False}
+    if not _is_memory(url):
+        options.update(
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+        )
+    return options
 
-engine = create_engine(DATABASE_URL, connect_args=connect_args)
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT}")
+        cursor.execute(f"PRAGMA cache_size={SQLITE_CACHE_SIZE}")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+    finally:
+        cursor.close()
+
+
+def _tune(sync_engine) -> None:
+    if sync_engine.dialect.name == "sqlite":
+        event.listen(sync_engine, "connect", _set_sqlite_pragmas)
+
+
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL))
+_tune(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+_async_engine = None
+_async_sessionmaker = None
+
+
+def get_async_engine():
+    """The shared async engine, created on first use.
+
+    Creating it lazily means the async driver only has to be installed by
+    deployments that serve the async endpoints.  Its statements are timed by
+    the query metrics like those of the sync engine.
+    """
+
+    global _async_engine
+    if _async_engine is None:
+        from sqlalchemy.ext.asyncio import create_async_engine
+
+        from .metrics import instrument_engine
+
+        _async_engine = create_async_engine(ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL))
+        _tune(_async_engine.sync_engine)
+        instrument_engine(_async_engine.sync_engine)
+    return _async_engine
+
+
+def AsyncSessionLocal():
+    """Open an ``AsyncSession`` on the shared async engine."""
+
+    global _async_sessionmaker
+    if _async_sessionmaker is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker
+
+        _async_sessionmaker = async_sessionmaker(
+            get_async_engine(), autoflush=False, expire_on_commit=False
+        )
+    return _async_sessionmaker()
+
+
+async def dispose_async_engine() -> None:
+    global _async_engine, _async_sessionmaker
+    if _async_engine is not None:
+        await _async_engine.dispose()
+    _async_engine = None
+    _async_sessionmaker = None
+
+
 Base = declarative_base()
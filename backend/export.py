@@ -0,0 +1,319 @@
+"""Streaming export of evaluation results as CSV or Parquet.
+
+Two tables can be exported: ``answers`` (one row per stored answer) and
+``models`` (one row per model with its accuracy overall and per KU).
+Answers are read in keyset-paginated chunks on the answer primary key, each
+chunk with a short-lived session, and every chunk is encoded and handed to
+the caller before the next one is read.  Memory use therefore depends on
+``chunk_size`` only, and the first bytes are available after the first
+chunk.
+
+CSV output can be compressed with gzip or zstd on the fly.  Parquet uses its
+own column compression (``gzip`` or ``zstd`` select the codec) and writes
+one row group per chunk.  Parquet needs ``pyarrow`` and zstd-compressed CSV
+needs ``zstandard``; both are optional and only imported when requested.
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import zlib
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from . import models as db_models
+from .storage import format_evaluation_id
+
+FORMATS = ("csv", "parquet")
+COMPRESSIONS = ("none", "gzip", "zstd")
+TABLES = ("answers", "models")
+
+ANSWER_COLUMNS = [
+    "evaluation_id",
+    "model_id",
+    "model_name",
+    "question_id",
+    "ku",
+    "answer",
+    "correct_answer",
+    "correct",
+]
+MODEL_COLUMNS = ["evaluation_id", "model_id", "model_name", "answered", "correct", "errors", "accuracy"]
+# Column types of the Parquet schema, so chunks with missing values agree.
+ANSWER_TYPES = ["str", "int", "str", "int", "str", "str", "str", "bool"]
+MODEL_TYPES = ["str", "int", "str", "int", "int", "int", "float"]
+
+MEDIA_TYPES = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+
+
+class ExportError(ValueError):
+    """An export option that cannot be served (unknown, or its package is missing)."""
+
+
+Rows = List[Tuple[Any, ...]]
+
+
+# ---------------------------------------------------------------------------
+# Reading
+# ---------------------------------------------------------------------------
+def _model_names(db: Session, evaluation: db_models.Evaluation) -> Dict[int, str]:
+    names = {m["id"]: m["name"] for m in evaluation.results or []}
+    missing = [mid for mid in evaluation.model_ids or [] if mid not in names]
+    if missing:
+        rows = db.execute(select(db_models.Model.id, db_models.Model.name).where(db_models.Model.id.in_(missing)))
+        names.update(dict(rows.all()))
+    return names
+
+
+def answer_chunks(
+    session_factory: Callable[[], Session], evaluation_pk: int, chunk_size: int = 10000
+) -> Iterator[Rows]:
+    """Yield the answers of an evaluation as lists of :data:`ANSWER_COLUMNS` rows.
+
+    Rows come in recording order; answers to deleted questions keep an
+    empty ``ku`` and ``correct_answer``.
+    """
+
+    answer, question = db_models.Answer, db_models.Question
+    with session_factory() as db:
+        evaluation = db.get(db_models.Evaluation, evaluation_pk)
+        if evaluation is None:
+            return
+        names = _model_names(db, evaluation)
+    evaluation_id = format_evaluation_id(evaluation_pk)
+    after = 0
+    while True:
+        stmt = (
+            select(
+                answer.id,
+                answer.model_id,
+                answer.question_id,
+                question.ku,
+                answer.answer,
+                question.correct,
+                answer.correct,
+            )
+            .outerjoin(question, question.id == answer.question_id)
+            .where(answer.evaluation_id == evaluation_pk, answer.id > after)
+            .order_by(answer.id)
+            .limit(max(1, chunk_size))
+        )
+        with session_factory() as db:
+            rows = db.execute(stmt).all()
+        if not rows:
+            return
+        after = rows[-1][0]
+        yield [
+            (evaluation_id, mid, names.get(mid), qid, ku, text, key, bool(ok))
+            for _, mid, qid, ku, text, key, ok in rows
+        ]
+
+
+def model_table(evaluation: db_models.Evaluation) -> Tuple[List[str], List[str], Rows]:
+    """Columns, column types and rows of the per-model table.
+
+    Next to the overall counts there is one ``accuracy[<ku>]`` column per KU.
+    """
+
+    results = evaluation.results or []
+    kus = sorted({ku for m in results for ku in m.get("scores_by_ku") or {}})
+    evaluation_id = format_evaluation_id(evaluation.id)
+    rows = [
+        (
+            evaluation_id,
+            m["id"],
+            m["name"],
+            m["total"],
+            m["correct"],
+            m.get("errors", 0),
+            m["accuracy"],
+            *((m.get("scores_by_ku") or {}).get(ku) for ku in kus),
+        )
+        for m in results
+    ]
+    return MODEL_COLUMNS + [f"accuracy[{ku}]" for ku in kus], MODEL_TYPES + ["float"] * len(kus), rows
+
+
+# ---------------------------------------------------------------------------
+# Encoding
+# ---------------------------------------------------------------------------
+class _Compressor:
+    """Incremental compressor with the ``compress``/``flush`` protocol of zlib."""
+
+    def __init__(self, compression: str) -> None:
+        if compression == "gzip":
+            self._obj = zlib.compressobj(6, zlib.DEFLATED, 31)
+        elif compression == "zstd":
+            try:
+                import zstandard
+            except ImportError:
+                raise ExportError("zstd compression requires the 'zstandard' package") from None
+            self._obj = zstandard.ZstdCompressor().compressobj()
+        else:
+            self._obj = None
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.compress(data) if self._obj is not None else data
+
+    def flush(self) -> bytes:
+        return self._obj.flush() if self._obj is not None else b""
+
+
+def iter_csv(columns: Sequence[str], chunks: Iterator[Rows], compression: str = "none") -> Iterator[bytes]:
+    """Encode ``chunks`` as CSV with a header row, one output block per chunk."""
+
+    compressor = _Compressor(compression)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(columns)
+    for rows in chunks:
+        writer.writerows(rows)
+        data = compressor.compress(buffer.getvalue().encode("utf-8"))
+        buffer.seek(0)
+        buffer.truncate()
+        if data:
+            yield data
+    data = compressor.compress(buffer.getvalue().encode("utf-8")) + compressor.flush()
+    if data:
+        yield data
+
+
+class _Sink(io.RawIOBase):
+    """Write-only file that hands written bytes back to the generator."""
+
+    def __init__(self) -> None:
+        self._parts: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def drain(self) -> bytes:
+        data, self._parts = b"".join(self._parts), []
+        return data
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ExportError("parquet export requires the 'pyarrow' package") from None
+    return pyarrow
+
+
+def iter_parquet(
+    columns: Sequence[str],
+    chunks: Iterator[Rows],
+    compression: str = "none",
+    types: Optional[Sequence[str]] = None,
+) -> Iterator[bytes]:
+    """Encode ``chunks`` as a Parquet file with one row group per chunk.
+
+    ``types`` holds ``"str"``, ``"int"``, ``"float"`` or ``"bool"`` per
+    column (strings when omitted).
+    """
+
+    pa = _pyarrow()
+    arrow_types = {"str": pa.string(), "int": pa.int64(), "float": pa.float64(), "bool": pa.bool_()}
+    schema = pa.schema([(name, arrow_types[t]) for name, t in zip(columns, types or ["str"] * len(columns))])
+    sink = _Sink()
+    writer = pa.parquet.ParquetWriter(sink, schema, compression=compression)
+    try:
+        for rows in chunks:
+            columns_data = dict(zip(schema.names, (list(values) for values in zip(*rows))))
+            writer.write_table(pa.Table.from_pydict(columns_data, schema=schema))
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def check_options(table: str, fmt: str, compression: str) -> None:
+    """Raise :class:`ExportError` for options :func:`iter_export` cannot serve."""
+
+    if table not in TABLES:
+        raise ExportError(f"table must be one of {', '.join(TABLES)}")
+    if fmt not in FORMATS:
+        raise ExportError(f"format must be one of {', '.join(FORMATS)}")
+    if compression not in COMPRESSIONS:
+        raise ExportError(f"compression must be one of {', '.join(COMPRESSIONS)}")
+    if fmt == "parquet":
+        _pyarrow()
+    else:
+        _Compressor(compression)
+
+
+def filename(evaluation_id: str, table: str, fmt: str, compression: str) -> str:
+    name = f"{evaluation_id}-{table}.{fmt}"
+    if fmt == "csv" and compression != "none":
+        name += ".gz" if compression == "gzip" else ".zst"
+    return name
+
+
+def iter_export(
+    session_factory: Callable[[], Session],
+    evaluation: db_models.Evaluation,
+    table: str = "answers",
+    fmt: str = "csv",
+    compression: str = "none",
+    chunk_size: int = 10000,
+) -> Iterator[bytes]:
+    """Encoded bytes of one table of ``evaluation``, produced chunk by chunk."""
+
+    check_options(table, fmt, compression)
+    if table == "answers":
+        columns, types = ANSWER_COLUMNS, ANSWER_TYPES
+        chunks: Iterator[Rows] = answer_chunks(session_factory, evaluation.id, chunk_size)
+    else:
+        columns, types, rows = model_table(evaluation)
+        chunks = iter([rows] if rows else [])
+    if fmt == "parquet":
+        return iter_parquet(columns, chunks, compression, types)
+    return iter_csv(columns, chunks, compression)
+
+
+def write_export(path: str, chunks: Iterator[bytes]) -> int:
+    """Write an export to ``path`` and return the number of bytes."""
+
+    size = 0
+    with open(path, "wb") as fh:
+        for data in chunks:
+            fh.write(data)
+            size += len(data)
+    return size
+
+
+__all__ = [
+    "ANSWER_COLUMNS",
+    "ANSWER_TYPES",
+    "COMPRESSIONS",
+    "ExportError",
+    "FORMATS",
+    "MEDIA_TYPES",
+    "MODEL_COLUMNS",
+    "MODEL_TYPES",
+    "TABLES",
+    "answer_chunks",
+    "check_options",
+    "filename",
+    "iter_csv",
+    "iter_export",
+    "iter_parquet",
+    "model_table",
+    "write_export",
+]
@@ -0,0 +1,273 @@
+"""Streaming bulk import of questions from JSONL/NDJSON and CSV.
+
+Rows are parsed lazily from any iterable of lines, validated in chunks and
+inserted with one bulk ``INSERT`` and one transaction per chunk, so memory
+use depends on ``chunk_size`` rather than on the size of the file.  Every
+question carries a content hash and rows whose hash already exists (in the
+bank or earlier in the same import) are skipped.  Given a loaded
+:class:`~backend.agents.QuestionCurationAgent`, inserted questions are added
+to its near-duplicate index and, with ``reject_similar``, rows similar to a
+question in the bank or earlier in the import are skipped as well.
+"""
+
+from __future__ import annotations
+
+import csv
+import hashlib
+import json
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from . import models as db_models
+from .agents import QuestionCurationAgent, similarity
+
+FIELDS = ("text", "options", "correct", "ku")
+MAX_REPORTED_ERRORS = 100
+
+# (line number, raw row) pairs produced by the parsers.
+NumberedRow = Tuple[int, Dict[str, Any]]
+
+
+def _normalize(value: str) -> str:
+    return " ".join(value.split()).casefold()
+
+
+def content_hash(text: str, options: Iterable[str]) -> str:
+    """Stable hash of a question's text and options used for deduplication.
+
+    Whitespace and case differences are ignored; option order is not.
+    """
+
+    payload = json.dumps([_normalize(text), [_normalize(str(o)) for o in options]])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def parse_jsonl_line(line: str) -> Optional[Dict[str, Any]]:
+    """Parse one JSON line; ``None`` for blank lines.
+
+    Lines that are not valid JSON objects become ``{"_error": ...}`` so they
+    are reported instead of aborting the import.
+    """
+
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        row = json.loads(line)
+    except ValueError as exc:
+        return {"_error": f"invalid JSON: {exc}"}
+    if not isinstance(row, dict):
+        return {"_error": "expected a JSON object"}
+    return row
+
+
+def iter_jsonl(lines: Iterable[str]) -> Iterator[NumberedRow]:
+    """Parse JSON lines, yielding ``(line_number, row)``."""
+
+    for number, line in enumerate(lines, start=1):
+        row = parse_jsonl_line(line)
+        if row is not None:
+            yield number, row
+
+
+def iter_csv(lines: Iterable[str]) -> Iterator[NumberedRow]:
+    """Parse CSV with a ``text,options,correct,ku`` header.
+
+    ``options`` is either a JSON array or a ``|`` separated list.
+    """
+
+    reader = csv.DictReader(lines)
+    for row in reader:
+        options = (row.get("options") or "").strip()
+        if options.startswith("["):
+            try:
+                row["options"] = json.loads(options)
+            except ValueError:
+                row["_error"] = "options is not a valid JSON array"
+        else:
+            row["options"] = [o.strip() for o in options.split("|") if o.strip()]
+        yield reader.line_num, row
+
+
+PARSERS: Dict[str, Callable[[Iterable[str]], Iterator[NumberedRow]]] = {
+    "jsonl": iter_jsonl,
+    "ndjson": iter_jsonl,
+    "csv": iter_csv,
+}
+
+
+def validate_row(row: Dict[str, Any]) -> Optional[str]:
+    """Return an error message for ``row`` or ``None`` when it is valid."""
+
+    if "_error" in row:
+        return row["_error"]
+    for name in FIELDS:
+        if row.get(name) in (None, "", []):
+            return f"missing field '{name}'"
+    if not isinstance(row["text"], str) or not isinstance(row["ku"], str):
+        return "text and ku must be strings"
+    options = row["options"]
+    if not isinstance(options, list) or not all(isinstance(o, str) for o in options):
+        return "options must be a list of strings"
+    if row["correct"] not in options:
+        return "correct answer is not one of the options"
+    return None
+
+
+@dataclass
+class ImportReport:
+    """Outcome of an import; ``errors`` keeps the first few invalid rows."""
+
+    inserted: int = 0
+    duplicates: int = 0
+    similar: int = 0
+    invalid: int = 0
+    errors: List[Dict[str, Any]] = field(default_factory=list)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "inserted": self.inserted,
+            "duplicates": self.duplicates,
+            "similar": self.similar,
+            "invalid": self.invalid,
+            "errors": self.errors,
+        }
+
+
+class QuestionImporter:
+    """Insert parsed rows chunk by chunk.
+
+    Parameters
+    ----------
+    session_factory: callable
+        Returns a new SQLAlchemy session; one is opened per chunk.
+    chunk_size: int
+        Rows validated and inserted per transaction.
+    curation: QuestionCurationAgent, optional
+        Agent whose (loaded) index receives the inserted questions.
+    reject_similar: bool
+        Skip rows that ``curation`` considers near duplicates.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        chunk_size: int = 5000,
+        curation: Optional[QuestionCurationAgent] = None,
+        reject_similar: bool = False,
+    ) -> None:
+        self.session_factory = session_factory
+        self.chunk_size = max(1, chunk_size)
+        self.curation = curation
+        self.reject_similar = reject_similar and curation is not None
+        self.report = ImportReport()
+
+    def import_rows(self, rows: Iterable[NumberedRow]) -> ImportReport:
+        """Consume ``rows`` (as produced by the parsers) and return the report."""
+
+        chunk: List[NumberedRow] = []
+        for item in rows:
+            chunk.append(item)
+            if len(chunk) >= self.chunk_size:
+                self.import_chunk(chunk)
+                chunk = []
+        if chunk:
+            self.import_chunk(chunk)
+        return self.report
+
+    def import_chunk(self, chunk: List[NumberedRow]) -> None:
+        """Validate, deduplicate and bulk insert one chunk in one transaction."""
+
+        candidates: Dict[str, Dict[str, Any]] = {}
+        for number, row in chunk:
+            error = validate_row(row)
+            if error is not None:
+                self.report.invalid += 1
+                if len(self.report.errors) < MAX_REPORTED_ERRORS:
+                    self.report.errors.append({"line": number, "error": error})
+                continue
+            digest = content_hash(row["text"], row["options"])
+            if digest in candidates:
+                self.report.duplicates += 1
+                continue
+            candidates[digest] = {
+                "text": row["text"],
+                "options": row["options"],
+                "correct": row["correct"],
+                "ku": row["ku"],
+                "content_hash": digest,
+            }
+        signatures: Dict[str, Any] = {}
+        if self.curation is not None:
+            signatures = {h: self.curation.signature(r) for h, r in candidates.items()}
+        if not candidates:
+            return
+
+        with self.session_factory() as db:
+            if self.reject_similar:
+                self._drop_similar(candidates, signatures, existing_hashes(db, list(candidates)))
+            # A concurrent import may insert the same hash between the lookup
+            # and the insert; one retry re-reads the existing hashes.
+            for attempt in range(2):
+                existing = existing_hashes(db, list(candidates))
+                rows = [r for h, r in candidates.items() if h not in existing]
+                try:
+                    if rows:
+                        db.execute(insert(db_models.Question), rows)
+                    db.commit()
+                except IntegrityError:
+                    db.rollback()
+                    if attempt:
+                        raise
+                    continue
+                break
+            if self.curation is not None and rows:
+                ids = ids_by_hash(db, [r["content_hash"] for r in rows])
+                for row in rows:
+                    digest = row["content_hash"]
+                    self.curation.add({"id": ids[digest]}, signatures[digest])
+        self.report.duplicates += len(candidates) - len(rows)
+        self.report.inserted += len(rows)
+
+    def _drop_similar(
+        self, candidates: Dict[str, Dict[str, Any]], signatures: Dict[str, Any], existing: set
+    ) -> None:
+        # Compare with the bank and with the rows kept so far in this chunk;
+        # earlier chunks are already part of the bank's index.  Exact copies
+        # are left to be counted as duplicates.
+        kept = similarity.MinHashIndex(self.curation.threshold)
+        for digest in [h for h in candidates if h not in existing]:
+            sig = signatures[digest]
+            if self.curation.index.query(sig) or kept.query(sig):
+                del candidates[digest]
+                self.report.similar += 1
+            else:
+                kept.add(digest, sig)
+
+
+def ids_by_hash(db: Session, hashes: List[str], batch: int = 900) -> Dict[str, int]:
+    """Map the stored ``hashes`` to their question ids."""
+
+    found: Dict[str, int] = {}
+    for start in range(0, len(hashes), batch):
+        stmt = select(db_models.Question.content_hash, db_models.Question.id).where(
+            db_models.Question.content_hash.in_(hashes[start : start + batch])
+        )
+        found.update((h, i) for h, i in db.execute(stmt))
+    return found
+
+
+def existing_hashes(db: Session, hashes: List[str], batch: int = 900) -> set:
+    """Return the subset of ``hashes`` already stored in the bank."""
+
+    found = set()
+    for start in range(0, len(hashes), batch):
+        stmt = select(db_models.Question.content_hash).where(
+            db_models.Question.content_hash.in_(hashes[start : start + batch])
+        )
+        found.update(db.execute(stmt).scalars())
+    return found
@@ -0,0 +1,290 @@
+"""Background execution of evaluation runs.
+
+``POST /evaluations`` only prepares the questions and model agents and then
+hands the run to a :class:`JobRunner`.  The runner executes jobs on a small
+local thread pool and keeps live progress for every job so the status
+endpoint can report throughput and an ETA while the run is in progress.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from .agents import ColumnarResult, EvaluationAgent, ModelAgent, PriorAnswers
+from .agents import tracing
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED_STATES = {COMPLETED, FAILED, CANCELLED}
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class EvaluationJob:
+    """Live state of a single evaluation run.
+
+    ``answered``/``total`` count individual model answers while
+    ``questions_answered`` counts questions that every model has answered.
+    The run is traced under ``trace_id``.
+    """
+
+    evaluation_id: str
+    question_count: int
+    model_count: int
+    trace_id: str = field(default_factory=tracing.new_trace_id)
+    status: str = QUEUED
+    start_time: datetime = field(default_factory=datetime.utcnow)
+    end_time: Optional[datetime] = None
+    answered: int = 0
+    questions_answered: int = 0
+    error: Optional[str] = None
+    cancel_event: threading.Event = field(default_factory=threading.Event)
+    future: Optional[Future] = field(default=None, repr=False)
+    hooks: "JobHooks" = field(default=None, repr=False)  # type: ignore[assignment]
+    _started: Optional[float] = field(default=None, repr=False)
+    _pending: List[int] = field(default_factory=list, repr=False)
+
+    @property
+    def total(self) -> int:
+        return self.question_count * self.model_count
+
+    def record_answer(self, question_index: int, model: ModelAgent, answer: Optional[str]) -> None:
+        """Progress callback passed to :meth:`EvaluationAgent.evaluate`."""
+
+        self.answered += 1
+        self._pending[question_index] -= 1
+        if self._pending[question_index] == 0:
+            self.questions_answered += 1
+
+    def throughput(self) -> float:
+        """Model answers per second since the run started."""
+
+        if self._started is None or not self.answered:
+            return 0.0
+        elapsed = time.monotonic() - self._started
+        return self.answered / elapsed if elapsed > 0 else 0.0
+
+    def eta_seconds(self) -> Optional[float]:
+        """Estimated seconds until completion, ``None`` when unknown."""
+
+        if self.status in FINISHED_STATES:
+            return 0.0
+        rate = self.throughput()
+        if not rate:
+            return None
+        return (self.total - self.answered) / rate
+
+
+class JobHooks:
+    """Callbacks invoked while a job runs; override the ones you need.
+
+    ``on_answer`` and ``on_complete`` run on the worker thread.  ``on_status``
+    runs on the worker thread for every status change, or on the caller's
+    thread when a queued job is cancelled before it starts.
+    """
+
+    def on_status(self, job: EvaluationJob) -> None:
+        pass
+
+    def on_answer(
+        self, job: EvaluationJob, question_index: int, model: ModelAgent, answer: Optional[str]
+    ) -> None:
+        pass
+
+    def on_complete(self, job: EvaluationJob, result: ColumnarResult) -> None:
+        pass
+
+
+class HookChain(JobHooks):
+    """Forward every callback to several hooks, in order."""
+
+    def __init__(self, *hooks: JobHooks) -> None:
+        self.hooks = hooks
+
+    def on_status(self, job: EvaluationJob) -> None:
+        for hooks in self.hooks:
+            hooks.on_status(job)
+
+    def on_answer(
+        self, job: EvaluationJob, question_index: int, model: ModelAgent, answer: Optional[str]
+    ) -> None:
+        for hooks in self.hooks:
+            hooks.on_answer(job, question_index, model, answer)
+
+    def on_complete(self, job: EvaluationJob, result: ColumnarResult) -> None:
+        for hooks in self.hooks:
+            hooks.on_complete(job, result)
+
+
+class JobRunner:
+    """Execute evaluation jobs on a local worker pool.
+
+    Only queued and running jobs are tracked; finished jobs are dropped once
+    their final status has been handed to :meth:`JobHooks.on_status`.
+
+    Parameters
+    ----------
+    max_workers: int
+        Number of evaluations that may run at the same time.  Further jobs
+        wait in the pool's queue with status ``queued``.
+    """
+
+    def __init__(self, max_workers: int = 2) -> None:
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, max_workers), thread_name_prefix="evaluation-job"
+        )
+        self._jobs: Dict[str, EvaluationJob] = {}
+        self._lock = threading.Lock()
+
+    def submit(
+        self,
+        evaluation_id: str,
+        agent: EvaluationAgent,
+        questions: List[Dict[str, Any]],
+        hooks: Optional[JobHooks] = None,
+        prior: Optional[PriorAnswers] = None,
+        trace_id: Optional[str] = None,
+    ) -> EvaluationJob:
+        """Queue ``agent.evaluate(questions)`` and return the job immediately.
+
+        Answers in ``prior`` (see :meth:`EvaluationAgent.evaluate`) count as
+        already answered and are not reported to ``hooks.on_answer``.  The
+        run's spans join ``trace_id`` (a new trace by default).
+        """
+
+        job = EvaluationJob(
+            evaluation_id=evaluation_id,
+            question_count=len(questions),
+            model_count=len(agent.models),
+            hooks=hooks or JobHooks(),
+        )
+        if trace_id is not None:
+            job.trace_id = trace_id
+        job._pending = [job.model_count] * job.question_count
+        if prior:
+            index = {q["id"]: qi for qi, q in enumerate(questions)}
+            models = {m.model_id for m in agent.models}
+            for model_id, question_id in prior:
+                qi = index.get(question_id)
+                if qi is not None and model_id in models:
+                    job.answered += 1
+                    job._pending[qi] -= 1
+            job.questions_answered = job._pending.count(0)
+        with self._lock:
+            self._jobs[evaluation_id] = job
+        job.future = self._executor.submit(self._run, job, agent, questions, prior)
+        return job
+
+    def _run(
+        self,
+        job: EvaluationJob,
+        agent: EvaluationAgent,
+        questions: List[Dict[str, Any]],
+        prior: Optional[PriorAnswers] = None,
+    ) -> None:
+        # The engine's event loop copies this context, so the spans of model
+        # calls and answer writes become children of the run's span.
+        with tracing.span("evaluation", trace_id=job.trace_id, evaluation_id=job.evaluation_id):
+            self._execute(job, agent, questions, prior)
+
+    def _execute(
+        self,
+        job: EvaluationJob,
+        agent: EvaluationAgent,
+        questions: List[Dict[str, Any]],
+        prior: Optional[PriorAnswers] = None,
+    ) -> None:
+        hooks = job.hooks
+        if job.cancel_event.is_set():
+            job.status = CANCELLED
+            job.end_time = datetime.utcnow()
+            self._notify(job)
+            return
+
+        def on_answer(question_index: int, model: ModelAgent, answer: Optional[str]) -> None:
+            job.record_answer(question_index, model, answer)
+            hooks.on_answer(job, question_index, model, answer)
+
+        job.status = RUNNING
+        job.start_time = datetime.utcnow()
+        job._started = time.monotonic()
+        try:
+            self._notify(job)
+            with tracing.span("model_calls"):
+                result = agent.evaluate_columnar(
+                    questions, on_answer=on_answer, cancel_event=job.cancel_event, prior=prior
+                )
+            hooks.on_complete(job, result)
+        except Exception as exc:  # surfaced through the status endpoint
+            logger.exception("evaluation %s failed", job.evaluation_id)
+            job.status = FAILED
+            job.error = str(exc)
+        else:
+            job.status = CANCELLED if job.cancel_event.is_set() else COMPLETED
+        finally:
+            job.end_time = datetime.utcnow()
+            self._notify(job)
+            self._forget(job)
+
+    def _forget(self, job: EvaluationJob) -> None:
+        # Finished jobs live on in the database; keeping them here would only
+        # grow memory with every run.
+        with self._lock:
+            if self._jobs.get(job.evaluation_id) is job:
+                del self._jobs[job.evaluation_id]
+
+    @staticmethod
+    def _notify(job: EvaluationJob) -> None:
+        try:
+            job.hooks.on_status(job)
+        except Exception:
+            logger.exception("status hook failed for evaluation %s", job.evaluation_id)
+
+    def get(self, evaluation_id: str) -> Optional[EvaluationJob]:
+        return self._jobs.get(evaluation_id)
+
+    def jobs(self) -> List[EvaluationJob]:
+        """Snapshot of the queued and running jobs."""
+
+        return list(self._jobs.values())
+
+    def cancel(self, evaluation_id: str) -> Optional[EvaluationJob]:
+        """Request cancellation; queued jobs never start, running jobs stop early."""
+
+        job = self._jobs.get(evaluation_id)
+        if job is None or job.status in FINISHED_STATES:
+            return job
+        job.cancel_event.set()
+        if job.future is not None and job.future.cancel():
+            job.status = CANCELLED
+            job.end_time = datetime.utcnow()
+            self._notify(job)
+            self._forget(job)
+        return job
+
+    def wait(self, evaluation_id: str, timeout: Optional[float] = None) -> Optional[EvaluationJob]:
+        """Block until the job finishes (mainly useful for scripts and tests).
+
+        Returns ``None`` when the job is unknown or already finished.
+        """
+
+        job = self._jobs.get(evaluation_id)
+        if job is not None and job.future is not None and not job.future.cancelled():
+            job.future.result(timeout)
+        return job
+
+    def shutdown(self, wait: bool = False) -> None:
+        for job in list(self._jobs.values()):
+            job.cancel_event.set()
+        self._executor.shutdown(wait=wait, cancel_futures=True)
@@ -1,17 +1,44 @@
+import asyncio
+import codecs
+import io
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional
 
-from fastapi import Depends, FastAPI, HTTPException, status
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordBearer
 from pydantic import BaseModel, Field
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from . import config
+from . import database
 from .database import SessionLocal, engine
 from . import models as db_models
-from .agents import EvaluationAgent, ModelAgent
-from .agents.config_loader import load_config as load_agent_config
+from . import export, importer, jobs, metrics, migrations, profiling, progress, sampling, storage
+from .agents import adapters, tracing
+from .agents import (
+    AnalyticsAgent,
+    AnswerCache,
+    BenchmarkAgent,
+    BreakerRegistry,
+    EvaluationAgent,
+    LimiterRegistry,
+    ModelAgent,
+    QuestionCurationAgent,
+    StoppingRule,
+)
+from .agents.config_loader import PROCESS_SETTINGS, AgentConfig, ConfigError, install_reload_signal
+from .agents.config_loader import get_config as agent_config
+from .agents.resilience import OPEN
 
-db_models.Base.metadata.create_all(bind=engine)
+migrations.upgrade(engine)
 
 
 def get_db():
@@ -21,7 +48,90 @@ def get_db():
     finally:
         db.close()
 
-app = FastAPI(title="AxiomIQ Backend")
+
+async def get_async_db():
+    # Used by the hot read endpoints so they do not hold a threadpool worker
+    # while waiting on the database.
+    async with database.AsyncSessionLocal() as db:
+        yield db
+
+
+def _mark_model(model_id: int, state: str) -> None:
+    """Mirror a circuit breaker opening or closing in ``Model.status``."""
+
+    model_status = "degraded" if state == OPEN else "active"
+    with SessionLocal() as db:
+        db.execute(
+            update(db_models.Model)
+            .where(db_models.Model.id == model_id, db_models.Model.status.in_(("active", "degraded")))
+            .values(status=model_status)
+        )
+        db.commit()
+
+
+def _queue_mark_model(model_id: int, state: str) -> None:
+    # Breakers report from the engine's event loop; keep the write off it.
+    status_executor.submit(_mark_model, model_id, state)
+
+
+job_runner = jobs.JobRunner(max_workers=config.EVALUATION_WORKERS)
+# Benchmark runs fan out to a process pool themselves; run them one at a time.
+benchmark_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="benchmark")
+# One worker applies the breaker status changes in the order they happened.
+status_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model-status")
+metrics.register_job_gauges(job_runner)
+metrics.instrument_engine(engine)
+question_index = sampling.QuestionIdIndex(ttl=config.SAMPLER_INDEX_TTL)
+# Near-duplicate index of the bank, built on first use and then updated by
+# the question endpoints of this process.
+curation = QuestionCurationAgent(threshold=config.DUPLICATE_THRESHOLD)
+_curation_lock = threading.Lock()
+# Process-wide resources are built from the config at startup; the rest of
+# the config is re-read (when the file changed) for every new evaluation.
+adapters.configure_http(agent_config()["http"])
+rate_limits = LimiterRegistry(agent_config()["limits"])
+breakers = BreakerRegistry(agent_config()["limits"], on_change=_queue_mark_model)
+# The answer cache is opened by the first evaluation (see get_answer_cache).
+_answer_cache: Optional[AnswerCache] = None
+_answer_cache_opened = False
+_answer_cache_lock = threading.Lock()
+tracing.configure(config.TRACE_EXPORTER, config.TRACE_FILE, config.TRACE_BUFFER_SIZE)
+# The history must outlast the answers not yet flushed to the database.
+progress_broker = progress.ProgressBroker(
+    history=max(config.PROGRESS_HISTORY_SIZE, 2 * config.ANSWER_BATCH_SIZE)
+)
+
+
+def get_answer_cache() -> Optional[AnswerCache]:
+    """The process-wide answer cache, ``None`` when it is disabled.
+
+    A relative ``cache.path`` is resolved against ``DATA_DIR``, next to the
+    database, and the file is only opened once an evaluation needs it.
+    """
+
+    global _answer_cache, _answer_cache_opened
+    with _answer_cache_lock:
+        if not _answer_cache_opened:
+            _answer_cache = AnswerCache.from_config(agent_config()["cache"], directory=database.DATA_DIR)
+            _answer_cache_opened = True
+    return _answer_cache
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    install_reload_signal()
+    yield
+    job_runner.shutdown()
+    benchmark_executor.shutdown(wait=False, cancel_futures=True)
+    status_executor.shutdown(wait=True)
+    if _answer_cache is not None:
+        _answer_cache.close()
+    adapters.close_http_client()
+    await database.dispose_async_engine()
+
+
+app = FastAPI(title="AxiomIQ Backend", lifespan=lifespan)
+app.add_middleware(metrics.RequestMetricsMiddleware)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
@@ -61,6 +171,11 @@ class Model(BaseModel):
     status: str
     api_key: Optional[str] = None
     model_name: Optional[str] = None
+    base_url: Optional[str] = None
+    replica_urls: Optional[List[str]] = None
+    requests_per_minute: Optional[int] = None
+    tokens_per_minute: Optional[int] = None
+    max_concurrency: Optional[int] = None
 
 
 class ModelCreate(BaseModel):
@@ -68,6 +183,12 @@ class ModelCreate(BaseModel):
     type: str
     api_key: Optional[str] = None
     model_name: Optional[str] = None
+    base_url: Optional[str] = None
+    # Alternate endpoints of the same model that receive hedged calls.
+    replica_urls: Optional[List[str]] = None
+    requests_per_minute: Optional[int] = None
+    tokens_per_minute: Optional[int] = None
+    max_concurrency: Optional[int] = None
 
 
 class EvaluationCreate(BaseModel):
@@ -76,6 +197,16 @@ class EvaluationCreate(BaseModel):
     question_count: int
     mode: str
     benchmark_id: Optional[int] = None
+    seed: Optional[int] = None
+    allocation: str = "proportional"
+    bypass_cache: bool = False
+    base_evaluation_id: Optional[str] = None
+    # Agent config overrides for this run, e.g. {"evaluation": {"timeout": 5}}.
+    config: Optional[Dict[str, Dict[str, Any]]] = None
+    # Store a sampled CPU profile and per-stage timings with the evaluation.
+    profile: bool = False
+    # Leave out all but the oldest question of every near-duplicate cluster.
+    skip_duplicates: bool = False
 
 
 class Evaluation(BaseModel):
@@ -83,18 +214,64 @@ class Evaluation(BaseModel):
     status: str
     start_time: datetime
     end_time: Optional[datetime] = None
+    total: int = 0
+    answered: int = 0
+    question_count: int = 0
+    questions_answered: int = 0
+    throughput: float = 0.0
+    eta_seconds: Optional[float] = None
+    error: Optional[str] = None
+    limits: Optional[List[Dict]] = None
+    trace_id: Optional[str] = None
 
 
 class EvaluationResult(BaseModel):
     models: List[Dict]
     questions: List[Dict]
+    question_total: int = 0
+    offset: int = 0
+    cache: Optional[Dict] = None
+    analytics: Optional[Dict] = None
+    peer: Optional[Dict] = None
+    adaptive: Optional[Dict] = None
+    profile: Optional[Dict] = None
+    benchmark: Optional[Dict] = None
+
+
+class Benchmark(BaseModel):
+    id: int
+    name: str
+    path: str
+
+
+class BenchmarkCreate(BaseModel):
+    name: str
+    # JSONL file relative to BENCHMARK_DIR.
+    path: str
+
+
+class BenchmarkRunCreate(BaseModel):
+    model_ids: List[int] = Field(default_factory=list)
+
+
+class BenchmarkResult(BaseModel):
+    id: int
+    benchmark_id: int
+    model_id: int
+    status: str
+    start_time: datetime
+    end_time: Optional[datetime] = None
+    error: Optional[str] = None
+    items: int = 0
+    correct: int = 0
+    accuracy: Optional[float] = None
+    score: Optional[float] = None
+    details: Optional[Dict] = None
 
 
 # ---------------------------------------------------------------------------
-# In memory "database" for evaluations only
+# Static data
 # ---------------------------------------------------------------------------
-_evaluations: Dict[str, Evaluation] = {}
-_evaluation_results: Dict[str, EvaluationResult] = {}
 _kus = ["Networking", "Cryptography", "Threat Analysis"]
 
 
@@ -107,6 +284,70 @@ def require_token(token: str = Depends(oauth2_scheme)):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
 
 
+def _evaluation_response(
+    record: db_models.Evaluation, job: Optional[jobs.EvaluationJob] = None
+) -> Evaluation:
+    """Build the status payload, preferring live progress from a local job."""
+
+    if job is not None:
+        return Evaluation(
+            evaluation_id=job.evaluation_id,
+            status=job.status,
+            start_time=job.start_time,
+            end_time=job.end_time,
+            total=job.total,
+            answered=job.answered,
+            question_count=job.question_count,
+            questions_answered=job.questions_answered,
+            throughput=job.throughput(),
+            eta_seconds=job.eta_seconds(),
+            error=job.error,
+            # Limiter state shows which model is holding the run up.
+            limits=rate_limits.state(record.model_ids or []),
+            trace_id=job.trace_id,
+        )
+    # The job runs in another process (or has finished): derive the rates from
+    # the progress last flushed to the database.
+    total = record.question_count * record.model_count
+    elapsed = ((record.end_time or datetime.utcnow()) - record.start_time).total_seconds()
+    throughput = record.answered / elapsed if record.answered and elapsed > 0 else 0.0
+    if record.status in jobs.FINISHED_STATES:
+        eta = 0.0
+    elif throughput:
+        eta = (total - record.answered) / throughput
+    else:
+        eta = None
+    return Evaluation(
+        evaluation_id=storage.format_evaluation_id(record.id),
+        status=record.status,
+        start_time=record.start_time,
+        end_time=record.end_time,
+        total=total,
+        answered=record.answered,
+        question_count=record.question_count,
+        questions_answered=record.questions_answered,
+        throughput=throughput,
+        eta_seconds=eta,
+        error=record.error,
+        trace_id=record.trace_id,
+    )
+
+
+def _get_evaluation_record(db, evaluation_id: str) -> db_models.Evaluation:
+    record = storage.get_evaluation(db, evaluation_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Evaluation not found")
+    return record
+
+
+async def _get_evaluation_record_async(db: AsyncSession, evaluation_id: str) -> db_models.Evaluation:
+    pk = storage.parse_evaluation_id(evaluation_id)
+    record = await db.get(db_models.Evaluation, pk) if pk is not None else None
+    if record is None:
+        raise HTTPException(status_code=404, detail="Evaluation not found")
+    return record
+
+
 # ---------------------------------------------------------------------------
 # Basic routes
 # ---------------------------------------------------------------------------
@@ -120,6 +361,13 @@ def health():
     return {"status": "ok"}
 
 
+@app.get("/metrics")
+def get_metrics():
+    """Prometheus text exposition of the process metrics."""
+
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 # ---------------------------------------------------------------------------
 # Authentication
 # ---------------------------------------------------------------------------
@@ -133,17 +381,83 @@ def login(data: LoginRequest):
 # ---------------------------------------------------------------------------
 # Questions endpoints
 # ---------------------------------------------------------------------------
+def _question_query(ku: Optional[str], after_id: Optional[int]):
+    # Keyset pagination: ``id > after_id`` ordered by id is served by the
+    # primary key, or by the (ku, id) index when filtering by KU.
+    stmt = select(
+        db_models.Question.id,
+        db_models.Question.text,
+        db_models.Question.options,
+        db_models.Question.correct,
+        db_models.Question.ku,
+    ).order_by(db_models.Question.id)
+    if ku:
+        stmt = stmt.where(db_models.Question.ku == ku)
+    if after_id is not None:
+        stmt = stmt.where(db_models.Question.id > after_id)
+    return stmt
+
+
+async def _stream_questions(ku: Optional[str], after_id: Optional[int], batch: int = 1000):
+    stmt = _question_query(ku, after_id)
+    # A dedicated session: the request-scoped one may be closed before the
+    # response body has been fully sent.
+    async with database.AsyncSessionLocal() as db:
+        result = await db.stream(stmt.execution_options(yield_per=batch))
+        async for rows in result.partitions():
+            yield "".join(
+                json.dumps({"id": i, "text": t, "options": o, "correct": c, "ku": k}) + "\n"
+                for i, t, o, c, k in rows
+            )
+
+
+def _loaded_curation(db) -> QuestionCurationAgent:
+    """The near-duplicate index, loading the whole bank on first use."""
+
+    if not curation.loaded:
+        with _curation_lock:
+            if not curation.loaded:
+                stmt = select(
+                    db_models.Question.id, db_models.Question.text, db_models.Question.options
+                ).execution_options(yield_per=1000)
+                curation.load({"id": i, "text": t, "options": o} for i, t, o in db.execute(stmt))
+    return curation
+
+
+def _question_importer(chunk_size: int, reject_similar: bool) -> importer.QuestionImporter:
+    if reject_similar:
+        with SessionLocal() as db:
+            _loaded_curation(db)
+    # An index that is not loaded yet picks the new rows up when it loads.
+    agent = curation if curation.loaded else None
+    return importer.QuestionImporter(SessionLocal, chunk_size, curation=agent, reject_similar=reject_similar)
+
+
 @app.get("/questions", response_model=List[Question])
-def list_questions(
+async def list_questions(
+    response: Response,
     ku: Optional[str] = None,
-    limit: int = 100,
+    limit: int = Query(100, ge=1, le=1000),
+    after_id: Optional[int] = None,
+    format: str = "json",
     token: str = Depends(require_token),
-    db: SessionLocal = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    query = db.query(db_models.Question)
-    if ku:
-        query = query.filter(db_models.Question.ku == ku)
-    records = query.limit(limit).all()
+    """List questions ordered by id.
+
+    Pass the last id of a page as ``after_id`` to fetch the next one; the
+    ``X-Next-Cursor`` header carries that value when more rows may follow.
+    ``format=ndjson`` ignores ``limit`` and streams every matching question
+    as newline-delimited JSON straight from a server-side cursor.
+    """
+
+    if format == "ndjson":
+        return StreamingResponse(_stream_questions(ku, after_id), media_type="application/x-ndjson")
+    if format != "json":
+        raise HTTPException(status_code=422, detail="format must be 'json' or 'ndjson'")
+    records = (await db.execute(_question_query(ku, after_id).limit(limit))).all()
+    if len(records) == limit:
+        response.headers["X-Next-Cursor"] = str(records[-1].id)
     return [Question(id=q.id, text=q.text, options=q.options, correct=q.correct, ku=q.ku) for q in records]
 
 
@@ -153,13 +467,87 @@ def create_question(
     token: str = Depends(require_token),
     db: SessionLocal = Depends(get_db),
 ):
-    record = db_models.Question(**data.dict())
+    digest = importer.content_hash(data.text, data.options)
+    if importer.existing_hashes(db, [digest]):
+        raise HTTPException(status_code=409, detail="Question already exists")
+    record = db_models.Question(content_hash=digest, **data.model_dump())
     db.add(record)
     db.commit()
     db.refresh(record)
+    question_index.invalidate(record.ku)
+    if curation.loaded:
+        curation.add({"id": record.id, "text": record.text, "options": record.options})
     return Question(id=record.id, text=record.text, options=record.options, correct=record.correct, ku=record.ku)
 
 
+async def _aiter_lines(request: Request):
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    tail = ""
+    async for data in request.stream():
+        lines = (tail + decoder.decode(data)).split("\n")
+        tail = lines.pop()
+        for line in lines:
+            yield line
+    tail += decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def _import_upload(fileobj, fmt: str, chunk_size: int, reject_similar: bool) -> importer.ImportReport:
+    text = io.TextIOWrapper(fileobj, encoding="utf-8", newline="")
+    try:
+        rows = importer.PARSERS[fmt](text)
+        return _question_importer(chunk_size, reject_similar).import_rows(rows)
+    finally:
+        text.detach()
+
+
+@app.post("/questions/import")
+async def import_questions(
+    request: Request,
+    format: Optional[str] = None,
+    chunk_size: int = config.IMPORT_CHUNK_SIZE,
+    reject_similar: bool = False,
+    token: str = Depends(require_token),
+):
+    """Bulk import questions from a multipart file upload or an NDJSON body.
+
+    Multipart uploads take a ``file`` field in JSONL or CSV (from ``format``
+    or the file extension).  Any other body is streamed as NDJSON and
+    inserted chunk by chunk while it is still being received.  With
+    ``reject_similar`` near duplicates of questions in the bank (or earlier
+    in the import) are skipped and counted as ``similar``.
+    """
+
+    if request.headers.get("content-type", "").startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("file")
+        if upload is None or isinstance(upload, str):
+            raise HTTPException(status_code=422, detail="Missing 'file' upload")
+        fmt = format or os.path.splitext(upload.filename or "")[1].lstrip(".").lower()
+        if fmt not in importer.PARSERS:
+            raise HTTPException(status_code=422, detail="format must be jsonl or csv")
+        report = await run_in_threadpool(_import_upload, upload.file, fmt, chunk_size, reject_similar)
+    else:
+        bulk = await run_in_threadpool(_question_importer, chunk_size, reject_similar)
+        chunk = []
+        number = 0
+        async for line in _aiter_lines(request):
+            number += 1
+            row = importer.parse_jsonl_line(line)
+            if row is None:
+                continue
+            chunk.append((number, row))
+            if len(chunk) >= bulk.chunk_size:
+                await run_in_threadpool(bulk.import_chunk, chunk)
+                chunk = []
+        if chunk:
+            await run_in_threadpool(bulk.import_chunk, chunk)
+        report = bulk.report
+    question_index.invalidate()
+    return report.as_dict()
+
+
 @app.delete("/questions/{question_id}")
 def delete_question(
     question_id: int,
@@ -171,16 +559,59 @@ def delete_question(
         raise HTTPException(status_code=404, detail="Question not found")
     db.delete(record)
     db.commit()
+    question_index.invalidate(record.ku)
+    curation.remove(question_id)
     return {"status": "deleted"}
 
 
+@app.get("/questions/duplicates")
+def list_duplicate_questions(
+    threshold: Optional[float] = None,
+    token: str = Depends(require_token),
+    db: SessionLocal = Depends(get_db),
+):
+    """Near-duplicate clusters across the whole bank.
+
+    Every cluster lists its question ids; ``keep`` is the oldest one, which
+    ``skip_duplicates`` evaluations still draw.  ``threshold`` defaults to
+    ``DUPLICATE_THRESHOLD``; values below it may miss pairs.
+    """
+
+    if threshold is not None and not 0 < threshold <= 1:
+        raise HTTPException(status_code=422, detail="threshold must be in (0, 1]")
+    index = _loaded_curation(db)
+    clusters = index.clusters(threshold)
+    return {
+        "threshold": threshold if threshold is not None else index.threshold,
+        "questions": len(index.index),
+        "redundant": sum(len(c) - 1 for c in clusters),
+        "clusters": [{"ids": c, "keep": c[0]} for c in clusters],
+    }
+
+
 # ---------------------------------------------------------------------------
 # Models endpoints
 # ---------------------------------------------------------------------------
+def _model_response(m: db_models.Model) -> Model:
+    return Model(
+        id=m.id,
+        name=m.name,
+        type=m.type,
+        status=m.status,
+        api_key=m.api_key,
+        model_name=m.model_name,
+        base_url=m.base_url,
+        replica_urls=m.replica_urls,
+        requests_per_minute=m.requests_per_minute,
+        tokens_per_minute=m.tokens_per_minute,
+        max_concurrency=m.max_concurrency,
+    )
+
+
 @app.get("/models", response_model=List[Model])
-def list_models(token: str = Depends(require_token), db: SessionLocal = Depends(get_db)):
-    records = db.query(db_models.Model).all()
-    return [Model(id=m.id, name=m.name, type=m.type, status=m.status, api_key=m.api_key, model_name=m.model_name) for m in records]
+async def list_models(token: str = Depends(require_token), db: AsyncSession = Depends(get_async_db)):
+    records = (await db.scalars(select(db_models.Model))).all()
+    return [_model_response(m) for m in records]
 
 
 @app.post("/models", response_model=Model)
@@ -189,11 +620,16 @@ def create_model(
     token: str = Depends(require_token),
     db: SessionLocal = Depends(get_db),
 ):
+    if data.type not in adapters.ADAPTERS:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Unknown model type '{data.type}'; expected one of {sorted(adapters.ADAPTERS)}",
+        )
     record = db_models.Model(status="active", **data.dict())
     db.add(record)
     db.commit()
     db.refresh(record)
-    return Model(id=record.id, name=record.name, type=record.type, status=record.status, api_key=record.api_key, model_name=record.model_name)
+    return _model_response(record)
 
 
 @app.post("/models/{model_id}/test")
@@ -202,83 +638,686 @@ def test_model(
     token: str = Depends(require_token),
     db: SessionLocal = Depends(get_db),
 ):
-    record = db.query(db_models.Model).get(model_id)
+    """Send a probe question through the model's adapter and time it."""
+
+    record = db.get(db_models.Model, model_id)
     if not record:
         raise HTTPException(status_code=404, detail="Model not found")
-    # Dummy success response
-    return {"status": "ok"}
+    return adapters.probe(_model_agent(agent_config(), record))
+
+
+@app.get("/models/{model_id}/limits")
+def get_model_limits(
+    model_id: int,
+    token: str = Depends(require_token),
+    db: SessionLocal = Depends(get_db),
+):
+    """Rate limiter state (buckets, adaptive concurrency, counters) and circuit breaker."""
+
+    record = db.get(db_models.Model, model_id)
+    if not record:
+        raise HTTPException(status_code=404, detail="Model not found")
+    cfg = agent_config()
+    return {**_limiter(cfg, record).state(), "breaker": _breaker(cfg, record).snapshot()}
 
 
 # ---------------------------------------------------------------------------
 # Evaluation endpoints
 # ---------------------------------------------------------------------------
+def _limiter(cfg: AgentConfig, m: db_models.Model):
+    return rate_limits.get(
+        m.id,
+        requests_per_minute=m.requests_per_minute,
+        tokens_per_minute=m.tokens_per_minute,
+        max_concurrency=m.max_concurrency,
+        defaults=cfg["limits"],
+    )
+
+
+def _breaker(cfg: AgentConfig, m: db_models.Model):
+    return breakers.get(m.id, defaults=cfg["limits"])
+
+
+def _model_agent(cfg: AgentConfig, m: db_models.Model) -> ModelAgent:
+    if m.type not in adapters.ADAPTERS:
+        raise HTTPException(status_code=422, detail=f"Model {m.id} has unknown type '{m.type}'")
+    return adapters.create_agent(
+        m.type,
+        model_id=m.id,
+        name=m.name,
+        max_retries=cfg.model.max_retries,
+        response_format=cfg.model.response_format,
+        limiter=_limiter(cfg, m),
+        breaker=_breaker(cfg, m),
+        base_url=m.base_url,
+        replica_urls=m.replica_urls,
+        api_key=m.api_key,
+        model_name=m.model_name,
+    )
+
+
+def _model_agents(cfg: AgentConfig, m_records: List[db_models.Model]) -> List[ModelAgent]:
+    return [_model_agent(cfg, m) for m in m_records]
+
+
+def _stopping_rule(cfg: AgentConfig) -> StoppingRule:
+    """Early-stopping rule of ``adaptive`` evaluations; ``ValueError`` if invalid."""
+
+    return StoppingRule(
+        precision=cfg.evaluation.adaptive_precision,
+        confidence=cfg.evaluation.adaptive_confidence,
+        min_samples=cfg.evaluation.adaptive_min_samples,
+        rule=cfg.evaluation.adaptive_rule,
+    )
+
+
+def _start_evaluation(
+    record: db_models.Evaluation,
+    questions: List[Dict],
+    model_agents: List[ModelAgent],
+    cfg: AgentConfig,
+    bypass_cache: bool = False,
+    prior: Optional[Dict] = None,
+    profile: bool = False,
+) -> jobs.EvaluationJob:
+    """Hand an evaluation row to the job runner.
+
+    ``prior`` holds the answers already stored for the evaluation; only the
+    remaining (model, question) pairs are asked.  ``cfg`` is the snapshot the
+    run uses from start to end, whatever happens to the config file meanwhile.
+    The run is traced under ``record.trace_id`` and, with ``profile``, its
+    profile is stored in the record's details when it finishes.
+    """
+
+    eval_id = storage.format_evaluation_id(record.id)
+    eval_agent = EvaluationAgent(
+        model_agents,
+        timeout=cfg.evaluation.timeout,
+        mode=record.mode,
+        max_concurrency=cfg.evaluation.max_concurrency,
+        per_model_concurrency=cfg.evaluation.per_model_concurrency,
+        max_batch_size=cfg.evaluation.max_batch_size,
+        max_batch_wait=cfg.evaluation.max_batch_wait,
+        cache=get_answer_cache(),
+        bypass_cache=bypass_cache,
+        retry_backoff=cfg.limits.retry_backoff,
+        retry_backoff_max=cfg.limits.retry_backoff_max,
+        throttle_retries=cfg.limits.throttle_retries,
+        thread_name_prefix=f"{eval_id}-call",
+        stopping=_stopping_rule(cfg) if record.mode == "adaptive" else None,
+        hedge_percentile=cfg.evaluation.hedge_percentile,
+        hedge_min_samples=cfg.evaluation.hedge_min_samples,
+    )
+    writer = storage.AnswerWriter(
+        SessionLocal, record.id, questions, batch_size=config.ANSWER_BATCH_SIZE
+    )
+    analytics = AnalyticsAgent(
+        enable_anova=cfg.analytics.enable_anova,
+        export_format=cfg.analytics.export_format,
+        bootstrap_samples=cfg.analytics.bootstrap_samples,
+        confidence=cfg.analytics.confidence,
+        seed=record.seed,
+    )
+    log = progress_broker.open(eval_id)
+    if prior:
+        log.seed(prior, questions)
+    hooks = [
+        storage.EvaluationRecorder(writer, analytics),
+        progress.ProgressHooks(progress_broker, log, questions),
+    ]
+    if profile:
+        hooks.append(
+            profiling.ProfileHooks(
+                SessionLocal,
+                record.id,
+                eval_agent.thread_name_prefix,
+                interval=config.PROFILE_INTERVAL,
+                top=config.PROFILE_TOP,
+            )
+        )
+    return job_runner.submit(
+        eval_id,
+        eval_agent,
+        questions,
+        hooks=jobs.HookChain(*hooks),
+        prior=prior,
+        trace_id=record.trace_id,
+    )
+
+
+def _question_payloads(q_records: List[db_models.Question]) -> List[Dict]:
+    return [
+        {"id": q.id, "text": q.text, "options": q.options, "correct": q.correct, "ku": q.ku}
+        for q in q_records
+    ]
+
+
 @app.post("/evaluations", response_model=Evaluation)
 def create_evaluation(
     data: EvaluationCreate,
     token: str = Depends(require_token),
     db: SessionLocal = Depends(get_db),
 ):
-    eval_id = f"ev{len(_evaluations)+1}"
-
-    # Select questions based on requested scope
-    q_query = db.query(db_models.Question)
-    if data.question_scope:
-        q_query = q_query.filter(db_models.Question.ku.in_(data.question_scope))
-    q_records = q_query.limit(data.question_count).all()
-    questions = [
-        {"id": q.id, "text": q.text, "options": q.options, "correct": q.correct}
-        for q in q_records
-    ]
+    """Queue an evaluation.
 
-    # Load models
-    m_query = db.query(db_models.Model)
-    if data.model_ids:
-        m_query = m_query.filter(db_models.Model.id.in_(data.model_ids))
-    m_records = m_query.all()
-
-    cfg = load_agent_config()
-    model_agents = [
-        ModelAgent(
-            model_id=m.id,
-            name=m.name,
-            max_retries=cfg["model"]["max_retries"],
-            response_format=cfg["model"]["response_format"],
-        )
-        for m in m_records
-    ]
+    With ``base_evaluation_id`` the run is a delta of that evaluation: it
+    keeps the base's questions, tops them up with new ones to reach
+    ``question_count`` and reuses every stored answer of the selected
+    models, so only new (model, question) pairs are asked.  ``config``
+    overrides are deep-merged into the agent config and the result is stored
+    with the evaluation, which keeps using it if it is resumed; settings of
+    process-wide resources (``http``, ``cache`` and the limiter and breaker
+    keys of ``limits``) are rejected.  With
+    ``profile`` the stage timings of the trace and a sampled CPU profile of
+    the run are stored under ``details["profile"]``.  ``skip_duplicates``
+    draws only the oldest question of every near-duplicate cluster.  The
+    early-stopping rule of ``adaptive`` runs comes from the
+    ``evaluation.adaptive_*`` config keys and is checked before queueing.
+    """
 
-    eval_agent = EvaluationAgent(
-        model_agents,
-        timeout=cfg["evaluation"]["timeout"],
-        mode=data.mode or cfg["evaluation"]["mode"],
-    )
-    results = eval_agent.evaluate(questions)
+    try:
+        cfg = agent_config().merged(data.config, locked=PROCESS_SETTINGS)
+        if (data.mode or cfg.evaluation.mode) == "adaptive":
+            _stopping_rule(cfg)
+    except (ConfigError, ValueError) as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
 
-    evaluation = Evaluation(
-        evaluation_id=eval_id,
-        status="completed",
-        start_time=datetime.utcnow(),
-        end_time=datetime.utcnow(),
-    )
-    _evaluations[eval_id] = evaluation
-    _evaluation_results[eval_id] = EvaluationResult(
-        models=results["models"], questions=results["questions"]
+    # Draw a reproducible sample stratified by KU within the requested scope
+    seed = data.seed if data.seed is not None else sampling.new_seed()
+    if data.allocation not in ("proportional", "equal"):
+        raise HTTPException(status_code=422, detail="allocation must be 'proportional' or 'equal'")
+    if data.benchmark_id is not None and db.get(db_models.Benchmark, data.benchmark_id) is None:
+        raise HTTPException(status_code=404, detail="Benchmark not found")
+
+    trace_id = tracing.new_trace_id()
+    if data.profile:
+        tracing.TRACER.collect(trace_id)
+    try:
+        with tracing.span("create_evaluation", trace_id=trace_id):
+            with tracing.span("select_questions"):
+                sampler = sampling.QuestionSampler(question_index, allocation=data.allocation)
+                skip = _loaded_curation(db).redundant_ids() if data.skip_duplicates else set()
+                base = None
+                if data.base_evaluation_id:
+                    base = _get_evaluation_record(db, data.base_evaluation_id)
+                    if base.status not in jobs.FINISHED_STATES:
+                        raise HTTPException(status_code=409, detail="Base evaluation is still running")
+                    base_ids = storage.question_order(db, base.id)
+                    extra = max(0, data.question_count - len(base_ids))
+                    new_ids = sampler.sample_ids(
+                        db, extra, seed, scope=data.question_scope, exclude=set(base_ids) | skip
+                    ) if extra else []
+                    q_records = sampling.load_questions(db, base_ids + new_ids)
+                else:
+                    ids = sampler.sample_ids(
+                        db, data.question_count, seed, scope=data.question_scope, exclude=skip
+                    )
+                    q_records = sampling.load_questions(db, ids)
+                questions = _question_payloads(q_records)
+
+            with tracing.span("load_models"):
+                m_query = db.query(db_models.Model)
+                if data.model_ids:
+                    m_query = m_query.filter(db_models.Model.id.in_(data.model_ids))
+                model_agents = _model_agents(cfg, m_query.all())
+
+            with tracing.span("persist"):
+                record = db_models.Evaluation(
+                    status=jobs.QUEUED,
+                    mode=data.mode or cfg.evaluation.mode,
+                    seed=seed,
+                    base_id=base.id if base is not None else None,
+                    start_time=datetime.utcnow(),
+                    question_count=len(questions),
+                    model_count=len(model_agents),
+                    model_ids=[m.model_id for m in model_agents],
+                    config=cfg.to_dict(),
+                    trace_id=trace_id,
+                    benchmark_id=data.benchmark_id,
+                )
+                db.add(record)
+                db.flush()
+                storage.save_question_order(db, record.id, [q["id"] for q in questions])
+                prior = None
+                if base is not None:
+                    storage.copy_answers(db, base.id, record.id, record.model_ids)
+                    prior = storage.load_answers(db, record.id)
+                db.commit()
+                db.refresh(record)
+    except Exception:
+        if data.profile:
+            tracing.TRACER.stages(trace_id)  # stop collecting for the failed request
+        raise
+
+    job = _start_evaluation(
+        record, questions, model_agents, cfg, data.bypass_cache, prior, profile=data.profile
     )
-    return evaluation
+    return _evaluation_response(record, job)
 
 
 @app.get("/evaluations/{evaluation_id}/status", response_model=Evaluation)
-def get_evaluation_status(evaluation_id: str, token: str = Depends(require_token)):
-    if evaluation_id not in _evaluations:
-        raise HTTPException(status_code=404, detail="Evaluation not found")
-    return _evaluations[evaluation_id]
+async def get_evaluation_status(
+    evaluation_id: str,
+    token: str = Depends(require_token),
+    db: AsyncSession = Depends(get_async_db),
+):
+    record = await _get_evaluation_record_async(db, evaluation_id)
+    return _evaluation_response(record, job_runner.get(evaluation_id))
+
+
+@app.post("/evaluations/{evaluation_id}/cancel", response_model=Evaluation)
+def cancel_evaluation(
+    evaluation_id: str,
+    token: str = Depends(require_token),
+    db: SessionLocal = Depends(get_db),
+):
+    record = _get_evaluation_record(db, evaluation_id)
+    job = job_runner.cancel(evaluation_id)
+    if job is None and record.status not in jobs.FINISHED_STATES:
+        raise HTTPException(status_code=409, detail="Evaluation is not running on this instance")
+    db.refresh(record)
+    return _evaluation_response(record, job_runner.get(evaluation_id))
+
+
+@app.post("/evaluations/{evaluation_id}/resume", response_model=Evaluation)
+def resume_evaluation(
+    evaluation_id: str,
+    bypass_cache: bool = False,
+    token: str = Depends(require_token),
+    db: SessionLocal = Depends(get_db),
+):
+    """Continue an interrupted, failed or cancelled evaluation.
+
+    Answers already stored are kept as checkpoints and only the missing
+    (model, question) pairs are asked.  Only resume runs whose worker is
+    gone; this instance refuses runs it is still executing.
+    """
+
+    record = _get_evaluation_record(db, evaluation_id)
+    if job_runner.get(evaluation_id) is not None:
+        raise HTTPException(status_code=409, detail="Evaluation is already running on this instance")
+    if record.status == jobs.COMPLETED:
+        raise HTTPException(status_code=409, detail="Evaluation is already completed")
+
+    questions = _question_payloads(sampling.load_questions(db, storage.question_order(db, record.id)))
+    models_by_id = {
+        m.id: m
+        for m in db.query(db_models.Model).filter(db_models.Model.id.in_(record.model_ids or []))
+    }
+    m_records = [models_by_id[i] for i in record.model_ids or [] if i in models_by_id]
+    # Keep the settings the run started with.
+    cfg = AgentConfig.from_dict(record.config) if record.config else agent_config()
+    model_agents = _model_agents(cfg, m_records)
+    prior = storage.load_answers(db, record.id)
+
+    record.status = jobs.QUEUED
+    record.end_time = None
+    record.error = None
+    record.results = None
+    storage.save_question_order(db, record.id, [q["id"] for q in questions])
+    record.question_count = len(questions)
+    record.model_ids = [m.model_id for m in model_agents]
+    record.model_count = len(model_agents)
+    record.answered = len(prior)
+    record.trace_id = tracing.new_trace_id()
+    db.commit()
+    db.refresh(record)
+
+    job = _start_evaluation(record, questions, model_agents, cfg, bypass_cache, prior)
+    return _evaluation_response(record, job)
 
 
 @app.get("/evaluations/{evaluation_id}", response_model=EvaluationResult)
-def get_evaluation_results(evaluation_id: str, token: str = Depends(require_token)):
-    if evaluation_id not in _evaluation_results:
-        raise HTTPException(status_code=404, detail="Evaluation not found")
-    return _evaluation_results[evaluation_id]
+async def get_evaluation_results(
+    evaluation_id: str,
+    offset: int = 0,
+    limit: int = 1000,
+    token: str = Depends(require_token),
+    db: AsyncSession = Depends(get_async_db),
+):
+    record = await _get_evaluation_record_async(db, evaluation_id)
+    if record.results is None:
+        raise HTTPException(status_code=409, detail="Evaluation has no results yet")
+    details = record.details or {}
+    benchmark = None
+    if record.benchmark_id is not None:
+        accuracy = {m["id"]: m["accuracy"] for m in record.results}
+        benchmark = await db.run_sync(_benchmark_summary, record.benchmark_id, accuracy)
+    return EvaluationResult(
+        models=record.results,
+        questions=await db.run_sync(storage.page_questions, record, offset=offset, limit=limit),
+        question_total=record.question_count,
+        offset=offset,
+        cache=details.get("cache"),
+        analytics=details.get("analytics"),
+        peer=details.get("peer"),
+        adaptive=details.get("adaptive"),
+        profile=details.get("profile"),
+        benchmark=benchmark,
+    )
+
+
+@app.get("/evaluations/{evaluation_id}/export")
+def export_evaluation(
+    evaluation_id: str,
+    table: str = "answers",
+    format: Optional[str] = None,
+    compression: str = "none",
+    chunk_size: int = config.EXPORT_CHUNK_SIZE,
+    token: str = Depends(require_token),
+    db: SessionLocal = Depends(get_db),
+):
+    """Stream one result table of an evaluation as a file download.
+
+    ``table`` is ``answers`` (one row per stored answer, also while the run
+    is in progress) or ``models`` (per-model accuracy overall and per KU).
+    ``format`` is ``csv`` or ``parquet`` and defaults to the analytics
+    ``export_format``; ``compression`` is ``none``, ``gzip`` or ``zstd``.
+    Answers are read and encoded ``chunk_size`` rows at a time.
+    """
+
+    fmt = format or agent_config().analytics.export_format
+    try:
+        export.check_options(table, fmt, compression)
+    except export.ExportError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+    record = _get_evaluation_record(db, evaluation_id)
+    if table == "models" and record.results is None:
+        raise HTTPException(status_code=409, detail="Evaluation has no results yet")
+    chunks = export.iter_export(SessionLocal, record, table, fmt, compression, chunk_size)
+    name = export.filename(evaluation_id, table, fmt, compression)
+    media_type = export.MEDIA_TYPES[fmt]
+    if fmt == "csv" and compression != "none":
+        media_type = "application/gzip" if compression == "gzip" else "application/zstd"
+    return StreamingResponse(
+        chunks, media_type=media_type, headers={"Content-Disposition": f'attachment; filename="{name}"'}
+    )
+
+
+@app.get("/evaluations/{evaluation_id}/trace")
+async def get_evaluation_trace(
+    evaluation_id: str,
+    token: str = Depends(require_token),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Spans of the evaluation's latest run still held in memory.
+
+    Spans are only kept with the ``memory`` trace exporter; the stored
+    profile is returned as well when the run was profiled.
+    """
+
+    record = await _get_evaluation_record_async(db, evaluation_id)
+    spans = tracing.TRACER.spans(record.trace_id) if record.trace_id else []
+    return {
+        "trace_id": record.trace_id,
+        "spans": [s.to_dict() for s in sorted(spans, key=lambda s: s.start)],
+        "profile": (record.details or {}).get("profile"),
+    }
+
+
+def _encode_sse(kind: str, payload: Dict) -> str:
+    event_id = f"id: {payload['offset']}\n" if kind == "answer" else ""
+    return f"{event_id}event: {kind}\ndata: {json.dumps(payload)}\n\n"
+
+
+def _encode_ndjson(kind: str, payload: Dict) -> str:
+    return json.dumps({"event": kind, **payload}) + "\n"
+
+
+async def _stream_progress(evaluation_id: str, pk: int, offset: int, fmt: str):
+    encode = _encode_sse if fmt == "sse" else _encode_ndjson
+    keepalive = ": keepalive\n\n" if fmt == "sse" else encode("keepalive", {})
+    batch = config.PROGRESS_BUFFER_SIZE
+    log = progress_broker.get(evaluation_id)
+    # Subscribe before reading history so no event falls between the two.
+    sub = log.subscribe(batch) if log is not None else None
+    db = SessionLocal()
+    cursor: Optional[storage.AnswerCursor] = None
+
+    def history(start: int) -> List[Dict]:
+        nonlocal cursor
+        if log is not None:
+            events = log.since(start, batch)
+            if events is not None:
+                return events
+        if cursor is None or cursor.offset != start:
+            cursor = storage.AnswerCursor(db, pk, start)
+        return cursor.fetch(batch)
+
+    def status_event() -> Dict:
+        db.expire_all()
+        record = db.get(db_models.Evaluation, pk)
+        return _evaluation_response(record, job_runner.get(evaluation_id)).model_dump(mode="json")
+
+    def chunk(events: List[Dict]) -> str:
+        if log is not None:
+            models = log.model_stats()
+        else:
+            models = progress.model_stats(cursor.counts) if cursor is not None else []
+        body = "".join(encode("answer", e) for e in events)
+        return body + encode("progress", {"answered": events[-1]["offset"] + 1, "models": models})
+
+    try:
+        yield encode("status", await run_in_threadpool(status_event))
+        finished = False
+        while True:
+            events = await run_in_threadpool(history, offset)
+            if events:
+                offset = events[-1]["offset"] + 1
+                yield chunk(events)
+                continue
+            if finished:
+                break
+            if sub is not None:
+                live, lagged = await sub.next(config.PROGRESS_KEEPALIVE)
+                live = [e for e in live if e["offset"] >= offset]
+                if live and not lagged and live[0]["offset"] == offset:
+                    offset = live[-1]["offset"] + 1
+                    yield chunk(live)
+                elif not live and not lagged and not sub.closed:
+                    yield keepalive
+                # Dropped or out-of-order events are re-read from history.
+                finished = sub.closed
+            else:
+                # The job runs elsewhere (or is done): poll the database.
+                state = await run_in_threadpool(status_event)
+                finished = state["status"] in jobs.FINISHED_STATES
+                if not finished:
+                    yield keepalive
+                    await asyncio.sleep(config.PROGRESS_POLL_INTERVAL)
+        yield encode("status", await run_in_threadpool(status_event))
+    finally:
+        if sub is not None:
+            sub.cancel()
+        db.close()
+
+
+@app.get("/evaluations/{evaluation_id}/events")
+def stream_evaluation_events(
+    evaluation_id: str,
+    request: Request,
+    offset: Optional[int] = None,
+    format: str = "sse",
+    token: str = Depends(require_token),
+    db: SessionLocal = Depends(get_db),
+):
+    """Stream answers and running per-model accuracy as they are recorded.
+
+    Every answer event carries an ``offset``; reconnect with ``offset`` set to
+    the last offset received plus one (SSE clients send ``Last-Event-ID``
+    automatically) to resume without gaps.  ``format`` is ``sse`` or
+    ``ndjson``.  The stream ends after the final status event.
+    """
+
+    if format not in ("sse", "ndjson"):
+        raise HTTPException(status_code=422, detail="format must be 'sse' or 'ndjson'")
+    record = _get_evaluation_record(db, evaluation_id)
+    if offset is None:
+        last_event_id = request.headers.get("last-event-id")
+        offset = int(last_event_id) + 1 if last_event_id and last_event_id.isdigit() else 0
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(
+        _stream_progress(evaluation_id, record.id, max(0, offset), format),
+        media_type=media_type,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# ---------------------------------------------------------------------------
+# Benchmark endpoints
+# ---------------------------------------------------------------------------
+def _benchmark_path(path: str) -> str:
+    root = os.path.realpath(config.BENCHMARK_DIR)
+    full = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, full]) != root:
+        raise HTTPException(status_code=422, detail="Benchmark path must be inside BENCHMARK_DIR")
+    if not os.path.isfile(full):
+        raise HTTPException(status_code=422, detail=f"Benchmark dataset '{path}' not found")
+    return full
+
+
+def _benchmark_summary(db, benchmark_id: int, accuracy: Dict[int, float]) -> Dict[str, Any]:
+    """Benchmark scores of the models in ``accuracy`` and their correlation."""
+
+    scores = {
+        model_id: row.score
+        for model_id, row in storage.benchmark_scores(db, benchmark_id).items()
+        if model_id in accuracy
+    }
+    return {
+        "benchmark_id": benchmark_id,
+        "scores": scores,
+        "correlation": BenchmarkAgent.correlate(scores, accuracy),
+    }
+
+
+def _benchmark_result_response(row: db_models.BenchmarkResult) -> BenchmarkResult:
+    return BenchmarkResult(
+        id=row.id,
+        benchmark_id=row.benchmark_id,
+        model_id=row.model_id,
+        status=row.status,
+        start_time=row.start_time,
+        end_time=row.end_time,
+        error=row.error,
+        items=row.items,
+        correct=row.correct,
+        accuracy=row.accuracy,
+        score=row.score,
+        details=row.details,
+    )
+
+
+def _run_benchmark(result_pk: int, path: str, model_agent: ModelAgent, cfg: AgentConfig) -> None:
+    db = SessionLocal()
+    try:
+        row = db.get(db_models.BenchmarkResult, result_pk)
+        row.status = jobs.RUNNING
+        db.commit()
+        agent = BenchmarkAgent(
+            processes=config.BENCHMARK_PROCESSES or None,
+            max_concurrency=cfg.evaluation.per_model_concurrency,
+            timeout=cfg.evaluation.timeout,
+            checkpoint_dir=config.BENCHMARK_CHECKPOINT_DIR,
+        )
+        try:
+            result = agent.run(model_agent, path)
+        except Exception as exc:  # surfaced through the results endpoint
+            row.status = jobs.FAILED
+            row.error = str(exc)
+        else:
+            row.status = jobs.COMPLETED
+            row.items = result["items"]
+            row.correct = result["correct"]
+            row.accuracy = result["accuracy"]
+            row.score = result["benchmark_score"]
+            row.details = result
+        row.end_time = datetime.utcnow()
+        db.commit()
+    finally:
+        db.close()
+
+
+@app.post("/benchmarks", response_model=Benchmark)
+def create_benchmark(
+    data: BenchmarkCreate,
+    token: str = Depends(require_token),
+    db: SessionLocal = Depends(get_db),
+):
+    _benchmark_path(data.path)
+    record = db_models.Benchmark(name=data.name, path=data.path)
+    db.add(record)
+    db.commit()
+    db.refresh(record)
+    return Benchmark(id=record.id, name=record.name, path=record.path)
+
+
+@app.get("/benchmarks", response_model=List[Benchmark])
+def list_benchmarks(token: str = Depends(require_token), db: SessionLocal = Depends(get_db)):
+    return [
+        Benchmark(id=b.id, name=b.name, path=b.path)
+        for b in db.query(db_models.Benchmark).order_by(db_models.Benchmark.id)
+    ]
+
+
+@app.post("/benchmarks/{benchmark_id}/runs", response_model=List[BenchmarkResult])
+def run_benchmark(
+    benchmark_id: int,
+    data: BenchmarkRunCreate,
+    token: str = Depends(require_token),
+    db: SessionLocal = Depends(get_db),
+):
+    """Queue a run of the benchmark for each model (all models by default).
+
+    Runs execute in the background one after another.  A run that was
+    interrupted resumes from its shard checkpoints when queued again.
+    """
+
+    benchmark = db.get(db_models.Benchmark, benchmark_id)
+    if benchmark is None:
+        raise HTTPException(status_code=404, detail="Benchmark not found")
+    path = _benchmark_path(benchmark.path)
+    m_query = db.query(db_models.Model)
+    if data.model_ids:
+        m_query = m_query.filter(db_models.Model.id.in_(data.model_ids))
+    cfg = agent_config()
+    runs = []
+    for m in m_query.all():
+        model_agent = _model_agent(cfg, m)
+        row = db_models.BenchmarkResult(
+            benchmark_id=benchmark_id, model_id=m.id, status=jobs.QUEUED, start_time=datetime.utcnow()
+        )
+        db.add(row)
+        runs.append((row, model_agent))
+    db.commit()
+    for row, model_agent in runs:
+        benchmark_executor.submit(_run_benchmark, row.id, path, model_agent, cfg)
+    return [_benchmark_result_response(row) for row, _ in runs]
+
+
+@app.get("/benchmarks/{benchmark_id}/results")
+def get_benchmark_results(
+    benchmark_id: int,
+    token: str = Depends(require_token),
+    db: SessionLocal = Depends(get_db),
+):
+    """Every run of the benchmark, plus the correlation of each model's latest
+    score with its MCQ accuracy over completed evaluations."""
+
+    if db.get(db_models.Benchmark, benchmark_id) is None:
+        raise HTTPException(status_code=404, detail="Benchmark not found")
+    runs = (
+        db.query(db_models.BenchmarkResult)
+        .filter(db_models.BenchmarkResult.benchmark_id == benchmark_id)
+        .order_by(db_models.BenchmarkResult.id)
+        .all()
+    )
+    summary = _benchmark_summary(db, benchmark_id, storage.mcq_accuracy(db))
+    return {
+        "runs": [_benchmark_result_response(r) for r in runs],
+        "scores": summary["scores"],
+        "correlation": summary["correlation"],
+    }
 
 
 # ---------------------------------------------------------------------------
@@ -0,0 +1,108 @@
+"""API-level metrics: request latency, SQL timings and evaluation gauges.
+
+The metric primitives and the engine's per-model metrics live in
+:mod:`backend.agents.metrics`; everything is rendered together by
+``GET /metrics``.
+"""
+
+from __future__ import annotations
+
+import time
+from typing import Dict, Tuple
+
+from sqlalchemy import event
+
+from . import jobs
+from .agents.metrics import REGISTRY
+
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "axiom_http_request_seconds",
+    "Time to produce the response headers, by route template.",
+    ("method", "route", "status"),
+)
+DB_QUERY_SECONDS = REGISTRY.histogram(
+    "axiom_db_query_seconds",
+    "Duration of SQL statements by statement type.",
+    ("statement",),
+)
+
+
+class RequestMetricsMiddleware:
+    """ASGI middleware recording :data:`HTTP_REQUEST_SECONDS`.
+
+    Requests are labelled with the matched route template (``/evaluations/
+    {evaluation_id}``) rather than the raw path to keep cardinality bounded.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+
+        async def send_with_metrics(message) -> None:
+            if message["type"] == "http.response.start":
+                route = getattr(scope.get("route"), "path", "unmatched")
+                HTTP_REQUEST_SECONDS.observe(
+                    time.perf_counter() - started, scope["method"], route, str(message["status"])
+                )
+            await send(message)
+
+        await self.app(scope, receive, send_with_metrics)
+
+
+def _statement_type(statement: str) -> str:
+    word = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    return word if word in {"SELECT", "INSERT", "UPDATE", "DELETE", "PRAGMA"} else "OTHER"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    conn.info.setdefault("axiom_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    started = conn.info["axiom_query_start"].pop()
+    DB_QUERY_SECONDS.observe(time.perf_counter() - started, _statement_type(statement))
+
+
+def instrument_engine(sync_engine) -> None:
+    """Time every statement executed through ``sync_engine``.
+
+    For an async engine pass its ``sync_engine``.
+    """
+
+    if not event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def register_job_gauges(runner: jobs.JobRunner) -> None:
+    """Expose the runner's queue depth, in-flight jobs and answer rate."""
+
+    def by_status() -> Dict[Tuple[str, ...], int]:
+        counts = {(jobs.QUEUED,): 0, (jobs.RUNNING,): 0}
+        for job in runner.jobs():
+            counts[(job.status,)] = counts.get((job.status,), 0) + 1
+        return counts
+
+    def answers_per_second() -> float:
+        return sum(job.throughput() for job in runner.jobs() if job.status == jobs.RUNNING)
+
+    REGISTRY.gauge(
+        "axiom_evaluations",
+        "Evaluations tracked by this instance by status (queued = queue depth).",
+        by_status,
+        ("status",),
+    )
+    REGISTRY.gauge(
+        "axiom_evaluation_answers_per_second",
+        "Combined answer rate of the evaluations running on this instance.",
+        answers_per_second,
+    )
+
+
+def render() -> str:
+    return REGISTRY.render()
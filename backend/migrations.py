@@ -0,0 +1,133 @@
+"""Schema upgrades for databases created by older versions.
+
+``Base.metadata.create_all`` creates missing tables (with their indexes) but
+never changes a table that already exists.  :func:`upgrade` runs it and then
+brings existing tables up to date: it adds the columns listed in
+:data:`COLUMNS` with ``ALTER TABLE``, fills in data for columns that need it
+(:data:`BACKFILLS`) and adds the indexes listed in :data:`INDEXES` with
+``CREATE INDEX IF NOT EXISTS``.  Every step checks the live schema first, so
+running it on an up-to-date database is a no-op.
+"""
+
+from __future__ import annotations
+
+from typing import Callable, Dict, List, Tuple
+
+from sqlalchemy import Index, inspect, select, text, update
+from sqlalchemy.engine import Connection, Engine
+
+from . import models as db_models
+from .importer import content_hash
+
+BACKFILL_BATCH = 1000
+
+# Columns added to tables that older versions already created, as
+# ``(table, column)``; their types come from the models.
+COLUMNS: List[Tuple[str, str]] = [
+    ("questions", "content_hash"),
+    ("models", "requests_per_minute"),
+    ("models", "tokens_per_minute"),
+    ("models", "max_concurrency"),
+    ("models", "base_url"),
+    ("models", "replica_urls"),
+]
+
+# Indexes added to tables that older versions already created.  They are
+# created after the backfills, so unique indexes see the filled-in values.
+INDEXES = [
+    "ix_questions_ku_id",
+    "ix_questions_content_hash",
+]
+
+
+def _backfill_content_hash(conn: Connection) -> None:
+    """Hash the questions stored before deduplication existed.
+
+    The oldest copy of duplicated content gets the hash; later copies keep
+    ``NULL`` so the unique index can still be created (they remain readable
+    and can be removed by hand).
+    """
+
+    table = db_models.Question.__table__
+    seen = set(conn.execute(select(table.c.content_hash).where(table.c.content_hash.is_not(None))).scalars())
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            select(table.c.id, table.c.text, table.c.options)
+            .where(table.c.id > last_id, table.c.content_hash.is_(None))
+            .order_by(table.c.id)
+            .limit(BACKFILL_BATCH)
+        ).all()
+        if not rows:
+            return
+        last_id = rows[-1].id
+        for row in rows:
+            digest = content_hash(row.text, row.options or [])
+            if digest in seen:
+                continue
+            seen.add(digest)
+            conn.execute(update(table).where(table.c.id == row.id).values(content_hash=digest))
+
+
+# Run once, right after their column was added.
+BACKFILLS: Dict[Tuple[str, str], Callable[[Connection], None]] = {
+    ("questions", "content_hash"): _backfill_content_hash,
+}
+
+
+def _add_columns(conn: Connection) -> List[str]:
+    schema = inspect(conn)
+    tables = db_models.Base.metadata.tables
+    applied = []
+    for table_name, column_name in COLUMNS:
+        existing = {c["name"] for c in schema.get_columns(table_name)}
+        if column_name in existing:
+            continue
+        column = tables[table_name].c[column_name]
+        ddl_type = column.type.compile(dialect=conn.dialect)
+        conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {ddl_type}"))
+        applied.append(f"column {table_name}.{column_name}")
+        backfill = BACKFILLS.get((table_name, column_name))
+        if backfill is not None:
+            backfill(conn)
+            applied.append(f"backfill {table_name}.{column_name}")
+    return applied
+
+
+def _index(name: str) -> Index:
+    for table in db_models.Base.metadata.tables.values():
+        for index in table.indexes:
+            if index.name == name:
+                return index
+    raise KeyError(name)
+
+
+def _create_indexes(conn: Connection) -> List[str]:
+    existing = {
+        index["name"]
+        for table in {_index(name).table.name for name in INDEXES}
+        for index in inspect(conn).get_indexes(table)
+    }
+    applied = []
+    for name in INDEXES:
+        if name in existing:
+            continue
+        index = _index(name)
+        columns = ", ".join(c.name for c in index.columns)
+        unique = "UNIQUE " if index.unique else ""
+        conn.execute(
+            text(f"CREATE {unique}INDEX IF NOT EXISTS {name} ON {index.table.name} ({columns})")
+        )
+        applied.append(f"index {name}")
+    return applied
+
+
+def upgrade(engine: Engine) -> List[str]:
+    """Create missing tables and upgrade existing ones; returns the steps run."""
+
+    db_models.Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        return _add_columns(conn) + _create_indexes(conn)
+
+
+__all__ = ["BACKFILLS", "COLUMNS", "INDEXES", "upgrade"]
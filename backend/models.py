@@ -1,15 +1,18 @@
-from sqlalchemy import Column, Integer, String, Text
+from sqlalchemy import Boolean, Column, DateTime, Float, ForeignKey, Index, Integer, String, Text
 from sqlalchemy.types import JSON
 from .database import Base
 
 class Question(Base):
     __tablename__ = "questions"
+    # Covers KU filters and lets the sampler read per-KU ids from the index.
+    __table_args__ = (Index("ix_questions_ku_id", "ku", "id"),)
 
     id = Column(Integer, primary_key=True, index=True)
     text = Column(Text, nullable=False)
     options = Column(JSON)
     correct = Column(String, nullable=False)
     ku = Column(String, nullable=False)
+    content_hash = Column(String(64), unique=True, index=True)
 
 class Model(Base):
     __tablename__ = "models"
@@ -17,6 +20,94 @@ class Model(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
     type = Column(String, nullable=False)
+    # ``active``, or ``degraded`` while the model's circuit breaker is open.
     status = Column(String, nullable=False)
     api_key = Column(String)
     model_name = Column(String)
+    # Endpoint of HTTP adapters (``type`` openai, tgi or http).
+    base_url = Column(String)
+    # Alternate endpoints of the same model for hedged calls.
+    replica_urls = Column(JSON)
+    # Provider limits; NULL falls back to the ``limits`` agent config.
+    requests_per_minute = Column(Integer)
+    tokens_per_minute = Column(Integer)
+    max_concurrency = Column(Integer)
+
+class Evaluation(Base):
+    __tablename__ = "evaluations"
+
+    id = Column(Integer, primary_key=True, index=True)
+    status = Column(String, nullable=False)
+    mode = Column(String)
+    start_time = Column(DateTime, nullable=False)
+    end_time = Column(DateTime)
+    question_count = Column(Integer, nullable=False, default=0)
+    model_count = Column(Integer, nullable=False, default=0)
+    answered = Column(Integer, nullable=False, default=0)
+    questions_answered = Column(Integer, nullable=False, default=0)
+    error = Column(Text)
+    seed = Column(Integer)
+    # Evaluation whose answers were reused by this (delta) evaluation.
+    base_id = Column(Integer, ForeignKey("evaluations.id", ondelete="SET NULL"))
+    model_ids = Column(JSON)
+    results = Column(JSON)
+    # Run-level extras from the evaluation result (cache counters, ...).
+    details = Column(JSON)
+    # Agent config snapshot the run started with (resumes reuse it).
+    config = Column(JSON)
+    # Trace of the latest run; its spans carry this id.
+    trace_id = Column(String)
+    # Benchmark whose scores the results are correlated with.
+    benchmark_id = Column(Integer, ForeignKey("benchmarks.id", ondelete="SET NULL"))
+
+class EvaluationQuestion(Base):
+    __tablename__ = "evaluation_questions"
+    # The questions of an evaluation in order; a page of results is a range
+    # read on the primary key.
+
+    evaluation_id = Column(Integer, ForeignKey("evaluations.id", ondelete="CASCADE"), primary_key=True)
+    position = Column(Integer, primary_key=True)
+    question_id = Column(Integer, nullable=False)
+
+class Answer(Base):
+    __tablename__ = "answers"
+    __table_args__ = (
+        Index("ix_answers_evaluation_model", "evaluation_id", "model_id"),
+        Index("ix_answers_evaluation_question", "evaluation_id", "question_id"),
+        # Keyset reads of an evaluation's answers in recording order (event
+        # replay, exports) seek on this instead of sorting every page.
+        Index("ix_answers_evaluation_id", "evaluation_id", "id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    evaluation_id = Column(Integer, ForeignKey("evaluations.id", ondelete="CASCADE"), nullable=False)
+    model_id = Column(Integer, nullable=False)
+    question_id = Column(Integer, nullable=False)
+    answer = Column(String)
+    correct = Column(Boolean, nullable=False, default=False)
+
+class Benchmark(Base):
+    __tablename__ = "benchmarks"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, nullable=False)
+    # JSONL dataset, relative to ``BENCHMARK_DIR``.
+    path = Column(String, nullable=False)
+
+class BenchmarkResult(Base):
+    __tablename__ = "benchmark_results"
+    __table_args__ = (Index("ix_benchmark_results_benchmark_model", "benchmark_id", "model_id"),)
+
+    id = Column(Integer, primary_key=True)
+    benchmark_id = Column(Integer, ForeignKey("benchmarks.id", ondelete="CASCADE"), nullable=False)
+    model_id = Column(Integer, nullable=False)
+    status = Column(String, nullable=False)
+    start_time = Column(DateTime, nullable=False)
+    end_time = Column(DateTime)
+    error = Column(Text)
+    items = Column(Integer, nullable=False, default=0)
+    correct = Column(Integer, nullable=False, default=0)
+    accuracy = Column(Float)
+    # Chance-normalized accuracy (0 = guessing, 1 = perfect).
+    score = Column(Float)
+    details = Column(JSON)
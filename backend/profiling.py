@@ -0,0 +1,224 @@
+"""Opt-in profiling of evaluation runs.
+
+:class:`SamplingProfiler` periodically snapshots the Python stacks of the
+threads working on one evaluation (its job thread and the engine's call
+threads) with :func:`sys._current_frames`.  Nothing is instrumented, so the
+run's own overhead stays at one stack walk per thread and interval.  Samples
+whose innermost frame is waiting (an idle pool thread, the event loop
+polling, a lock) are counted as idle instead of being attributed to a
+function, which keeps the profile about CPU work rather than waiting.
+
+:class:`ProfileHooks` starts the profiler when a job starts running and, once
+it finishes, stores the profile together with the per-stage span timings of
+its trace under ``details["profile"]`` of the evaluation row.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from . import models as db_models
+from .agents import tracing
+from .jobs import FINISHED_STATES, RUNNING, EvaluationJob, JobHooks
+
+logger = logging.getLogger(__name__)
+
+# (file name, function) of frames that only wait for work or I/O.
+IDLE_FRAMES = {
+    ("thread.py", "_worker"),
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+}
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _location(code) -> str:
+    path = code.co_filename
+    if path.startswith(_ROOT):
+        path = os.path.relpath(path, _ROOT)
+    else:
+        path = os.path.basename(path)
+    return f"{code.co_name} ({path}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Statistical profiler of a group of threads.
+
+    Parameters
+    ----------
+    thread_prefix: str
+        Threads whose name is ``thread_prefix`` followed by ``_<n>`` (the
+        naming of :class:`~concurrent.futures.ThreadPoolExecutor`) are
+        sampled, next to the idents passed to :meth:`add_thread`.
+    interval: float
+        Seconds between two samples.
+    """
+
+    def __init__(self, thread_prefix: str = "", interval: float = 0.005) -> None:
+        self.thread_prefix = thread_prefix
+        self.interval = max(0.0005, interval)
+        self._idents: Set[int] = set()
+        self._self: Dict[str, int] = {}
+        self._total: Dict[str, int] = {}
+        self.samples = 0
+        self.idle = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._started = 0.0
+        self._elapsed = 0.0
+
+    def add_thread(self, ident: int) -> None:
+        self._idents.add(ident)
+
+    def start(self) -> None:
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._loop, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> Dict[str, Any]:
+        """Stop sampling and return :meth:`summary`."""
+
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+            self._elapsed = time.perf_counter() - self._started
+        return self.summary()
+
+    def _targets(self) -> Set[int]:
+        idents = set(self._idents)
+        if self.thread_prefix:
+            for thread in threading.enumerate():
+                if thread.name.rpartition("_")[0] == self.thread_prefix:
+                    idents.add(thread.ident)
+        return idents
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def sample(self) -> None:
+        """Record the current stack of every target thread."""
+
+        targets = self._targets()
+        for ident, frame in sys._current_frames().items():
+            if ident not in targets:
+                continue
+            self.samples += 1
+            code = frame.f_code
+            if (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+                self.idle += 1
+                continue
+            leaf = _location(code)
+            self._self[leaf] = self._self.get(leaf, 0) + 1
+            seen = set()
+            while frame is not None:
+                name = _location(frame.f_code)
+                if name not in seen:
+                    seen.add(name)
+                    self._total[name] = self._total.get(name, 0) + 1
+                frame = frame.f_back
+
+    def summary(self, top: int = 30) -> Dict[str, Any]:
+        """The ``top`` functions by samples spent in the function itself.
+
+        ``self`` counts samples with the function innermost, ``total`` the
+        samples with it anywhere on the stack; percentages are of the busy
+        (non-idle) samples.
+        """
+
+        busy = self.samples - self.idle
+        ranked: List[Tuple[str, int]] = sorted(self._self.items(), key=lambda kv: -kv[1])[:top]
+        return {
+            "interval": self.interval,
+            "seconds": round(self._elapsed, 6),
+            "samples": self.samples,
+            "idle_samples": self.idle,
+            "functions": [
+                {
+                    "function": name,
+                    "self": count,
+                    "total": self._total.get(name, count),
+                    "self_percent": round(100.0 * count / busy, 2) if busy else 0.0,
+                }
+                for name, count in ranked
+            ],
+        }
+
+
+class ProfileHooks(JobHooks):
+    """Profile a job and store the result on its evaluation row.
+
+    Parameters
+    ----------
+    session_factory: callable
+        Returns a new SQLAlchemy session for the final write.
+    evaluation_pk: int
+        Primary key of the evaluation.
+    thread_prefix: str
+        ``thread_name_prefix`` of the run's :class:`EvaluationAgent`.
+    interval: float
+        Seconds between samples.
+    top: int
+        Number of functions kept in the stored profile.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        evaluation_pk: int,
+        thread_prefix: str,
+        interval: float = 0.005,
+        top: int = 30,
+    ) -> None:
+        self._session_factory = session_factory
+        self.evaluation_pk = evaluation_pk
+        self.profiler = SamplingProfiler(thread_prefix, interval)
+        self.top = top
+        self._running = False
+
+    def on_status(self, job: EvaluationJob) -> None:
+        if job.status == RUNNING and not self._running:
+            # Status changes are reported on the job's worker thread.
+            self.profiler.add_thread(threading.get_ident())
+            self.profiler.start()
+            self._running = True
+        elif job.status in FINISHED_STATES:
+            self.profiler.stop()
+            self._running = False
+            self.store(job)
+
+    def store(self, job: EvaluationJob) -> Dict[str, Any]:
+        wall = (job.end_time - job.start_time).total_seconds() if job.end_time else None
+        profile = {
+            "trace_id": job.trace_id,
+            "wall_seconds": wall,
+            # Span seconds are summed, so concurrent model calls can add up
+            # to more than the wall time.
+            "stages": tracing.TRACER.stages(job.trace_id),
+            "cpu": self.profiler.summary(self.top),
+        }
+        db = self._session_factory()
+        try:
+            record = db.get(db_models.Evaluation, self.evaluation_pk)
+            if record is not None:
+                # Assign a new dict: in-place changes of a JSON column are
+                # not detected.
+                record.details = {**(record.details or {}), "profile": profile}
+                db.commit()
+        finally:
+            db.close()
+        return profile
+
+
+__all__ = ["IDLE_FRAMES", "ProfileHooks", "SamplingProfiler"]
@@ -0,0 +1,228 @@
+"""Live progress events for running evaluations.
+
+Every answer reported by a local job is appended to the job's
+:class:`ProgressLog` with a sequential ``offset``.  The log keeps a bounded
+window of recent events; older ones are replayed from the ``answers`` table
+(see :class:`~backend.storage.AnswerCursor`), so a client can reconnect and
+resume from any offset.  Subscribers get their own bounded buffer: when a
+slow client lets it fill up the buffer is dropped and the client catches up
+from the log or the database instead of growing server memory.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+from . import storage
+from .jobs import FINISHED_STATES, EvaluationJob, JobHooks
+
+
+class Subscription:
+    """Bounded buffer of live events for one stream consumer.
+
+    Must be created from the event loop that consumes it; :meth:`push` may be
+    called from any thread.
+    """
+
+    def __init__(self, log: "ProgressLog", buffer_size: int) -> None:
+        self.log = log
+        self.buffer_size = max(1, buffer_size)
+        self._buffer: Deque[Dict[str, Any]] = deque()
+        self._lock = threading.Lock()
+        self._loop = asyncio.get_running_loop()
+        self._ready = asyncio.Event()
+        self._signalled = False
+        self._overflowed = False
+        self.closed = False
+
+    def push(self, event: Optional[Dict[str, Any]]) -> None:
+        """Queue ``event``; ``None`` marks the end of the run."""
+
+        with self._lock:
+            if event is None:
+                self.closed = True
+            elif len(self._buffer) >= self.buffer_size:
+                self._buffer.clear()
+                self._overflowed = True
+            elif not self._overflowed:
+                self._buffer.append(event)
+            if self._signalled:
+                return
+            self._signalled = True
+        try:
+            self._loop.call_soon_threadsafe(self._ready.set)
+        except RuntimeError:  # the consumer's loop is gone
+            pass
+
+    async def next(self, timeout: float) -> Tuple[List[Dict[str, Any]], bool]:
+        """Wait up to ``timeout`` seconds and drain the buffer.
+
+        Returns the buffered events and whether events were dropped since the
+        last call, in which case the caller has to catch up from history.
+        """
+
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._ready.clear()
+        with self._lock:
+            events = list(self._buffer)
+            self._buffer.clear()
+            lagged, self._overflowed = self._overflowed, False
+            self._signalled = False
+        return events, lagged
+
+    def cancel(self) -> None:
+        self.log.unsubscribe(self)
+
+
+class ProgressLog:
+    """Recent events of one evaluation plus its live subscribers.
+
+    Parameters
+    ----------
+    evaluation_id: str
+        Public id of the evaluation.
+    history: int
+        Number of recent answer events kept in memory.  It should exceed the
+        answer batch size so every event is either here or already stored.
+    """
+
+    def __init__(self, evaluation_id: str, history: int = 10000) -> None:
+        self.evaluation_id = evaluation_id
+        self._events: Deque[Dict[str, Any]] = deque(maxlen=max(1, history))
+        self._subscribers: Set[Subscription] = set()
+        self._lock = threading.Lock()
+        self._models: Dict[int, List[int]] = {}
+        self.next_offset = 0
+        self.closed = False
+
+    def seed(self, prior: Dict[Tuple[int, int], Optional[str]], questions: List[Dict[str, Any]]) -> None:
+        """Account for answers stored before the job started.
+
+        They occupy the first offsets and are only replayed from the database.
+        """
+
+        correct = {q["id"]: q["correct"] for q in questions}
+        with self._lock:
+            for (model_id, question_id), answer in prior.items():
+                self.next_offset += 1
+                if question_id not in correct:
+                    continue
+                counts = self._models.setdefault(model_id, [0, 0])
+                counts[0] += 1
+                counts[1] += int(answer is not None and answer == correct[question_id])
+
+    def publish_answer(self, question: Dict[str, Any], model_id: int, answer: Optional[str]) -> None:
+        correct = answer is not None and answer == question["correct"]
+        with self._lock:
+            counts = self._models.setdefault(model_id, [0, 0])
+            counts[0] += 1
+            counts[1] += int(correct)
+            event = storage.answer_event(
+                self.next_offset, question["id"], model_id, answer, correct, counts[0], counts[1]
+            )
+            self.next_offset += 1
+            self._events.append(event)
+            subscribers = list(self._subscribers)
+        for sub in subscribers:
+            sub.push(event)
+
+    def close(self) -> None:
+        with self._lock:
+            self.closed = True
+            subscribers = list(self._subscribers)
+            self._subscribers.clear()
+        for sub in subscribers:
+            sub.push(None)
+
+    def subscribe(self, buffer_size: int) -> Subscription:
+        sub = Subscription(self, buffer_size)
+        with self._lock:
+            if self.closed:
+                sub.closed = True
+            else:
+                self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def since(self, offset: int, limit: int) -> Optional[List[Dict[str, Any]]]:
+        """Events from ``offset`` on, or ``None`` when they left the window."""
+
+        with self._lock:
+            if not self._events:
+                return None if offset < self.next_offset else []
+            first = self._events[0]["offset"]
+            if offset < first:
+                return None
+            start = offset - first
+            return [self._events[i] for i in range(start, min(len(self._events), start + limit))]
+
+    def model_stats(self) -> List[Dict[str, Any]]:
+        """Running per-model accuracy over everything published so far."""
+
+        with self._lock:
+            return model_stats(self._models)
+
+
+def model_stats(counts: Dict[int, List[int]]) -> List[Dict[str, Any]]:
+    return [
+        {
+            "id": model_id,
+            "answered": answered,
+            "correct": correct,
+            "accuracy": correct / answered if answered else 0.0,
+        }
+        for model_id, (answered, correct) in sorted(counts.items())
+    ]
+
+
+class ProgressBroker:
+    """Registry of the progress logs of the jobs running in this process."""
+
+    def __init__(self, history: int = 10000) -> None:
+        self.history = history
+        self._logs: Dict[str, ProgressLog] = {}
+        self._lock = threading.Lock()
+
+    def open(self, evaluation_id: str) -> ProgressLog:
+        log = ProgressLog(evaluation_id, self.history)
+        with self._lock:
+            self._logs[evaluation_id] = log
+        return log
+
+    def get(self, evaluation_id: str) -> Optional[ProgressLog]:
+        return self._logs.get(evaluation_id)
+
+    def close(self, evaluation_id: str) -> None:
+        with self._lock:
+            log = self._logs.pop(evaluation_id, None)
+        if log is not None:
+            log.close()
+
+
+class ProgressHooks(JobHooks):
+    """Job hooks that publish answers to the job's :class:`ProgressLog`.
+
+    Place them after the hooks that persist answers so that, once the log is
+    closed, every event can be replayed from the database.
+    """
+
+    def __init__(self, broker: ProgressBroker, log: ProgressLog, questions: List[Dict[str, Any]]) -> None:
+        self.broker = broker
+        self.log = log
+        self.questions = questions
+
+    def on_answer(self, job: EvaluationJob, question_index: int, model: Any, answer: Optional[str]) -> None:
+        self.log.publish_answer(self.questions[question_index], model.model_id, answer)
+
+    def on_status(self, job: EvaluationJob) -> None:
+        if job.status in FINISHED_STATES:
+            self.broker.close(job.evaluation_id)
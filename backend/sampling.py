@@ -0,0 +1,224 @@
+"""Stratified, reproducible question sampling.
+
+Questions are drawn per stratum (currently the KU) from a cached, sorted
+array of question ids.  The arrays are read once from the ``(ku, id)`` index
+and reused until the bank changes or the cache entry expires, so a sample is
+``O(k)`` random picks plus one primary-key lookup instead of an
+``ORDER BY random()`` scan over the whole table.
+"""
+
+from __future__ import annotations
+
+import random
+import threading
+import time
+from array import array
+from typing import Collection, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from . import models as db_models
+
+# Columns that may be used as strata.  Further columns (e.g. a difficulty
+# level) only need to be added here once they exist on ``Question``.
+STRATA_COLUMNS = {"ku": db_models.Question.ku}
+
+StratumKey = Tuple
+
+
+class QuestionIdIndex:
+    """Cache of sorted question ids per stratum.
+
+    Parameters
+    ----------
+    ttl: float
+        Seconds after which cached ids are reloaded.  Writes through this
+        process call :meth:`invalidate` directly; the TTL bounds how stale the
+        cache can get when other replicas modify the bank.
+    """
+
+    def __init__(self, ttl: float = 300) -> None:
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._strata: Dict[Tuple[str, ...], Tuple[float, List[StratumKey]]] = {}
+        self._ids: Dict[Tuple[Tuple[str, ...], StratumKey], Tuple[float, array]] = {}
+
+    def _fresh(self, loaded_at: float) -> bool:
+        return time.monotonic() - loaded_at < self.ttl
+
+    def strata(self, db: Session, columns: Sequence[str]) -> List[StratumKey]:
+        """Return every distinct stratum key for ``columns``."""
+
+        columns = tuple(columns)
+        cached = self._strata.get(columns)
+        if cached and self._fresh(cached[0]):
+            return cached[1]
+        cols = [STRATA_COLUMNS[c] for c in columns]
+        keys = [tuple(row) for row in db.execute(select(*cols).group_by(*cols))]
+        with self._lock:
+            self._strata[columns] = (time.monotonic(), keys)
+        return keys
+
+    def ids(self, db: Session, columns: Sequence[str], key: StratumKey) -> array:
+        """Return the sorted ids of the questions in stratum ``key``."""
+
+        columns = tuple(columns)
+        cached = self._ids.get((columns, key))
+        if cached and self._fresh(cached[0]):
+            return cached[1]
+        stmt = select(db_models.Question.id).order_by(db_models.Question.id)
+        for column, value in zip(columns, key):
+            stmt = stmt.where(STRATA_COLUMNS[column] == value)
+        ids = array("q", db.execute(stmt).scalars())
+        with self._lock:
+            self._ids[(columns, key)] = (time.monotonic(), ids)
+        return ids
+
+    def invalidate(self, ku: Optional[str] = None) -> None:
+        """Drop cached ids, either for one KU or for the whole bank."""
+
+        with self._lock:
+            self._strata.clear()
+            if ku is None:
+                self._ids.clear()
+                return
+            for cache_key in [k for k in self._ids if ku in k[1]]:
+                del self._ids[cache_key]
+
+
+def allocate(sizes: Dict[StratumKey, int], count: int, allocation: str = "proportional") -> Dict[StratumKey, int]:
+    """Split ``count`` draws across strata.
+
+    ``proportional`` follows the stratum sizes (largest remainder method) and
+    ``equal`` gives every stratum the same share.  No stratum is assigned more
+    questions than it holds.
+    """
+
+    available = {k: n for k, n in sizes.items() if n > 0}
+    quotas = {k: 0 for k in sizes}
+    remaining = min(count, sum(available.values()))
+    while remaining > 0 and available:
+        if allocation == "equal":
+            weights = {k: 1 for k in available}
+        else:
+            weights = available
+        total = sum(weights.values())
+        shares = {k: remaining * w / total for k, w in weights.items()}
+        take = {k: min(int(share), available[k]) for k, share in shares.items()}
+        leftover = remaining - sum(take.values())
+        # Hand out the remainder by largest fractional share, in a stable order.
+        for k in sorted(shares, key=lambda k: (-(shares[k] - int(shares[k])), str(k))):
+            if leftover <= 0:
+                break
+            if take[k] < available[k]:
+                take[k] += 1
+                leftover -= 1
+        for k, n in take.items():
+            quotas[k] += n
+            available[k] -= n
+            remaining -= n
+        available = {k: n for k, n in available.items() if n > 0}
+        if not any(take.values()):
+            break
+    return quotas
+
+
+class QuestionSampler:
+    """Draw stratified random samples of question ids.
+
+    Parameters
+    ----------
+    index: QuestionIdIndex
+        Cache of per-stratum ids.
+    strata: sequence of str
+        Question columns that define a stratum, e.g. ``("ku",)``.
+    allocation: str
+        ``"proportional"`` or ``"equal"``; see :func:`allocate`.
+    """
+
+    def __init__(
+        self,
+        index: QuestionIdIndex,
+        strata: Sequence[str] = ("ku",),
+        allocation: str = "proportional",
+    ) -> None:
+        unknown = set(strata) - set(STRATA_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown strata columns: {sorted(unknown)}")
+        self.index = index
+        self.strata = tuple(strata)
+        self.allocation = allocation
+
+    def sample_ids(
+        self,
+        db: Session,
+        count: int,
+        seed: int,
+        scope: Optional[Iterable[str]] = None,
+        exclude: Optional[Collection[int]] = None,
+    ) -> List[int]:
+        """Return up to ``count`` question ids, reproducible for ``seed``.
+
+        ``scope`` restricts the KUs that are sampled from and ids in
+        ``exclude`` are never drawn.  Each stratum uses its own generator
+        derived from ``seed`` so adding questions to one KU does not change
+        the draws of the others.
+        """
+
+        scope = list(scope or [])
+        if scope and self.strata == ("ku",):
+            keys = [(ku,) for ku in dict.fromkeys(scope)]
+        else:
+            keys = self.index.strata(db, self.strata)
+            if scope and "ku" in self.strata:
+                ku_pos = self.strata.index("ku")
+                keys = [k for k in keys if k[ku_pos] in set(scope)]
+        ids_by_key = {k: self.index.ids(db, self.strata, k) for k in keys}
+        if exclude:
+            excluded = np.fromiter(exclude, dtype=np.int64, count=len(exclude))
+            ids_by_key = {
+                k: np.setdiff1d(np.frombuffer(ids, dtype=np.int64), excluded)
+                for k, ids in ids_by_key.items()
+            }
+        quotas = allocate({k: len(v) for k, v in ids_by_key.items()}, count, self.allocation)
+
+        sample: List[int] = []
+        for key in sorted(quotas, key=str):
+            ids, k = ids_by_key[key], quotas[key]
+            if not k:
+                continue
+            rng = random.Random(f"{seed}:{key}")
+            sample.extend(int(ids[i]) for i in rng.sample(range(len(ids)), k))
+        random.Random(seed).shuffle(sample)
+        return sample
+
+    def sample(
+        self,
+        db: Session,
+        count: int,
+        seed: int,
+        scope: Optional[Iterable[str]] = None,
+    ) -> List[db_models.Question]:
+        """Like :meth:`sample_ids` but loads the question rows, in sample order."""
+
+        return load_questions(db, self.sample_ids(db, count, seed, scope))
+
+
+def load_questions(db: Session, ids: Sequence[int]) -> List[db_models.Question]:
+    """Load the questions with ``ids`` in that order, skipping deleted ones."""
+
+    rows: Dict[int, db_models.Question] = {}
+    for start in range(0, len(ids), 500):
+        chunk = ids[start : start + 500]
+        for q in db.query(db_models.Question).filter(db_models.Question.id.in_(chunk)):
+            rows[q.id] = q
+    return [rows[i] for i in ids if i in rows]
+
+
+def new_seed() -> int:
+    """Seed for callers that did not ask for a specific one."""
+
+    return random.SystemRandom().randrange(2**31)
+
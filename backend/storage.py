@@ -0,0 +1,454 @@
+"""Database persistence for evaluation runs and their answers.
+
+Answers are buffered by :class:`AnswerWriter` and written with one bulk
+``INSERT`` per batch instead of one ORM object per answer, on a writer thread
+of their own so the evaluation's event loop never waits for the database.
+Results are read
+back a page of questions at a time so an evaluation never has to be loaded
+into memory as a whole.
+"""
+
+from __future__ import annotations
+
+import contextvars
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import case, delete, func, insert, literal, select
+from sqlalchemy.orm import Session
+
+from . import models as db_models
+from .agents import AnalyticsAgent, ColumnarResult
+from .agents import tracing
+from .jobs import COMPLETED, EvaluationJob, JobHooks
+
+EVALUATION_PREFIX = "ev"
+
+
+def format_evaluation_id(pk: int) -> str:
+    """Public identifier for the evaluation row with primary key ``pk``."""
+
+    return f"{EVALUATION_PREFIX}{pk}"
+
+
+def parse_evaluation_id(evaluation_id: str) -> Optional[int]:
+    """Return the primary key encoded in ``evaluation_id`` or ``None``."""
+
+    if not evaluation_id.startswith(EVALUATION_PREFIX):
+        return None
+    try:
+        return int(evaluation_id[len(EVALUATION_PREFIX):])
+    except ValueError:
+        return None
+
+
+def get_evaluation(db: Session, evaluation_id: str) -> Optional[db_models.Evaluation]:
+    pk = parse_evaluation_id(evaluation_id)
+    if pk is None:
+        return None
+    return db.get(db_models.Evaluation, pk)
+
+
+class AnswerWriter:
+    """Buffer model answers and flush them to the ``answers`` table in bulk.
+
+    Full batches are handed to a dedicated writer thread, so :meth:`record`
+    never waits for the database; :meth:`flush` writes what is left and
+    waits until every batch handed over so far is committed.
+
+    Parameters
+    ----------
+    session_factory: callable
+        Returns a new SQLAlchemy session; the writer owns that session because
+        it is used from the writer thread.
+    evaluation_pk: int
+        Primary key of the evaluation the answers belong to.
+    questions: list
+        The question payloads passed to the evaluation, indexed like the
+        ``question_index`` reported by the engine.
+    batch_size: int
+        Number of buffered answers handed to the writer thread at once.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        evaluation_pk: int,
+        questions: List[Dict[str, Any]],
+        batch_size: int = 500,
+    ) -> None:
+        self._session_factory = session_factory
+        self._session: Optional[Session] = None
+        self.evaluation_pk = evaluation_pk
+        self.questions = questions
+        self.batch_size = max(1, batch_size)
+        self._buffer: List[Dict[str, Any]] = []
+        self._writes: List[Future] = []
+        self._thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="answer-writer")
+
+    @property
+    def session(self) -> Session:
+        if self._session is None:
+            self._session = self._session_factory()
+        return self._session
+
+    def record(self, question_index: int, model: Any, answer: Optional[str], **progress: Any) -> None:
+        """Buffer one answer.
+
+        Once ``batch_size`` answers are buffered they are handed to the
+        writer thread together with ``progress`` (see :meth:`flush`).
+        """
+
+        q = self.questions[question_index]
+        self._buffer.append(
+            {
+                "evaluation_id": self.evaluation_pk,
+                "model_id": model.model_id,
+                "question_id": q["id"],
+                "answer": answer,
+                "correct": answer is not None and answer == q["correct"],
+            }
+        )
+        if len(self._buffer) >= self.batch_size:
+            self._hand_over(progress)
+
+    def flush(self, **progress: Any) -> None:
+        """Insert buffered answers and update the evaluation row in one commit.
+
+        Keyword arguments are written to the ``evaluations`` row, e.g. the
+        current ``answered`` count, so progress survives a restart.  Waits
+        for the earlier batches too and raises the first error of any of
+        them.
+        """
+
+        self._hand_over(progress)
+        writes, self._writes = self._writes, []
+        for write in writes:
+            write.result()
+
+    def close(self) -> None:
+        self._thread.shutdown(wait=True)
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+    def _hand_over(self, progress: Dict[str, Any]) -> None:
+        batch, self._buffer = self._buffer, []
+        # Keep failed writes until flush() reports them.
+        self._writes = [w for w in self._writes if not w.done() or w.exception() is not None]
+        # The copied context keeps the write spans under the run's span.
+        context = contextvars.copy_context()
+        self._writes.append(self._thread.submit(context.run, self._write, batch, progress))
+
+    def _write(self, batch: List[Dict[str, Any]], progress: Dict[str, Any]) -> None:
+        with tracing.span("write_results", answers=len(batch)):
+            session = self.session
+            try:
+                if batch:
+                    session.execute(insert(db_models.Answer), batch)
+                if progress:
+                    session.query(db_models.Evaluation).filter(
+                        db_models.Evaluation.id == self.evaluation_pk
+                    ).update(progress, synchronize_session=False)
+                session.commit()
+            except Exception:
+                session.rollback()  # later writes start a fresh transaction
+                raise
+
+
+class EvaluationRecorder(JobHooks):
+    """Job hooks that persist status, answers and the model summary."""
+
+    def __init__(self, writer: AnswerWriter, analytics: Optional[AnalyticsAgent] = None) -> None:
+        self.writer = writer
+        self.analytics = analytics
+
+    def on_answer(self, job: EvaluationJob, question_index: int, model: Any, answer: Optional[str]) -> None:
+        # Runs on the engine's event loop; full batches are written in the
+        # background and on_complete/on_status wait for them.
+        self.writer.record(
+            question_index, model, answer, answered=job.answered, questions_answered=job.questions_answered
+        )
+
+    def on_complete(self, job: EvaluationJob, result: ColumnarResult) -> None:
+        with tracing.span("scoring"):
+            models = result.model_summary()
+            details = dict(result.extra)
+            if self.analytics is not None:
+                analysis = self.analytics.analyze(result)
+                for m, stats in zip(models, analysis["models"]):
+                    m["scores_by_ku"] = stats["scores_by_ku"]
+                details["analytics"] = analysis
+        self.writer.flush(results=models, details=details or None)
+
+    def on_status(self, job: EvaluationJob) -> None:
+        self.writer.flush(
+            status=job.status,
+            start_time=job.start_time,
+            end_time=job.end_time,
+            answered=job.answered,
+            questions_answered=job.questions_answered,
+            error=job.error,
+        )
+        if job.end_time is not None:
+            self.writer.close()
+
+
+def load_answers(
+    db: Session, evaluation_pk: int, model_ids: Optional[List[int]] = None
+) -> Dict[Tuple[int, int], Optional[str]]:
+    """Stored answers of an evaluation keyed by ``(model_id, question_id)``.
+
+    This is the checkpoint an interrupted evaluation resumes from.
+    """
+
+    answer = db_models.Answer
+    stmt = select(answer.model_id, answer.question_id, answer.answer).where(
+        answer.evaluation_id == evaluation_pk
+    )
+    if model_ids is not None:
+        stmt = stmt.where(answer.model_id.in_(model_ids))
+    rows = db.execute(stmt.execution_options(yield_per=5000))
+    return {(model_id, question_id): text for model_id, question_id, text in rows}
+
+
+def copy_answers(db: Session, source_pk: int, target_pk: int, model_ids: List[int]) -> int:
+    """Copy the answers of ``model_ids`` from one evaluation to another.
+
+    Runs as a single ``INSERT ... SELECT`` in recording order; answers to
+    questions that were deleted since are skipped.  The caller commits.
+    """
+
+    answer = db_models.Answer
+    source = (
+        select(
+            literal(target_pk),
+            answer.model_id,
+            answer.question_id,
+            answer.answer,
+            answer.correct,
+        )
+        .where(
+            answer.evaluation_id == source_pk,
+            answer.model_id.in_(model_ids),
+            answer.question_id.in_(select(db_models.Question.id)),
+        )
+        .order_by(answer.id)
+    )
+    result = db.execute(
+        insert(answer).from_select(
+            ["evaluation_id", "model_id", "question_id", "answer", "correct"], source
+        )
+    )
+    return result.rowcount
+
+
+def save_question_order(db: Session, evaluation_pk: int, question_ids: List[int]) -> None:
+    """Store the ordered question ids of an evaluation, replacing earlier ones.
+
+    The caller commits.
+    """
+
+    order = db_models.EvaluationQuestion
+    db.execute(delete(order).where(order.evaluation_id == evaluation_pk))
+    if question_ids:
+        db.execute(
+            insert(order),
+            [
+                {"evaluation_id": evaluation_pk, "position": position, "question_id": question_id}
+                for position, question_id in enumerate(question_ids)
+            ],
+        )
+
+
+def question_order(
+    db: Session, evaluation_pk: int, offset: int = 0, limit: Optional[int] = None
+) -> List[int]:
+    """Question ids of an evaluation in order, all of them or ``limit`` from ``offset``."""
+
+    order = db_models.EvaluationQuestion
+    stmt = (
+        select(order.question_id)
+        .where(order.evaluation_id == evaluation_pk, order.position >= offset)
+        .order_by(order.position)
+    )
+    if limit is not None:
+        stmt = stmt.where(order.position < offset + limit)
+    return list(db.scalars(stmt))
+
+
+def page_questions(
+    db: Session, evaluation: db_models.Evaluation, offset: int = 0, limit: int = 100
+) -> List[Dict[str, Any]]:
+    """Return the per-question results for one page of ``evaluation``.
+
+    The page's question ids are a range read on the ``(evaluation_id,
+    position)`` key of the question order, and only the answers for those
+    questions are fetched through the ``(evaluation_id, question_id)`` index.
+    """
+
+    page_ids = question_order(db, evaluation.id, max(0, offset), limit)
+    if not page_ids:
+        return []
+    correct = dict(
+        db.execute(
+            select(db_models.Question.id, db_models.Question.correct).where(
+                db_models.Question.id.in_(page_ids)
+            )
+        ).all()
+    )
+    answers: Dict[int, Dict[int, Optional[str]]] = defaultdict(dict)
+    rows = db.execute(
+        select(
+            db_models.Answer.question_id,
+            db_models.Answer.model_id,
+            db_models.Answer.answer,
+        ).where(
+            db_models.Answer.evaluation_id == evaluation.id,
+            db_models.Answer.question_id.in_(page_ids),
+        )
+    )
+    for question_id, model_id, answer in rows:
+        answers[question_id][model_id] = answer
+    return [
+        {"id": qid, "answers": answers.get(qid, {}), "correct": correct.get(qid)}
+        for qid in page_ids
+    ]
+
+
+def mcq_accuracy(db: Session, model_ids: Optional[List[int]] = None) -> Dict[int, float]:
+    """Accuracy of each model over the answers of its completed evaluations."""
+
+    answer = db_models.Answer
+    stmt = (
+        select(answer.model_id, func.count(), func.sum(case((answer.correct, 1), else_=0)))
+        .join(db_models.Evaluation, db_models.Evaluation.id == answer.evaluation_id)
+        .where(db_models.Evaluation.status == COMPLETED)
+        .group_by(answer.model_id)
+    )
+    if model_ids is not None:
+        stmt = stmt.where(answer.model_id.in_(model_ids))
+    return {
+        model_id: (correct or 0) / total
+        for model_id, total, correct in db.execute(stmt)
+        if total
+    }
+
+
+def benchmark_scores(db: Session, benchmark_id: int) -> Dict[int, db_models.BenchmarkResult]:
+    """The latest completed result of every model on a benchmark."""
+
+    result = db_models.BenchmarkResult
+    rows = db.execute(
+        select(result)
+        .where(result.benchmark_id == benchmark_id, result.status == COMPLETED)
+        .order_by(result.id)
+    ).scalars()
+    return {row.model_id: row for row in rows}
+
+
+def answer_event(
+    offset: int,
+    question_id: int,
+    model_id: int,
+    answer: Optional[str],
+    correct: bool,
+    model_answered: int,
+    model_correct: int,
+) -> Dict[str, Any]:
+    """Progress event for one answer, with the model's running accuracy."""
+
+    return {
+        "offset": offset,
+        "question_id": question_id,
+        "model_id": model_id,
+        "answer": answer,
+        "correct": correct,
+        "model_answered": model_answered,
+        "model_correct": model_correct,
+        "model_accuracy": model_correct / model_answered if model_answered else 0.0,
+    }
+
+
+class AnswerCursor:
+    """Replay the stored answers of an evaluation from a progress offset.
+
+    Answers are inserted in the order the engine reported them, so the answer
+    with offset ``n`` is the ``n``-th row of the evaluation by primary key.
+    Reads are keyset paginated on that key after a single seek to ``offset``.
+
+    Parameters
+    ----------
+    db: Session
+        Session used for every read.
+    evaluation_pk: int
+        Primary key of the evaluation.
+    offset: int
+        Offset of the first answer to return.
+    """
+
+    def __init__(self, db: Session, evaluation_pk: int, offset: int = 0) -> None:
+        self.db = db
+        self.evaluation_pk = evaluation_pk
+        self.offset = max(0, offset)
+        # model id -> [answered, correct] over the answers before ``offset``
+        self.counts: Dict[int, List[int]] = defaultdict(lambda: [0, 0])
+        self._after_id: Optional[int] = None
+        self._seeked = False
+
+    def _seek(self) -> bool:
+        answer = db_models.Answer
+        if self.offset:
+            boundary = self.db.execute(
+                select(answer.id)
+                .where(answer.evaluation_id == self.evaluation_pk)
+                .order_by(answer.id)
+                .offset(self.offset - 1)
+                .limit(1)
+            ).scalar()
+            if boundary is None:
+                # Fewer answers have been stored than the requested offset.
+                return False
+            rows = self.db.execute(
+                select(
+                    answer.model_id,
+                    func.count(),
+                    func.sum(case((answer.correct, 1), else_=0)),
+                )
+                .where(answer.evaluation_id == self.evaluation_pk, answer.id <= boundary)
+                .group_by(answer.model_id)
+            )
+            for model_id, answered, correct in rows:
+                self.counts[model_id] = [answered, correct or 0]
+            self._after_id = boundary
+        self._seeked = True
+        return True
+
+    def fetch(self, limit: int) -> List[Dict[str, Any]]:
+        """Return up to ``limit`` answer events and advance the cursor."""
+
+        if not self._seeked and not self._seek():
+            return []
+        answer = db_models.Answer
+        stmt = (
+            select(answer.id, answer.question_id, answer.model_id, answer.answer, answer.correct)
+            .where(answer.evaluation_id == self.evaluation_pk)
+            .order_by(answer.id)
+            .limit(limit)
+        )
+        if self._after_id is not None:
+            stmt = stmt.where(answer.id > self._after_id)
+        events = []
+        for row_id, question_id, model_id, text, correct in self.db.execute(stmt):
+            counts = self.counts[model_id]
+            counts[0] += 1
+            counts[1] += int(bool(correct))
+            events.append(
+                answer_event(
+                    self.offset, question_id, model_id, text, bool(correct), counts[0], counts[1]
+                )
+            )
+            self.offset += 1
+            self._after_id = row_id
+        return events
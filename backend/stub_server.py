@@ -0,0 +1,130 @@
+"""Local stub model server for offline testing of the model adapters.
+
+It speaks the three protocols the adapters use (OpenAI chat completions, TGI
+``/generate`` and the generic ``/answer`` API) and answers deterministically
+without any model behind it.  Start it with::
+
+    python -m backend.stub_server --port 8100
+
+and register models with e.g. ``type=openai`` and
+``base_url=http://localhost:8100/v1``.  Behaviour is tuned through
+environment variables:
+
+``STUB_POLICY``
+    ``first`` (always the first option, default) or ``hash`` (an option
+    picked from a hash of the question, stable across runs).
+``STUB_LATENCY``
+    Seconds to sleep before every reply.
+``STUB_THROTTLE_EVERY``
+    Answer every n-th request with ``429`` and a ``Retry-After`` header.
+``STUB_UNAVAILABLE``
+    Set to ``1`` to answer every request with a plain ``503``, i.e. an
+    outage rather than throttling.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import itertools
+import os
+import re
+import string
+from typing import Any, Dict, List
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse
+
+POLICY = os.getenv("STUB_POLICY", "first")
+LATENCY = float(os.getenv("STUB_LATENCY", "0"))
+THROTTLE_EVERY = int(os.getenv("STUB_THROTTLE_EVERY", "0"))
+UNAVAILABLE = os.getenv("STUB_UNAVAILABLE", "0") == "1"
+
+_OPTION_LINE = re.compile(r"^([A-Z])\. ", re.MULTILINE)
+_requests = itertools.count(1)
+
+app = FastAPI(title="AxiomIQ stub model server")
+
+
+@app.middleware("http")
+async def _simulate_provider(request: Request, call_next):
+    if UNAVAILABLE:
+        return JSONResponse({"error": "unavailable"}, status_code=503)
+    if THROTTLE_EVERY and next(_requests) % THROTTLE_EVERY == 0:
+        return JSONResponse({"error": "rate limited"}, status_code=429, headers={"Retry-After": "0.05"})
+    if LATENCY:
+        await asyncio.sleep(LATENCY)
+    return await call_next(request)
+
+
+def choose(question: str, count: int) -> int:
+    """Index of the option the stub answers with."""
+
+    if count <= 0:
+        raise HTTPException(status_code=422, detail="no options given")
+    if POLICY == "hash":
+        return int(hashlib.sha256(question.encode("utf-8")).hexdigest(), 16) % count
+    return 0
+
+
+def _letter_for_prompt(prompt: str) -> str:
+    count = len(_OPTION_LINE.findall(prompt))
+    return string.ascii_uppercase[choose(prompt, count)]
+
+
+@app.get("/health")
+def health() -> Dict[str, str]:
+    return {"status": "ok"}
+
+
+@app.post("/v1/chat/completions")
+def chat_completions(payload: Dict[str, Any]) -> Dict[str, Any]:
+    prompt = payload["messages"][-1]["content"]
+    return {
+        "object": "chat.completion",
+        "model": payload.get("model"),
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": _letter_for_prompt(prompt)},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": 1},
+    }
+
+
+@app.post("/generate")
+def generate(payload: Dict[str, Any]) -> Dict[str, Any]:
+    return {"generated_text": _letter_for_prompt(payload["inputs"])}
+
+
+@app.post("/answer")
+def answer(payload: Dict[str, Any]) -> Dict[str, Any]:
+    options: List[str] = payload["options"]
+    return {"answer": options[choose(payload["question"], len(options))]}
+
+
+@app.post("/answer/batch")
+def answer_batch(payload: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "answers": [
+            item["options"][choose(item["question"], len(item["options"]))]
+            for item in payload["items"]
+        ]
+    }
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    args = parser.parse_args()
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,420 @@
+"""Throughput and latency benchmarks for the evaluation pipeline.
+
+Scenarios run simulated models (configurable latency distribution and error
+rate) through one of two pipelines:
+
+``agent``
+    ``EvaluationAgent.evaluate_columnar`` directly, i.e. the execution engine
+    alone.
+``api``
+    ``POST /evaluations`` (called in-process) followed by the background job,
+    including sampling, answer persistence and analytics.  The database is
+    whatever ``DATABASE_URL`` points at; the CLI uses a temporary file.
+
+Every scenario reports throughput (answers per second), p50/p95/p99 of the
+model call latency as observed by the worker threads, its peak RSS (each run
+happens in a fresh process, see :func:`run`) and, for ``api``, the time spent
+in SQL statements.  Reports are plain JSON and double as baselines:
+:func:`compare` flags metrics that regressed by more than a threshold.
+"""
+
+from __future__ import annotations
+
+import itertools
+import math
+import multiprocessing
+import random
+import resource
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from backend.agents import EvaluationAgent, ModelAgent
+from backend.agents.results import FAILED
+
+DISTRIBUTIONS = ("fixed", "uniform", "exponential", "lognormal")
+
+# Metric -> direction in which it gets better, used by :func:`compare`.
+METRICS = {
+    "throughput": "higher",
+    "p50_ms": "lower",
+    "p95_ms": "lower",
+    "p99_ms": "lower",
+    "peak_rss_mb": "lower",
+}
+
+
+@dataclass(frozen=True)
+class LatencyProfile:
+    """How long a simulated model takes to answer and how often it fails.
+
+    Parameters
+    ----------
+    distribution: str
+        One of ``fixed``, ``uniform`` (0 to twice the mean), ``exponential``
+        or ``lognormal``.
+    mean: float
+        Mean latency in seconds.
+    sigma: float
+        Shape of the lognormal distribution.
+    error_rate: float
+        Probability that a call raises instead of answering.
+    """
+
+    distribution: str = "lognormal"
+    mean: float = 0.005
+    sigma: float = 0.5
+    error_rate: float = 0.0
+
+    def __post_init__(self) -> None:
+        if self.distribution not in DISTRIBUTIONS:
+            raise ValueError(f"distribution must be one of {DISTRIBUTIONS}")
+
+    @classmethod
+    def parse(cls, spec: str, error_rate: float = 0.0) -> "LatencyProfile":
+        """Parse ``distribution[:mean[:sigma]]``, e.g. ``lognormal:0.01:0.5``."""
+
+        parts = spec.split(":")
+        kwargs: Dict[str, Any] = {"distribution": parts[0], "error_rate": error_rate}
+        if len(parts) > 1:
+            kwargs["mean"] = float(parts[1])
+        if len(parts) > 2:
+            kwargs["sigma"] = float(parts[2])
+        return cls(**kwargs)
+
+    def sample(self, rng: random.Random) -> float:
+        if self.distribution == "fixed":
+            return self.mean
+        if self.distribution == "uniform":
+            return rng.uniform(0, 2 * self.mean)
+        if self.distribution == "exponential":
+            return rng.expovariate(1 / self.mean) if self.mean > 0 else 0.0
+        if self.mean <= 0:
+            return 0.0
+        # Pick mu so that the distribution's mean is ``self.mean``.
+        return rng.lognormvariate(math.log(self.mean) - self.sigma ** 2 / 2, self.sigma)
+
+
+class SimulatedError(RuntimeError):
+    """Injected model failure."""
+
+
+@dataclass
+class SimulatedModel(ModelAgent):
+    """Model agent that sleeps for a sampled latency and answers ``options[0]``.
+
+    The wall time of every call is appended to ``latencies``.
+    """
+
+    profile: LatencyProfile = field(default_factory=LatencyProfile)
+    seed: int = 0
+    latencies: List[float] = field(default_factory=list, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        self._rng = random.Random(self.seed * 7919 + self.model_id)
+        self._lock = threading.Lock()
+
+    def ask(self, question: str, options: Iterable[str]) -> Optional[str]:
+        started = time.perf_counter()
+        with self._lock:
+            delay = self.profile.sample(self._rng)
+            failed = self._rng.random() < self.profile.error_rate
+        time.sleep(delay)
+        self.latencies.append(time.perf_counter() - started)
+        if failed:
+            raise SimulatedError("injected failure")
+        return list(options)[0]
+
+
+@dataclass(frozen=True)
+class Scenario:
+    pipeline: str
+    models: int
+    questions: int
+    concurrency: int
+    per_model_concurrency: int
+
+    @property
+    def name(self) -> str:
+        return (
+            f"{self.pipeline}-m{self.models}-q{self.questions}"
+            f"-c{self.concurrency}-p{self.per_model_concurrency}"
+        )
+
+
+def grid(
+    pipelines: Iterable[str],
+    models: Iterable[int],
+    questions: Iterable[int],
+    concurrency: Iterable[int],
+    per_model_concurrency: Iterable[int],
+) -> List[Scenario]:
+    return [
+        Scenario(*values)
+        for values in itertools.product(pipelines, models, questions, concurrency, per_model_concurrency)
+    ]
+
+
+def peak_rss_mb() -> float:
+    """High-water mark of the process resident set size."""
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _percentiles(latencies: List[float]) -> Dict[str, float]:
+    if not latencies:
+        return {"p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0}
+    p50, p95, p99 = np.percentile(np.asarray(latencies) * 1000, [50, 95, 99])
+    return {"p50_ms": round(float(p50), 3), "p95_ms": round(float(p95), 3), "p99_ms": round(float(p99), 3)}
+
+
+def _questions(count: int) -> List[Dict[str, Any]]:
+    return [
+        {
+            "id": i + 1,
+            "text": f"Benchmark question {i}?",
+            "options": ["A", "B", "C", "D"],
+            "correct": "A",
+            "ku": "Networking",
+        }
+        for i in range(count)
+    ]
+
+
+def _report(
+    scenario: Scenario,
+    models: List[SimulatedModel],
+    answered: int,
+    elapsed: float,
+    **extra: Any,
+) -> Dict[str, Any]:
+    latencies = [v for m in models for v in m.latencies]
+    report = {
+        **asdict(scenario),
+        "answers": answered,
+        "calls": len(latencies),
+        "seconds": round(elapsed, 4),
+        "throughput": round(answered / elapsed, 2) if elapsed > 0 else 0.0,
+        **_percentiles(latencies),
+    }
+    report.update(extra)
+    return report
+
+
+def run_agent(scenario: Scenario, profile: LatencyProfile, seed: int = 0) -> Dict[str, Any]:
+    models = [
+        SimulatedModel(model_id=i + 1, name=f"sim{i + 1}", profile=profile, seed=seed)
+        for i in range(scenario.models)
+    ]
+    agent = EvaluationAgent(
+        models,
+        max_concurrency=scenario.concurrency,
+        per_model_concurrency=scenario.per_model_concurrency,
+        retry_backoff=0.001,
+        retry_backoff_max=0.01,
+    )
+    started = time.perf_counter()
+    result = agent.evaluate_columnar(_questions(scenario.questions))
+    elapsed = time.perf_counter() - started
+    failed = int((result.answers == FAILED).sum())
+    return _report(scenario, models, int(result.asked.sum()), elapsed, failed=failed)
+
+
+class _SQLTimer:
+    """Sum the time spent executing SQL on an engine."""
+
+    def __init__(self, engine) -> None:
+        self.engine = engine
+        self.seconds = 0.0
+        self.statements = 0
+        self._local = threading.local()
+        # Statements finish on the request thread and the job's writer.
+        self._lock = threading.Lock()
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        self._local.started = time.perf_counter()
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        elapsed = time.perf_counter() - self._local.started
+        with self._lock:
+            self.seconds += elapsed
+            self.statements += 1
+
+    def __enter__(self) -> "_SQLTimer":
+        from sqlalchemy import event
+
+        event.listen(self.engine, "before_cursor_execute", self._before)
+        event.listen(self.engine, "after_cursor_execute", self._after)
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        from sqlalchemy import event
+
+        event.remove(self.engine, "before_cursor_execute", self._before)
+        event.remove(self.engine, "after_cursor_execute", self._after)
+
+
+def _seed_api(question_count: int, model_count: int) -> List[int]:
+    """Make sure the database holds enough questions and simulated models."""
+
+    from backend import importer
+    from backend import models as db_models
+    from backend.database import SessionLocal
+
+    with SessionLocal() as db:
+        have = db.query(db_models.Question).count()
+        models = db.query(db_models.Model).filter(db_models.Model.type == "simulated").all()
+        for i in range(len(models), model_count):
+            db.add(db_models.Model(name=f"sim{i + 1}", type="simulated", status="active"))
+        db.commit()
+        model_ids = [m.id for m in db.query(db_models.Model).filter(db_models.Model.type == "simulated")]
+    if have < question_count:
+        # Already stored questions are skipped as duplicates.
+        importer.QuestionImporter(SessionLocal).import_rows(enumerate(_questions(question_count), start=1))
+    return model_ids[:model_count]
+
+
+def run_api(scenario: Scenario, profile: LatencyProfile, seed: int = 0) -> Dict[str, Any]:
+    from backend import config, main
+    from backend.agents import adapters
+    from backend.database import engine
+
+    created: List[SimulatedModel] = []
+    scenario_profile, scenario_seed = profile, seed
+
+    # The API builds agents from Model rows, so the scenario's settings travel
+    # as the defaults of an adapter registered for ``type == "simulated"``.
+    @dataclass
+    class ScenarioModel(SimulatedModel):
+        profile: LatencyProfile = scenario_profile
+        seed: int = scenario_seed
+
+        def __post_init__(self) -> None:
+            super().__post_init__()
+            created.append(self)
+
+    adapters.register_adapter("simulated")(ScenarioModel)
+    model_ids = _seed_api(scenario.questions, scenario.models)
+    data = main.EvaluationCreate(
+        model_ids=model_ids,
+        question_count=scenario.questions,
+        mode="auto",
+        seed=seed,
+        bypass_cache=True,
+        config={
+            "evaluation": {
+                "max_concurrency": scenario.concurrency,
+                "per_model_concurrency": scenario.per_model_concurrency,
+            },
+            "limits": {"retry_backoff": 0.001, "retry_backoff_max": 0.01},
+        },
+    )
+    with _SQLTimer(engine) as sql:
+        db = main.SessionLocal()
+        try:
+            started = time.perf_counter()
+            evaluation = main.create_evaluation(data, token=config.ACCESS_TOKEN, db=db)
+            request_ms = (time.perf_counter() - started) * 1000
+            job = main.job_runner.wait(evaluation.evaluation_id)
+            elapsed = time.perf_counter() - started
+        finally:
+            db.close()
+    answered = job.answered if job is not None else 0
+    return _report(
+        scenario,
+        created,
+        answered,
+        elapsed,
+        request_ms=round(request_ms, 3),
+        db_seconds=round(sql.seconds, 4),
+        db_statements=sql.statements,
+    )
+
+
+PIPELINES = {"agent": run_agent, "api": run_api}
+
+
+def _measure(scenario: Scenario, profile: LatencyProfile, seed: int) -> Dict[str, Any]:
+    report = PIPELINES[scenario.pipeline](scenario, profile, seed)
+    report["peak_rss_mb"] = round(peak_rss_mb(), 1)
+    return report
+
+
+def _isolated(scenario: Scenario, profile: LatencyProfile, seed: int) -> Dict[str, Any]:
+    # A fresh interpreter (not a fork) starts from a clean high-water mark.
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        return pool.submit(_measure, scenario, profile, seed).result()
+
+
+def run(
+    scenarios: Iterable[Scenario],
+    profile: LatencyProfile,
+    seed: int = 0,
+    repeat: int = 1,
+    isolate: bool = True,
+) -> Dict[str, Any]:
+    """Run every scenario ``repeat`` times and keep the best throughput run.
+
+    With ``isolate`` every run happens in its own process, so ``peak_rss_mb``
+    is the peak of that run alone.  Without it the runs share this process,
+    whose high-water mark includes everything run before, and
+    ``peak_rss_mb`` is left out.
+    """
+
+    results: Dict[str, Dict[str, Any]] = {}
+    for scenario in scenarios:
+        runs = [
+            _isolated(scenario, profile, seed) if isolate else PIPELINES[scenario.pipeline](scenario, profile, seed)
+            for _ in range(max(1, repeat))
+        ]
+        results[scenario.name] = max(runs, key=lambda r: r["throughput"])
+    return {"profile": asdict(profile), "seed": seed, "scenarios": results}
+
+
+def compare(
+    current: Dict[str, Any], baseline: Dict[str, Any], threshold: float = 0.25
+) -> List[Dict[str, Any]]:
+    """Metrics of ``current`` that are worse than ``baseline`` by more than ``threshold``.
+
+    ``threshold`` is relative (0.25 = 25%).  Scenarios missing from either
+    report are ignored.
+    """
+
+    regressions = []
+    for name, now in current.get("scenarios", {}).items():
+        before = baseline.get("scenarios", {}).get(name)
+        if before is None:
+            continue
+        for metric, better in METRICS.items():
+            old, new = before.get(metric), now.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if (better == "higher" and change < -threshold) or (better == "lower" and change > threshold):
+                regressions.append(
+                    {"scenario": name, "metric": metric, "baseline": old, "current": new, "change": round(change, 3)}
+                )
+    return regressions
+
+
+__all__ = [
+    "LatencyProfile",
+    "METRICS",
+    "PIPELINES",
+    "Scenario",
+    "SimulatedModel",
+    "compare",
+    "grid",
+    "peak_rss_mb",
+    "run",
+    "run_agent",
+    "run_api",
+]
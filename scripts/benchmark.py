@@ -0,0 +1,85 @@
+"""Benchmark the evaluation pipeline against simulated models.
+
+Usage::
+
+    python scripts/benchmark.py --pipelines agent,api --models 1,4 \
+        --questions 200,1000 --concurrency 8,32 --latency lognormal:0.005:0.5
+
+Prints a JSON report.  ``--baseline`` compares it with a stored report and
+exits with status 1 when a metric regressed by more than ``--threshold``;
+``--save-baseline`` writes the report to the baseline path instead.  The
+``api`` pipeline runs against a temporary SQLite database unless
+``--database`` is given.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEFAULT_BASELINE = os.path.join(ROOT, "benchmarks", "baseline.json")
+
+
+def _ints(value: str):
+    return [int(v) for v in value.split(",") if v]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pipelines", default="agent,api", help="comma separated: agent, api")
+    parser.add_argument("--models", type=_ints, default=[1, 4])
+    parser.add_argument("--questions", type=_ints, default=[200])
+    parser.add_argument("--concurrency", type=_ints, default=[8, 32])
+    parser.add_argument("--per-model-concurrency", type=_ints, default=[4])
+    parser.add_argument("--latency", default="lognormal:0.005:0.5", help="distribution[:mean[:sigma]]")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=1, help="runs per scenario, the best one is kept")
+    parser.add_argument("--database", help="DATABASE_URL for the api pipeline")
+    parser.add_argument("--baseline", nargs="?", const=DEFAULT_BASELINE, help="compare with this report")
+    parser.add_argument("--save-baseline", nargs="?", const=DEFAULT_BASELINE, help="write the report here")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed relative regression")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Must be set before the backend (and its engines) is imported.
+        os.environ["DATABASE_URL"] = args.database or f"sqlite:///{tmp}/bench.db"
+        os.chdir(tmp)  # keeps the answer cache file out of the tree
+
+        from backend import migrations
+        from backend.database import engine
+        from benchmarks import harness
+
+        migrations.upgrade(engine)
+        pipelines = [p for p in args.pipelines.split(",") if p]
+        unknown = set(pipelines) - set(harness.PIPELINES)
+        if unknown:
+            parser.error(f"unknown pipelines: {', '.join(sorted(unknown))}")
+        scenarios = harness.grid(
+            pipelines, args.models, args.questions, args.concurrency, args.per_model_concurrency
+        )
+        profile = harness.LatencyProfile.parse(args.latency, args.error_rate)
+        report = harness.run(scenarios, profile, seed=args.seed, repeat=args.repeat)
+
+    status = 0
+    if args.baseline:
+        with open(args.baseline) as fh:
+            report["regressions"] = harness.compare(report, json.load(fh), args.threshold)
+        status = 1 if report["regressions"] else 0
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as fh:
+            json.dump(report, fh, indent=2, sort_keys=True)
+            fh.write("\n")
+    json.dump(report, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
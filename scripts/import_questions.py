@@ -0,0 +1,65 @@
+"""Bulk import questions from JSONL or CSV files into the question bank.
+
+Usage::
+
+    python scripts/import_questions.py questions.jsonl [more.csv ...]
+
+The target database is taken from ``DATABASE_URL`` like the API itself.
+Files are streamed, so their size does not affect memory use.  With
+``--reject-similar`` near duplicates of questions in the bank (or earlier in
+the import) are skipped; this loads the bank's similarity index first.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend import config, importer, migrations  # noqa: E402
+from backend import models as db_models  # noqa: E402
+from backend.agents import QuestionCurationAgent  # noqa: E402
+from backend.database import SessionLocal, engine  # noqa: E402
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("paths", nargs="+", help="JSONL/NDJSON or CSV files")
+    parser.add_argument("--format", choices=sorted(importer.PARSERS), help="override detection by extension")
+    parser.add_argument("--chunk-size", type=int, default=config.IMPORT_CHUNK_SIZE)
+    parser.add_argument("--reject-similar", action="store_true", help="skip near-duplicate questions")
+    parser.add_argument("--threshold", type=float, default=config.DUPLICATE_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    migrations.upgrade(engine)
+    curation = None
+    if args.reject_similar:
+        curation = QuestionCurationAgent(threshold=args.threshold)
+        with SessionLocal() as db:
+            rows = db.query(db_models.Question.id, db_models.Question.text, db_models.Question.options)
+            curation.load({"id": i, "text": t, "options": o} for i, t, o in rows.yield_per(1000))
+    bulk = importer.QuestionImporter(
+        SessionLocal, args.chunk_size, curation=curation, reject_similar=args.reject_similar
+    )
+    start = time.perf_counter()
+    for path in args.paths:
+        fmt = args.format or os.path.splitext(path)[1].lstrip(".").lower()
+        if fmt not in importer.PARSERS:
+            parser.error(f"cannot detect format of {path}; use --format")
+        with open(path, "r", encoding="utf-8", newline="") as fh:
+            bulk.import_rows(importer.PARSERS[fmt](fh))
+    elapsed = time.perf_counter() - start
+
+    report = bulk.report.as_dict()
+    report["seconds"] = round(elapsed, 3)
+    json.dump(report, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+    return 1 if report["invalid"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
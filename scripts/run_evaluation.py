@@ -0,0 +1,110 @@
+"""Run an evaluation on the local database and export its results.
+
+Usage::
+
+    python scripts/run_evaluation.py --questions 100 --mode auto --export answers.csv.gz
+    python scripts/run_evaluation.py --evaluation-id ev12 --table models --export models.parquet
+
+Without ``--evaluation-id`` an evaluation is queued like ``POST /evaluations``
+and the script waits for it to finish.  ``--export`` writes one result table
+(``answers`` or ``models``); the format and compression follow the file
+extension (``.csv``, ``.csv.gz``, ``.csv.zst``, ``.parquet``) unless given
+with ``--format`` and ``--compression``.  The export is written chunk by
+chunk, so its size does not affect memory use.  A summary is printed as
+JSON.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend import config, export  # noqa: E402
+
+
+def _ints(value: str):
+    return [int(v) for v in value.split(",") if v]
+
+
+def _detect(path: str):
+    name = path.lower()
+    for suffix, compression in ((".gz", "gzip"), (".zst", "zstd")):
+        if name.endswith(suffix):
+            return "csv", compression
+    if name.endswith(".parquet"):
+        return "parquet", "none"
+    return "csv", "none"
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--evaluation-id", help="export this evaluation instead of running a new one")
+    parser.add_argument("--models", type=_ints, default=[], help="comma separated model ids (default: all)")
+    parser.add_argument("--questions", type=int, default=10, help="number of questions to sample")
+    parser.add_argument("--scope", default="", help="comma separated KUs to sample from")
+    parser.add_argument("--mode", default="", help="evaluation mode (default: from the agent config)")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--export", help="file to write the results table to")
+    parser.add_argument("--table", choices=export.TABLES, default="answers")
+    parser.add_argument("--format", choices=export.FORMATS)
+    parser.add_argument("--compression", choices=export.COMPRESSIONS)
+    parser.add_argument("--chunk-size", type=int, default=config.EXPORT_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    fmt, compression = _detect(args.export or "")
+    fmt, compression = args.format or fmt, args.compression or compression
+    if args.export:
+        try:
+            export.check_options(args.table, fmt, compression)
+        except export.ExportError as exc:
+            parser.error(str(exc))
+
+    from backend import main as api  # upgrades the database schema on import
+    from backend.database import SessionLocal
+    summary = {}
+    with SessionLocal() as db:
+        evaluation_id = args.evaluation_id
+        if evaluation_id is None:
+            data = api.EvaluationCreate(
+                model_ids=args.models,
+                question_scope=[ku for ku in args.scope.split(",") if ku],
+                question_count=args.questions,
+                mode=args.mode,
+                seed=args.seed,
+            )
+            start = time.perf_counter()
+            created = api.create_evaluation(data, token=config.ACCESS_TOKEN, db=db)
+            evaluation_id = created.evaluation_id
+            api.job_runner.wait(evaluation_id)
+            summary["seconds"] = round(time.perf_counter() - start, 3)
+        record = api.storage.get_evaluation(db, evaluation_id)
+        if record is None:
+            parser.error(f"evaluation {evaluation_id} not found")
+        db.refresh(record)
+        summary.update(
+            evaluation_id=evaluation_id, status=record.status, error=record.error, models=record.results
+        )
+        if args.export:
+            if args.table == "models" and record.results is None:
+                parser.error("the evaluation has no results to export")
+            chunks = export.iter_export(SessionLocal, record, args.table, fmt, compression, args.chunk_size)
+            summary["export"] = {
+                "path": args.export,
+                "table": args.table,
+                "format": fmt,
+                "compression": compression,
+                "bytes": export.write_export(args.export, chunks),
+            }
+    api.job_runner.shutdown()
+    json.dump(summary, sys.stdout, indent=2, default=str)
+    sys.stdout.write("\n")
+    return 0 if summary["status"] == api.jobs.COMPLETED else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,15 @@
+import time
+
 from backend.agents import (
+    AnswerCache,
+    ColumnarResult,
     ModelAgent,
     EvaluationAgent,
     QuestionCurationAgent,
     AnalyticsAgent,
     BenchmarkAgent,
 )
+from backend.agents import adapters
 
 
 def test_model_agent_answer():
@@ -27,6 +32,20 @@ def test_question_curation_agent():
     review = agent.review({"id": 1, "text": "Q"})
     assert review["status"] == "ok"
 
+    options = ["Confidentiality", "Integrity", "Availability", "Accountability"]
+    bank = [
+        {"id": 1, "text": "Which property of the CIA triad does encryption at rest protect?", "options": options},
+        {"id": 2, "text": "which property of the CIA triad does encryption at rest protect", "options": options[::-1]},
+        {"id": 3, "text": "Which port does HTTPS use by default?", "options": ["443", "80", "22", "21"]},
+    ]
+    agent.load(bank)
+    assert agent.clusters() == [[1, 2]] and agent.redundant_ids() == {2}
+    review = agent.review({"text": "Which property of the CIA triad does encryption at rest protect ?", "options": options})
+    assert review["status"] == "duplicate" and [d["id"] for d in review["duplicates"]] == [1, 2]
+    assert agent.review(bank[2])["status"] == "ok"  # a question does not match itself
+    agent.remove(2)
+    assert agent.clusters() == []
+
 
 def test_analytics_agent_summary():
     analytics = AnalyticsAgent()
@@ -37,8 +56,675 @@ def test_analytics_agent_summary():
     assert summary["average_accuracy"] == 0.75
 
 
-def test_benchmark_agent():
-    benchmark = BenchmarkAgent()
+def _write_benchmark(path, count):
+    import json
+
+    with open(path, "w") as fh:
+        for i in range(count):
+            # First option is right for even items; formats vary like real suites.
+            if i % 3 == 0:
+                item = {"id": i, "question": f"Q{i}", "options": ["a", "b"], "answer": "A" if i % 2 == 0 else "B"}
+            elif i % 3 == 1:
+                item = {"prompt": f"Q{i}", "choices": {"A": "a", "B": "b"}, "correct_answer": "a" if i % 2 == 0 else "b"}
+            else:
+                item = {"question": f"Q{i}", "options": ["a", "b"], "correct": 0 if i % 2 == 0 else 1}
+            fh.write(json.dumps(item) + "\n")
+        fh.write("not json\n")
+
+
+def test_benchmark_agent(tmp_path):
+    from backend.agents import datasets
+
+    path = tmp_path / "bench.jsonl"
+    _write_benchmark(path, 300)
+    ranges = datasets.shard_ranges(str(path), shard_bytes=500)
+    assert len(ranges) > 10
+    lines = [line for start, end in ranges for _, _, line in datasets.iter_shard(str(path), start, end)]
+    assert lines == path.read_bytes().splitlines(keepends=True)
+
     m = ModelAgent(model_id=1, name="m1")
-    result = benchmark.run(m)
+    result = BenchmarkAgent(processes=1, shard_bytes=500).run(m, str(path))
     assert result["model_id"] == 1
+    assert (result["items"], result["correct"], result["skipped"]) == (300, 150, 1)
+    # Half right on two options is exactly chance.
+    assert abs(result["benchmark_score"]) < 1e-9
+    assert result["shards"] == len(ranges)
+
+    correlation = BenchmarkAgent.correlate({1: 0.1, 2: 0.5, 3: 0.9}, {1: 0.2, 2: 0.3, 3: 0.8, 4: 1.0})
+    assert correlation["n"] == 3 and correlation["spearman"] == 1.0
+    assert 0.9 < correlation["pearson"] < 1.0
+
+
+def test_benchmark_agent_resumes_from_checkpoints(tmp_path):
+    path = tmp_path / "bench.jsonl"
+    _write_benchmark(path, 200)
+
+    class Crash(BaseException):
+        """Stands in for the process being killed mid-run."""
+
+    class Interrupted(ModelAgent):
+        calls = 0
+
+        def ask(self, question, options):
+            Interrupted.calls += 1
+            if Interrupted.calls == 120:
+                raise Crash()
+            return options[0]
+
+    agent = BenchmarkAgent(processes=1, shard_bytes=1000, chunk_size=16, checkpoint_dir=str(tmp_path / "ck"))
+    model = Interrupted(model_id=1, name="m1")
+    try:
+        agent.run(model, str(path))
+    except Crash:
+        pass
+    done = Interrupted.calls
+    result = agent.run(model, str(path))
+    assert (result["items"], result["correct"]) == (200, 100)
+    # Only the unfinished chunk is asked again, not the whole dataset.
+    assert Interrupted.calls - done < 200 - 100
+    assert list((tmp_path / "ck").iterdir()) == []
+
+
+class SlowAgent(ModelAgent):
+    def ask(self, question, options):
+        time.sleep(0.05)
+        return super().ask(question, options)
+
+
+class FlakyAgent(ModelAgent):
+    calls = 0
+
+    def ask(self, question, options):
+        FlakyAgent.calls += 1
+        if FlakyAgent.calls == 1:
+            raise RuntimeError("transient failure")
+        return super().ask(question, options)
+
+
+def test_evaluation_agent_runs_calls_concurrently():
+    models = [SlowAgent(model_id=i, name=f"m{i}") for i in range(1, 5)]
+    questions = [
+        {"id": i, "text": "Q?", "options": ["A", "B"], "correct": "A"}
+        for i in range(1, 6)
+    ]
+    eval_agent = EvaluationAgent(models, max_concurrency=20, per_model_concurrency=5)
+    start = time.perf_counter()
+    result = eval_agent.evaluate(questions)
+    elapsed = time.perf_counter() - start
+    # 20 calls of 50ms each would take a full second when run serially.
+    assert elapsed < 0.5
+    assert [q["id"] for q in result["questions"]] == [1, 2, 3, 4, 5]
+    assert all(m["accuracy"] == 1.0 for m in result["models"])
+
+
+def test_evaluation_agent_enforces_timeout_and_retries():
+    slow = SlowAgent(model_id=1, name="slow", max_retries=1)
+    FlakyAgent.calls = 0
+    flaky = FlakyAgent(model_id=2, name="flaky", max_retries=2)
+    q = {"id": 1, "text": "Q?", "options": ["A", "B"], "correct": "A"}
+    result = EvaluationAgent([slow, flaky], timeout=0.01).evaluate([q])
+    stats = {m["id"]: m for m in result["models"]}
+    assert result["questions"][0]["answers"] == {1: None, 2: "A"}
+    assert stats[1]["errors"] == 1 and stats[1]["correct"] == 0
+    assert stats[2]["correct"] == 1
+
+
+def test_timed_out_calls_release_their_thread_and_limiter_slot():
+    import asyncio
+    import threading
+
+    from backend.agents import ModelLimiter
+    from backend.agents.engine import ExecutionEngine
+
+    release = threading.Event()
+
+    class HangingAgent(ModelAgent):
+        def ask(self, question, options):
+            if question == "hang":
+                release.wait(5)
+            return options[0]
+
+    questions = [
+        {"id": 1, "text": "hang", "options": ["A", "B"], "correct": "A"},
+        {"id": 2, "text": "Q?", "options": ["A", "B"], "correct": "A"},
+    ]
+    agent = HangingAgent(model_id=1, name="m1", max_retries=1)
+    # A single pool thread: the abandoned call must not hold it.
+    eval_agent = EvaluationAgent([agent], timeout=0.05, max_concurrency=1, per_model_concurrency=1)
+    start = time.perf_counter()
+    result = eval_agent.evaluate(questions)
+    assert time.perf_counter() - start < 1
+    assert [q["answers"] for q in result["questions"]] == [{1: None}, {1: "A"}]
+    release.set()
+
+    release.clear()
+    limiter = ModelLimiter(1, initial_concurrency=2, max_concurrency=2)
+    agent = HangingAgent(model_id=1, name="m1", limiter=limiter)
+
+    async def cancel_mid_call():
+        task = asyncio.ensure_future(ExecutionEngine(timeout=5).run([agent], questions[:1]))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(cancel_mid_call())
+    release.set()
+    state = limiter.state()
+    assert state["concurrency"]["in_flight"] == 0 and state["calls"] == 0
+
+
+def test_evaluation_agent_skips_prior_answers():
+    calls = []
+
+    class CountingAgent(ModelAgent):
+        def ask(self, question, options):
+            calls.append((self.model_id, question))
+            return options[0]
+
+    models = [CountingAgent(model_id=1, name="m1"), CountingAgent(model_id=2, name="m2")]
+    questions = [
+        {"id": i, "text": f"Q{i}", "options": ["A", "B"], "correct": "A"} for i in (10, 11)
+    ]
+    prior = {(1, 10): "B", (1, 11): None, (2, 10): "A", (3, 10): "A"}
+    result = EvaluationAgent(models).evaluate(questions, prior=prior)
+    assert calls == [(2, "Q11")]
+    assert result["reused"] == 3
+    assert result["questions"][0]["answers"] == {1: "B", 2: "A"}
+    assert result["models"][0]["errors"] == 1
+    assert result["models"][1]["correct"] == 2
+
+
+def test_peer_mode_grades_distinct_answers_once():
+    from backend.agents import metrics
+
+    calls = []
+
+    class Grader(ModelAgent):
+        def ask(self, question, options):
+            calls.append(self.model_id)
+            if options == ["correct", "incorrect"]:
+                # Model 3 approves everything; the others grade honestly.
+                right = question.endswith("Proposed answer: A\nIs the proposed answer correct?")
+                return "correct" if right or self.model_id == 3 else "incorrect"
+            return "B" if self.model_id == 2 else "A"
+
+    models = [Grader(model_id=i, name=f"m{i}") for i in (1, 2, 3)]
+    questions = [
+        {"id": i, "text": f"Q{i}", "options": ["A", "B"], "correct": "A", "ku": ku}
+        for i, ku in ((1, "net"), (2, "net"), (3, "crypto"))
+    ]
+    agent = EvaluationAgent(models, mode="peer", cache=AnswerCache())
+    answered = metrics.ANSWERS.value("1")
+    peer = agent.evaluate(questions)["peer"]
+    # Two distinct answers per question, graded once by each of 3 models.
+    assert peer["items"] == 6 and peer["grader_calls"] == 18 and peer["pairwise_calls"] == 27
+    assert len(calls) == 9 + 18
+    assert metrics.ANSWERS.value("1") - answered == 3  # grading calls are not answers
+    assert peer["model_ids"] == [1, 2, 3] and peer["kus"] == ["net", "crypto"]
+    assert peer["judged"][0] == [[2, 2, 2]] * 3
+    assert peer["approved"][0] == [[2, 0, 2], [2, 0, 2], [2, 2, 2]]
+    assert peer["approval"][0] == [1.0, 0.0, 1.0]
+    assert peer["peer_score"] == {1: 1.0, 2: 0.5, 3: 1.0}
+    assert peer["grader_accuracy"] == {1: 1.0, 2: 1.0, 3: 0.5}
+
+    # Judgments come from the cache on the next run.
+    calls.clear()
+    assert agent.evaluate(questions)["peer"]["cache"]["hits"] == 18
+    assert calls == []
+    assert "peer" not in EvaluationAgent(models).evaluate(questions)
+
+
+def test_adaptive_mode_stops_each_ku_at_the_target_precision():
+    from dataclasses import replace
+
+    from backend.agents import StoppingRule
+
+    class Model(ModelAgent):
+        def ask(self, question, options):
+            # Model 1 is always right, model 2 right on every other question.
+            return "A" if self.model_id == 1 or int(question[1:]) % 2 else "B"
+
+    models = [Model(model_id=i, name=f"m{i}") for i in (1, 2)]
+    questions = [
+        {"id": i, "text": f"Q{i}", "options": ["A", "B"], "correct": "A", "ku": "net" if i % 4 < 2 else "crypto"}
+        for i in range(8000)
+    ]
+    rule = StoppingRule(precision=0.05, confidence=0.9, min_samples=20)
+    agent = EvaluationAgent(models, mode="adaptive", max_concurrency=1, per_model_concurrency=1, stopping=rule)
+    result = agent.evaluate(questions)
+    summary = result["adaptive"]
+    assert summary["pairs"] == 16000 and summary["saved"] == 16000 - summary["asked"]
+    assert summary["asked"] < 2000 and summary["saved_fraction"] > 0.85
+    assert sum(m["total"] for m in result["models"]) == summary["asked"]
+    for model in summary["models"]:
+        for ku in ("net", "crypto"):
+            group = model["kus"][ku]
+            assert group["stopped"] == "precision" and group["available"] == 4000
+            assert group["high"] - group["low"] <= 2 * rule.precision
+    perfect, coin = summary["models"]
+    assert perfect["accuracy"] == 1.0 and abs(coin["accuracy"] - 0.5) < 0.05
+    # The perfect model's interval narrows far sooner than the coin flip's.
+    assert perfect["kus"]["net"]["answered"] < coin["kus"]["net"]["answered"] / 2
+
+    # Answers of an earlier run count towards the stopping rule.
+    prior = {(1, q["id"]): "A" for q in questions}
+    resumed = agent.evaluate(questions, prior=prior)["adaptive"]
+    assert resumed["models"][0]["kus"]["net"]["stopped"] == "exhausted"
+    assert resumed["reused"] == 8000
+
+    # Comparing models stops as soon as their intervals separate.
+    compare = EvaluationAgent(models, mode="adaptive", stopping=replace(rule, rule="compare"))
+    separated = compare.evaluate(questions)["adaptive"]
+    assert separated["asked"] < summary["asked"]
+    assert {m["kus"]["net"]["stopped"] for m in separated["models"]} == {"separated"}
+    assert "adaptive" not in EvaluationAgent(models).evaluate(questions)
+    try:
+        StoppingRule(rule="sometimes")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("unknown stopping rule accepted")
+
+
+def test_circuit_breaker_fails_fast_and_slow_calls_are_hedged():
+    from backend.agents import CircuitBreaker
+
+    now = [0.0]
+    changes = []
+    breaker = CircuitBreaker(
+        1, window=4, min_calls=4, error_rate=0.5, cooldown=10, on_change=lambda m, s: changes.append(s),
+        clock=lambda: now[0],
+    )
+
+    class Down(ModelAgent):
+        calls = 0
+
+        def ask(self, question, options):
+            Down.calls += 1
+            raise RuntimeError("provider down")
+
+    questions = [{"id": i, "text": f"Q{i}", "options": ["A", "B"], "correct": "A"} for i in range(30)]
+    down = Down(model_id=1, name="down", max_retries=1, breaker=breaker)
+    result = EvaluationAgent([down], max_concurrency=1, per_model_concurrency=1).evaluate_columnar(questions[:20])
+    # Four failures open the breaker; the other calls fail without reaching the model.
+    assert Down.calls == 4 and result.extra["rejected"] == {1: 16}
+    assert result.model_summary()[0]["errors"] == 20
+    assert breaker.state == "open" and changes == ["open"]
+    now[0] = 10
+    probe = breaker.allow()
+    assert probe and breaker.allow() is None  # a single probe when half open
+    breaker.record(True, probe)
+    assert breaker.state == "closed" and changes == ["open", "closed"]
+
+    # A slow call started before the breaker opened cannot close it again.
+    slow = breaker.allow()
+    for _ in range(4):
+        breaker.record(False, breaker.allow())
+    now[0] = 20
+    probe = breaker.allow()
+    breaker.record(True, slow)
+    assert breaker.state == "half_open" and changes == ["open", "closed", "open"]
+    breaker.record(False, probe)
+    assert breaker.state == "open"
+    now[0] = 30
+    breaker.record(True, breaker.allow())
+    assert breaker.state == "closed"
+
+    class Replica(ModelAgent):
+        def ask(self, question, options):
+            return "B"
+
+    class Stalling(ModelAgent):
+        def ask(self, question, options):
+            if question == "Q29":
+                time.sleep(1)
+            return "A"
+
+        def replica(self):
+            return Replica(model_id=self.model_id, name="replica")
+
+    agent = EvaluationAgent(
+        [Stalling(model_id=1, name="m1")], max_concurrency=1, per_model_concurrency=1, hedge_percentile=90
+    )
+    start = time.perf_counter()
+    result = agent.evaluate_columnar(questions)
+    assert time.perf_counter() - start < 0.9
+    # The stalled call is answered by the replica; no hedges before 20 samples.
+    assert result.answer_text(0, 29) == "B"
+    assert all(result.answer_text(0, i) == "A" for i in range(20))
+    assert result.extra["hedges"][1]["won"] >= 1
+
+
+def test_throttled_calls_back_off_without_using_retries():
+    from backend.agents import ModelLimiter, RateLimitError
+
+    class ThrottledAgent(ModelAgent):
+        calls = 0
+
+        def ask(self, question, options):
+            ThrottledAgent.calls += 1
+            if ThrottledAgent.calls <= 3:
+                raise RateLimitError(retry_after=0.01)
+            return options[0]
+
+    limiter = ModelLimiter(1, initial_concurrency=8, max_concurrency=8)
+    limiter.concurrency.decrease_interval = 0
+    agent = ThrottledAgent(model_id=1, name="m1", max_retries=1, limiter=limiter)
+    q = {"id": 1, "text": "Q?", "options": ["A", "B"], "correct": "A"}
+    result = EvaluationAgent([agent], retry_backoff=0.001).evaluate([q])
+    assert result["questions"][0]["answers"] == {1: "A"}
+    state = limiter.state()
+    assert (state["calls"], state["throttled"]) == (4, 3)
+    # Three halvings from 8 to 1, then one additive step of 1 / limit.
+    assert state["concurrency"]["limit"] == 2
+    assert state["concurrency"]["in_flight"] == 0
+
+
+def test_token_bucket_and_aimd_limits():
+    from backend.agents.limits import AdaptiveConcurrency, TokenBucket
+
+    bucket = TokenBucket(per_minute=60)
+    assert bucket.reserve(60) == 0
+    assert 0.9 < bucket.reserve(1) <= 1.0
+    assert TokenBucket(0).reserve(10**6) == 0
+
+    aimd = AdaptiveConcurrency(initial=2, maximum=3, decrease_interval=0)
+    for _ in range(10):
+        aimd.on_success(0.01)
+    assert aimd.limit == 3
+    aimd.on_success(1.0)  # latency spike
+    assert aimd.limit == 1
+
+
+class BatchAgent(ModelAgent):
+    supports_batch = True
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.batches = []
+        self.singles = []
+
+    def ask(self, question, options):
+        self.singles.append(question)
+        return options[0]
+
+    def ask_batch(self, batch):
+        questions = [q for q, _ in batch]
+        self.batches.append(questions)
+        if "Q-bad" in questions and len(batch) > 1:
+            raise RuntimeError("batch rejected")
+        # The provider drops the answer to Q-skip but keeps the others.
+        return [None if q == "Q-skip" else o[0] for q, o in batch]
+
+
+def test_micro_batching_groups_calls_and_splits_failures():
+    agent = BatchAgent(model_id=1, name="batched")
+    names = ["Q0", "Q1", "Q-bad", "Q3", "Q4", "Q-skip", "Q6", "Q7"]
+    questions = [
+        {"id": i, "text": text, "options": ["A", "B"], "correct": "A"}
+        for i, text in enumerate(names)
+    ]
+    eval_agent = EvaluationAgent([agent], max_batch_size=4, max_batch_wait=0.05)
+    result = eval_agent.evaluate(questions)
+
+    assert all(q["answers"] == {1: "A"} for q in result["questions"])
+    assert agent.batches[:2] == [names[:4], names[4:]]
+    # The rejected batch is bisected down to single calls around the bad
+    # question; the answer missing from a good batch is asked on its own.
+    assert ["Q0", "Q1"] in agent.batches and ["Q-bad", "Q3"] in agent.batches
+    assert sorted(agent.singles) == ["Q-bad", "Q-skip", "Q3"]
+    assert result["batches"] == {1: len(agent.batches)}
+
+
+def test_http_adapters_against_stub_server(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    from backend import stub_server
+    from backend.agents import CircuitBreaker
+
+    client = TestClient(stub_server.app)
+    options = ["Paris", "Rome", "Madrid"]
+    openai = adapters.create_agent(
+        "openai", model_id=1, name="gpt", base_url="http://testserver/v1", client=client, api_key=None
+    )
+    tgi = adapters.create_agent("tgi", model_id=2, name="tgi", base_url="http://testserver", client=client)
+    generic = adapters.create_agent("http", model_id=3, name="api", base_url="http://testserver", client=client)
+    assert openai.ask("Capital of France?", options) == "Paris"
+    assert tgi.ask("Capital of France?", options) == "Paris"
+    assert generic.ask_batch([("Q1", options), ("Q2", ["x", "y"])]) == ["Paris", "x"]
+
+    result = EvaluationAgent([openai, generic], max_batch_size=4).evaluate(
+        [{"id": i, "text": f"Q{i}", "options": ["A", "B"], "correct": "A"} for i in range(6)]
+    )
+    assert [m["correct"] for m in result["models"]] == [6, 6]
+    assert result["batches"][3] >= 1
+
+    monkeypatch.setattr(stub_server, "THROTTLE_EVERY", 1)
+    probe = adapters.probe(tgi)
+    assert probe["status"] == "error" and "RateLimitError" in probe["error"]
+    monkeypatch.setattr(stub_server, "THROTTLE_EVERY", 0)
+
+    # A plain 503 is an outage, not throttling, so it trips the breaker.
+    monkeypatch.setattr(stub_server, "UNAVAILABLE", True)
+    breaker = CircuitBreaker(3, window=4, min_calls=4, error_rate=0.5, cooldown=60)
+    down = adapters.create_agent(
+        "http", model_id=3, name="api", base_url="http://testserver", client=client, max_retries=1, breaker=breaker
+    )
+    result = EvaluationAgent([down], max_concurrency=1, per_model_concurrency=1).evaluate_columnar(
+        [{"id": i, "text": f"Q{i}", "options": ["A", "B"], "correct": "A"} for i in range(6)]
+    )
+    assert breaker.state == "open" and result.extra["rejected"][3] > 0
+    assert result.model_summary()[0]["errors"] == 6
+
+    assert adapters.parse_answer(" (b) ", options) == "Rome"
+    assert adapters.parse_answer("madrid", options) == "Madrid"
+    assert adapters.parse_answer("Z", options) == "Z"
+    assert adapters.parse_answer("B: Rome", options) == "Rome"
+    assert adapters.parse_answer("A lot of options", options) == "A lot of options"
+    assert adapters.parse_answer("I think B", options) == "I think B"
+    assert adapters.create_agent("tgi", model_id=3, name="tgi").base_url == "http://localhost:8080"
+    try:
+        adapters.create_agent("nope")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("unknown adapter type accepted")
+
+
+def test_config_store_merges_validates_and_reloads(tmp_path):
+    import os
+
+    from backend.agents.config_loader import PROCESS_SETTINGS, AgentConfig, ConfigError, ConfigStore
+
+    path = tmp_path / "config.yaml"
+    path.write_text("agents:\n  evaluation:\n    timeout: 5\n")
+    store = ConfigStore(str(path))
+    cfg = store.get()
+    assert cfg.evaluation.timeout == 5
+    assert cfg.evaluation.max_concurrency == 16  # the rest of the section keeps its defaults
+    assert store.get() is cfg
+
+    path.write_text("agents:\n  evaluation:\n    timeout: 7\n")
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 10**9))
+    assert store.get().evaluation.timeout == 7
+    assert cfg.evaluation.timeout == 5  # snapshots never change
+
+    path.write_text("agents:\n  evaluation:\n    timeout: soon\n")
+    store.request_reload()
+    assert store.get().evaluation.timeout == 7  # a bad edit keeps the last good config
+
+    run = cfg.merged({"evaluation": {"per_model_concurrency": 1}, "limits": {"retry_backoff": 0}}, locked=PROCESS_SETTINGS)
+    assert (run.evaluation.per_model_concurrency, run.evaluation.timeout) == (1, 5)
+    for bad in ({"evaluation": {"timeout": "x"}}, {"evaluation": {"nope": 1}}, {"nope": {}}, {"http": {}}, {"limits": {"max_concurrency": 2}}):
+        try:
+            AgentConfig().merged(bad, locked={"http", "limits.max_concurrency"})
+        except ConfigError:
+            pass
+        else:
+            raise AssertionError(f"{bad} accepted")
+
+
+def test_metrics_shards_and_engine_instrumentation():
+    import threading
+
+    from backend.agents import metrics
+
+    registry = metrics.Registry()
+    counter = registry.counter("demo_total", "Demo counter.", ("kind",))
+    histogram = registry.histogram("demo_seconds", "Demo histogram.", buckets=(0.1, 1.0))
+    threads = [threading.Thread(target=lambda: [counter.inc("a") for _ in range(1000)]) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+    histogram.observe(5)
+    text = registry.render()
+    assert 'demo_total{kind="a"} 4000' in text
+    assert 'demo_seconds_bucket{le="0.1"} 1' in text
+    assert 'demo_seconds_bucket{le="1"} 2' in text
+    assert 'demo_seconds_bucket{le="+Inf"} 3' in text
+    assert "demo_seconds_count 3" in text
+
+    class Flaky(ModelAgent):
+        def ask(self, question, options):
+            if question == "bad":
+                raise RuntimeError("boom")
+            return options[0]
+
+    model = Flaky(model_id=4242, name="flaky", max_retries=2)
+    questions = [{"id": i, "text": t, "options": ["A"], "correct": "A"} for i, t in enumerate(["ok", "bad"])]
+    EvaluationAgent([model], retry_backoff=0).evaluate(questions)
+    assert metrics.ANSWERS.value("4242") == 2
+    assert metrics.MODEL_ASK_SECONDS.count("4242", "ok") == 1
+    assert metrics.MODEL_ERRORS.value("4242", "error") == 2
+    assert metrics.MODEL_RETRIES.value("4242", "error") == 1
+
+
+def test_tracing_nests_spans_and_exports(tmp_path):
+    import json
+
+    from backend.agents import tracing
+
+    buffer = tracing.RingBufferExporter(size=100)
+    path = tmp_path / "traces.jsonl"
+    tracer = tracing.Tracer([buffer, tracing.JSONFileExporter(str(path))])
+    tracer.collect("t1")
+    with tracer.span("root", trace_id="t1") as root:
+        with tracer.span("child", step=1) as child:
+            pass
+        with tracer.span("child", step=2):
+            pass
+    assert child.parent_id == root.span_id and child.trace_id == "t1"
+    assert [s.name for s in buffer.spans("t1")] == ["child", "child", "root"]
+    assert len(path.read_text().splitlines()) == 3
+    assert json.loads(path.read_text().splitlines()[0])["attributes"] == {"step": 1}
+    stages = tracer.stages("t1")
+    assert stages["child"]["count"] == 2 and stages["root"]["count"] == 1
+    assert tracer.stages("t1") == {}
+
+    with tracing.span("evaluation") as run:
+        EvaluationAgent([ModelAgent(model_id=77, name="m")]).evaluate(
+            [{"id": 5, "text": "Q", "options": ["A"], "correct": "A"}]
+        )
+    asks = [s for s in tracing.TRACER.spans(run.trace_id) if s.name == "model.ask"]
+    assert len(asks) == 1 and asks[0].parent_id == run.span_id
+    assert asks[0].attributes == {"model_id": 77, "question_id": 5, "outcome": "ok"}
+
+
+def test_answer_cache_tiers_ttl_and_eviction(tmp_path, monkeypatch):
+    from backend.agents import cache as cache_mod
+
+    path = str(tmp_path / "cache.sqlite3")
+    m = ModelAgent(model_id=1, name="m1")
+    key = cache_mod.cache_key(m.cache_identity(), "What  is\nTCP?", ["A", "B"])
+    assert key == cache_mod.cache_key(m.cache_identity(), "What is TCP?", ["A", "B"])
+    other = ModelAgent(model_id=1, name="m1", response_format="text")
+    assert key != cache_mod.cache_key(other.cache_identity(), "What is TCP?", ["A", "B"])
+
+    store = AnswerCache(path=path, memory_entries=1)
+    store.set(key, "A")
+    store.set("other", "B")  # pushes ``key`` out of the memory tier
+    assert AnswerCache(path=path).get(key) == "A"
+    assert store.persistent and store.get(key, memory_only=True) is None
+    assert store.get(key) == "A"
+    assert store.get(key, memory_only=True) == "A"
+
+    monkeypatch.setattr(cache_mod, "_EVICTION_INTERVAL", 1)
+    bounded = AnswerCache(path=str(tmp_path / "bounded.sqlite3"), max_entries=2)
+    for i in range(5):
+        bounded.set(f"k{i}", str(i))
+    assert AnswerCache(path=str(tmp_path / "bounded.sqlite3")).get("k0") is None
+    assert AnswerCache(path=str(tmp_path / "bounded.sqlite3")).get("k4") == "4"
+
+    expired = AnswerCache(path=path, ttl=0)
+    assert expired.get(key) is None
+
+
+def test_analytics_agent_analyze():
+    result = {
+        "models": [{"id": 1}, {"id": 2}, {"id": 3}],
+        "questions": [
+            {"id": 1, "ku": "Networking", "correct": "A", "answers": {1: "A", 2: "A", 3: "B"}},
+            {"id": 2, "ku": "Networking", "correct": "B", "answers": {1: "B", 2: "A", 3: "A"}},
+            {"id": 3, "ku": "Cryptography", "correct": "C", "answers": {1: "C", 2: "C", 3: None}},
+            {"id": 4, "ku": "Cryptography", "correct": "D", "answers": {1: "A", 2: "D", 3: "D"}},
+        ],
+    }
+    analysis = AnalyticsAgent(bootstrap_samples=200, seed=1).analyze(result)
+    models = {m["id"]: m for m in analysis["models"]}
+    assert models[1]["accuracy"] == 0.75
+    assert models[3]["accuracy"] == 1 / 3
+    assert models[1]["scores_by_ku"] == {"Networking": 1.0, "Cryptography": 0.5}
+    assert models[3]["scores_by_ku"]["Cryptography"] == 1.0
+    lo, hi = models[1]["ci"]
+    assert 0 <= lo <= 0.75 <= hi <= 1
+
+    agreement = analysis["agreement"]["matrix"]
+    assert agreement[0][0] == 1.0
+    assert agreement[0][1] == 0.5  # models 1 and 2 agree on questions 1 and 3
+    assert agreement[1][2] == 2 / 3  # question 3 is not answered by model 3
+    assert analysis["correlation"]["model_ids"] == [1, 2, 3]
+    assert analysis["anova"]["models"]["df"] == [2, 8]
+    assert 0 <= analysis["anova"]["models"]["p_value"] <= 1
+
+
+def test_f_distribution_survival_function():
+    from backend.agents.analytics import f_sf
+
+    # Reference values from standard F tables.
+    assert abs(f_sf(4.0, 2, 27) - 0.0301) < 1e-3
+    assert abs(f_sf(3.35, 2, 27) - 0.05) < 1e-3
+
+
+def test_columnar_result_round_trip(tmp_path):
+    from backend.agents.results import load_columns
+
+    models = [ModelAgent(model_id=1, name="m1"), ModelAgent(model_id=2, name="m2")]
+    questions = [
+        {"id": 10, "ku": "Networking", "options": ["A", "B"], "correct": "A"},
+        {"id": 11, "ku": "Cryptography", "options": ["A", "B"], "correct": "B"},
+    ]
+    result = ColumnarResult(models, questions)
+    result.record(0, 0, "A")
+    result.record(0, 1, "Z")
+    result.record(1, 0, "B")
+    result.record(1, 1, None)
+
+    data = result.to_dict()
+    assert [m["correct"] for m in data["models"]] == [2, 0]
+    assert data["models"][1]["errors"] == 1
+    assert data["questions"][0]["answers"] == {1: "A", 2: "Z"}
+    assert data["questions"][1]["answers"] == {1: "B", 2: None}
+    assert result.correct_bits.shape == (2, 1)
+    assert result.buffers()["answers"].nbytes == 4
+
+    result.save(str(tmp_path))
+    columns = load_columns(str(tmp_path))
+    assert columns["question_ids"].tolist() == [10, 11]
+    assert columns["answers"].tolist() == result.answers.tolist()
+    assert columns["meta"]["other"] == [[1, 0, "Z"]]
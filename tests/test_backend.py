@@ -1,5 +1,9 @@
+import asyncio
+import json
+import threading
+
 import pytest
-from fastapi import HTTPException
+from fastapi import HTTPException, Response
 
 from backend import main, config
 
@@ -10,13 +14,34 @@ def reset_state():
 
     models.Base.metadata.drop_all(bind=database.engine)
     models.Base.metadata.create_all(bind=database.engine)
-    main._evaluations.clear()
-    main._evaluation_results.clear()
+    cache = main.get_answer_cache()
+    if cache is not None:
+        cache.clear()
+    main.curation.load([])  # the bank is empty
     yield
     models.Base.metadata.drop_all(bind=database.engine)
     models.Base.metadata.create_all(bind=database.engine)
-    main._evaluations.clear()
-    main._evaluation_results.clear()
+
+
+def call_async(route, *args, **kwargs):
+    """Call an async endpoint with a fresh async session."""
+
+    from backend import database
+
+    async def run():
+        async with database.AsyncSessionLocal() as session:
+            return await route(*args, db=session, **kwargs)
+
+    return asyncio.run(run())
+
+
+@pytest.fixture
+def db():
+    from backend import database
+
+    session = database.SessionLocal()
+    yield session
+    session.close()
 
 
 def test_login_success():
@@ -33,69 +58,1010 @@ def test_login_failure():
     assert exc.value.status_code == 401
 
 
-def test_question_lifecycle():
+def test_question_lifecycle(db):
     qdata = main.QuestionCreate(text="Sample?", options=["yes", "no"], correct="yes", ku="Networking")
-    question = main.create_question(qdata, token=config.ACCESS_TOKEN)
+    question = main.create_question(qdata, token=config.ACCESS_TOKEN, db=db)
     assert question.id == 1
 
-    questions = main.list_questions(token=config.ACCESS_TOKEN)
+    questions = call_async(main.list_questions, Response(), limit=100, token=config.ACCESS_TOKEN)
     assert len(questions) == 1
     assert questions[0].text == "Sample?"
 
-    resp = main.delete_question(question.id, token=config.ACCESS_TOKEN)
+    resp = main.delete_question(question.id, token=config.ACCESS_TOKEN, db=db)
     assert resp["status"] == "deleted"
-    questions = main.list_questions(token=config.ACCESS_TOKEN)
+    questions = call_async(main.list_questions, Response(), limit=100, token=config.ACCESS_TOKEN)
     assert len(questions) == 0
 
     with pytest.raises(HTTPException) as exc:
-        main.delete_question(999, token=config.ACCESS_TOKEN)
+        main.delete_question(999, token=config.ACCESS_TOKEN, db=db)
     assert exc.value.status_code == 404
 
 
-def test_model_lifecycle():
+def test_model_lifecycle(db):
     mdata = main.ModelCreate(name="m1", type="local")
-    model = main.create_model(mdata, token=config.ACCESS_TOKEN)
+    model = main.create_model(mdata, token=config.ACCESS_TOKEN, db=db)
     assert model.id == 1
 
-    models = main.list_models(token=config.ACCESS_TOKEN)
+    models = call_async(main.list_models, token=config.ACCESS_TOKEN)
     assert len(models) == 1
     assert models[0].name == "m1"
 
-    resp = main.test_model(model.id, token=config.ACCESS_TOKEN)
+    resp = main.test_model(model.id, token=config.ACCESS_TOKEN, db=db)
     assert resp["status"] == "ok"
 
     with pytest.raises(HTTPException) as exc:
-        main.test_model(999, token=config.ACCESS_TOKEN)
+        main.test_model(999, token=config.ACCESS_TOKEN, db=db)
     assert exc.value.status_code == 404
 
 
-def test_evaluation_flow():
+def test_evaluation_flow(db):
     qdata = main.QuestionCreate(text="Q?", options=["A", "B"], correct="A", ku="Networking")
-    main.create_question(qdata, token=config.ACCESS_TOKEN)
+    main.create_question(qdata, token=config.ACCESS_TOKEN, db=db)
     mdata = main.ModelCreate(name="m1", type="local")
-    main.create_model(mdata, token=config.ACCESS_TOKEN)
+    main.create_model(mdata, token=config.ACCESS_TOKEN, db=db)
 
     data = main.EvaluationCreate(model_ids=[1], question_scope=["Networking"], question_count=1, mode="auto")
-    evaluation = main.create_evaluation(data, token=config.ACCESS_TOKEN)
+    evaluation = main.create_evaluation(data, token=config.ACCESS_TOKEN, db=db)
     assert evaluation.evaluation_id == "ev1"
+    main.job_runner.wait(evaluation.evaluation_id, timeout=5)
 
-    fetched = main.get_evaluation_status(evaluation.evaluation_id, token=config.ACCESS_TOKEN)
+    fetched = call_async(main.get_evaluation_status, evaluation.evaluation_id, token=config.ACCESS_TOKEN)
     assert fetched.evaluation_id == evaluation.evaluation_id
+    assert fetched.status == "completed"
+    assert fetched.answered == fetched.total == 1
+    assert fetched.questions_answered == 1
 
-    results = main.get_evaluation_results(evaluation.evaluation_id, token=config.ACCESS_TOKEN)
+    results = call_async(main.get_evaluation_results, evaluation.evaluation_id, token=config.ACCESS_TOKEN)
     assert results.models[0]["id"] == 1
     assert len(results.questions) == 1
+    assert results.questions[0]["answers"] == {1: "A"}
 
 
     with pytest.raises(HTTPException) as exc:
-        main.get_evaluation_status("missing", token=config.ACCESS_TOKEN)
+        call_async(main.get_evaluation_status, "missing", token=config.ACCESS_TOKEN)
+    assert exc.value.status_code == 404
+
+    with pytest.raises(HTTPException) as exc:
+        call_async(main.get_evaluation_results, "missing", token=config.ACCESS_TOKEN)
     assert exc.value.status_code == 404
 
+
+def test_evaluation_cancel(db, monkeypatch):
+    started = threading.Event()
+    release = threading.Event()
+
+    def blocking_ask(self, question, options):
+        started.set()
+        release.wait(5)
+        return options[0]
+
+    monkeypatch.setattr(main.ModelAgent, "ask", blocking_ask)
+    for i in range(3):
+        qdata = main.QuestionCreate(text=f"Q{i}?", options=["A", "B"], correct="A", ku="Networking")
+        main.create_question(qdata, token=config.ACCESS_TOKEN, db=db)
+    main.create_model(main.ModelCreate(name="m1", type="local"), token=config.ACCESS_TOKEN, db=db)
+
+    data = main.EvaluationCreate(
+        model_ids=[1], question_count=3, mode="auto", config={"evaluation": {"per_model_concurrency": 1}}
+    )
+    evaluation = main.create_evaluation(data, token=config.ACCESS_TOKEN, db=db)
+    assert evaluation.status in ("queued", "running")
+    assert started.wait(5)
+
+    main.cancel_evaluation(evaluation.evaluation_id, token=config.ACCESS_TOKEN, db=db)
+    release.set()
+    main.job_runner.wait(evaluation.evaluation_id, timeout=5)
+    fetched = call_async(main.get_evaluation_status, evaluation.evaluation_id, token=config.ACCESS_TOKEN)
+    assert fetched.status == "cancelled"
+    assert fetched.answered == 1
+    assert fetched.total == 3
+
+    from backend import models as db_models
+
+    record = db.get(db_models.Evaluation, 1)
+    db.refresh(record)
+    assert record.config["evaluation"]["per_model_concurrency"] == 1
+    assert record.config["evaluation"]["timeout"] == main.agent_config().evaluation.timeout
+
+    with pytest.raises(HTTPException) as exc:
+        main.create_evaluation(
+            main.EvaluationCreate(question_count=1, mode="auto", config={"evaluation": {"timeout": "x"}}),
+            token=config.ACCESS_TOKEN,
+            db=db,
+        )
+    assert exc.value.status_code == 422
+
+    limits = dict(main.rate_limits.defaults)
+    for override in ({"limits": {"max_concurrency": 1}}, {"http": {}}, {"cache": {"enabled": False}}):
+        with pytest.raises(HTTPException) as exc:
+            main.create_evaluation(
+                main.EvaluationCreate(question_count=1, mode="auto", config=override),
+                token=config.ACCESS_TOKEN,
+                db=db,
+            )
+        assert exc.value.status_code == 422
+    assert main.rate_limits.defaults == limits
+
+
+def test_evaluation_answers_are_persisted_in_batches(db, monkeypatch):
+    monkeypatch.setattr(config, "ANSWER_BATCH_SIZE", 4)
+    for i in range(5):
+        qdata = main.QuestionCreate(text=f"Q{i}?", options=["A", "B"], correct="B", ku="Networking")
+        main.create_question(qdata, token=config.ACCESS_TOKEN, db=db)
+    for name in ("m1", "m2"):
+        main.create_model(main.ModelCreate(name=name, type="local"), token=config.ACCESS_TOKEN, db=db)
+
+    data = main.EvaluationCreate(question_count=5, mode="auto")
+    evaluation = main.create_evaluation(data, token=config.ACCESS_TOKEN, db=db)
+    main.job_runner.wait(evaluation.evaluation_id, timeout=5)
+
+    from backend import models as db_models, storage
+
+    assert db.query(db_models.Answer).count() == 10
+    record = db.get(db_models.Evaluation, 1)
+    db.refresh(record)
+    assert record.status == "completed"
+    assert record.answered == 10
+    assert record.end_time >= record.start_time
+
+    page = call_async(
+        main.get_evaluation_results, evaluation.evaluation_id, offset=3, limit=10, token=config.ACCESS_TOKEN
+    )
+    assert page.question_total == 5
+    assert [q["id"] for q in page.questions] == storage.question_order(db, record.id)[3:]
+    assert page.questions[0]["answers"] == {1: "A", 2: "A"}
+    assert page.questions[0]["correct"] == "B"
+    assert all(m["accuracy"] == 0 for m in page.models)
+    assert page.models[0]["scores_by_ku"] == {"Networking": 0.0}
+    assert page.analytics["anova"]["models"]["df"] == [1, 8]
+
+
+def test_answer_writer_hands_full_batches_to_its_thread(db):
+    from datetime import datetime
+    from types import SimpleNamespace
+
+    from backend import database, models as db_models, storage
+
+    db.add(db_models.Evaluation(id=1, status="running", start_time=datetime.utcnow()))
+    db.commit()
+    release = threading.Event()
+
+    def session_factory():
+        release.wait(5)  # a database that is slow to answer
+        return database.SessionLocal()
+
+    questions = [{"id": i, "correct": "A"} for i in range(3)]
+    writer = storage.AnswerWriter(session_factory, 1, questions, batch_size=2)
+    model = SimpleNamespace(model_id=1)
+    writer.record(0, model, "A", answered=1)
+    writer.record(1, model, "B", answered=2)  # a full batch, handed over without waiting
+    writer.record(2, model, "A", answered=3)
+    assert db.query(db_models.Answer).count() == 0
+    release.set()
+    writer.flush(answered=3)
+    writer.close()
+    db.expire_all()
+    assert db.query(db_models.Answer).count() == 3
+    assert db.get(db_models.Evaluation, 1).answered == 3
+
+
+def test_evaluation_events_replay_and_resume(db):
+    from fastapi.testclient import TestClient
+
+    for i in range(5):
+        qdata = main.QuestionCreate(text=f"Q{i}?", options=["A", "B"], correct="A", ku="Networking")
+        main.create_question(qdata, token=config.ACCESS_TOKEN, db=db)
+    for name in ("m1", "m2"):
+        main.create_model(main.ModelCreate(name=name, type="local"), token=config.ACCESS_TOKEN, db=db)
+    evaluation = main.create_evaluation(
+        main.EvaluationCreate(question_count=5, mode="auto"), token=config.ACCESS_TOKEN, db=db
+    )
+    main.job_runner.wait(evaluation.evaluation_id, timeout=5)
+
+    client = TestClient(main.app)
+    headers = {"Authorization": f"Bearer {config.ACCESS_TOKEN}"}
+    resp = client.get("/evaluations/ev1/events?format=ndjson", headers=headers)
+    events = [json.loads(line) for line in resp.text.splitlines()]
+    assert events[0]["event"] == events[-1]["event"] == "status"
+    assert events[-1]["status"] == "completed"
+    answers = [e for e in events if e["event"] == "answer"]
+    assert [e["offset"] for e in answers] == list(range(10))
+    progress = [e for e in events if e["event"] == "progress"][-1]
+    assert progress["answered"] == 10
+    assert [m["accuracy"] for m in progress["models"]] == [1.0, 1.0]
+
+    resp = client.get("/evaluations/ev1/events?format=ndjson&offset=7", headers=headers)
+    answers = [json.loads(line) for line in resp.text.splitlines()]
+    answers = [e for e in answers if e["event"] == "answer"]
+    assert [e["offset"] for e in answers] == [7, 8, 9]
+    assert {e["model_answered"] for e in answers} == {4, 5}
+
+    resp = client.get("/evaluations/ev1/events", headers={**headers, "Last-Event-ID": "8"})
+    assert resp.headers["content-type"].startswith("text/event-stream")
+    assert "id: 9\nevent: answer\n" in resp.text
+    assert "id: 8\n" not in resp.text
+
+
+def test_evaluation_events_stream_live_answers(db, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    release = threading.Event()
+
+    def gated_ask(self, question, options):
+        release.wait(5)
+        return options[1]
+
+    monkeypatch.setattr(main.ModelAgent, "ask", gated_ask)
+    for i in range(4):
+        qdata = main.QuestionCreate(text=f"Q{i}?", options=["A", "B"], correct="A", ku="Networking")
+        main.create_question(qdata, token=config.ACCESS_TOKEN, db=db)
+    main.create_model(main.ModelCreate(name="m1", type="local"), token=config.ACCESS_TOKEN, db=db)
+    evaluation = main.create_evaluation(
+        main.EvaluationCreate(question_count=4, mode="auto"), token=config.ACCESS_TOKEN, db=db
+    )
+
+    # Answers only start once the stream is open, so they arrive live.
+    threading.Timer(0.2, release.set).start()
+    client = TestClient(main.app)
+    headers = {"Authorization": f"Bearer {config.ACCESS_TOKEN}"}
+    resp = client.get(f"/evaluations/{evaluation.evaluation_id}/events?format=ndjson", headers=headers)
+    events = [json.loads(line) for line in resp.text.splitlines()]
+    assert events[0]["status"] in ("queued", "running")
+    answers = [e for e in events if e["event"] == "answer"]
+    assert [e["offset"] for e in answers] == [0, 1, 2, 3]
+    assert answers[-1]["model_accuracy"] == 0.0
+    assert events[-1]["status"] == "completed"
+
+
+def test_progress_subscription_buffer_is_bounded():
+    import asyncio
+
+    from backend import progress
+
+    async def scenario():
+        log = progress.ProgressLog("ev1", history=3)
+        sub = log.subscribe(buffer_size=2)
+        question = {"id": 1, "correct": "A"}
+        for _ in range(5):
+            log.publish_answer(question, 1, "A")
+        events, lagged = await sub.next(timeout=1)
+        assert lagged and events == []
+        assert log.since(0, 10) is None
+        assert [e["offset"] for e in log.since(2, 10)] == [2, 3, 4]
+        log.publish_answer(question, 1, "B")
+        events, lagged = await sub.next(timeout=1)
+        assert not lagged and events[0]["model_accuracy"] == 5 / 6
+        log.close()
+        await sub.next(timeout=1)
+        assert sub.closed
+
+    asyncio.run(scenario())
+
+
+def test_delta_evaluation_only_asks_new_pairs(db, monkeypatch):
+    calls = []
+    original_ask = main.ModelAgent.ask
+
+    def counting_ask(self, question, options):
+        calls.append(self.model_id)
+        return original_ask(self, question, options)
+
+    monkeypatch.setattr(main.ModelAgent, "ask", counting_ask)
+    for i in range(4):
+        qdata = main.QuestionCreate(text=f"Q{i}?", options=["A", "B"], correct="A", ku="Networking")
+        main.create_question(qdata, token=config.ACCESS_TOKEN, db=db)
+    for name in ("m1", "m2"):
+        main.create_model(main.ModelCreate(name=name, type="local"), token=config.ACCESS_TOKEN, db=db)
+
+    base = main.create_evaluation(
+        main.EvaluationCreate(model_ids=[1], question_count=3, mode="auto", bypass_cache=True),
+        token=config.ACCESS_TOKEN,
+        db=db,
+    )
+    main.job_runner.wait(base.evaluation_id, timeout=5)
+    assert calls == [1, 1, 1]
+
+    calls.clear()
+    delta = main.create_evaluation(
+        main.EvaluationCreate(
+            model_ids=[1, 2],
+            question_count=4,
+            mode="auto",
+            bypass_cache=True,
+            base_evaluation_id=base.evaluation_id,
+        ),
+        token=config.ACCESS_TOKEN,
+        db=db,
+    )
+    assert delta.answered == 3
+    main.job_runner.wait(delta.evaluation_id, timeout=5)
+    assert sorted(calls) == [1, 2, 2, 2, 2]
+
+    from backend import models as db_models, storage
+
+    record = db.get(db_models.Evaluation, 2)
+    db.refresh(record)
+    base_record = db.get(db_models.Evaluation, 1)
+    assert record.base_id == 1
+    assert storage.question_order(db, record.id)[:3] == storage.question_order(db, base_record.id)
+    assert record.answered == 8
+    assert db.query(db_models.Answer).filter_by(evaluation_id=2).count() == 8
+    assert [m["total"] for m in record.results] == [4, 4]
+    assert record.details["reused"] == 3
+
+
+def test_interrupted_evaluation_resumes_from_checkpoint(db, monkeypatch):
+    from backend import models as db_models, storage
+
+    for i in range(3):
+        qdata = main.QuestionCreate(text=f"Q{i}?", options=["A", "B"], correct="A", ku="Networking")
+        main.create_question(qdata, token=config.ACCESS_TOKEN, db=db)
+    main.create_model(main.ModelCreate(name="m1", type="local"), token=config.ACCESS_TOKEN, db=db)
+    evaluation = main.create_evaluation(
+        main.EvaluationCreate(question_count=3, mode="auto"), token=config.ACCESS_TOKEN, db=db
+    )
+    main.job_runner.wait(evaluation.evaluation_id, timeout=5)
+
+    with pytest.raises(HTTPException) as exc:
+        main.resume_evaluation(evaluation.evaluation_id, token=config.ACCESS_TOKEN, db=db)
+    assert exc.value.status_code == 409
+
+    # Simulate a worker that died after checkpointing the first answer.
+    record = db.get(db_models.Evaluation, 1)
+    first = storage.question_order(db, record.id, limit=1)[0]
+    db.query(db_models.Answer).filter(db_models.Answer.question_id != first).delete()
+    record.status, record.answered, record.results = "running", 1, None
+    db.commit()
+
+    calls = []
+    original_ask = main.ModelAgent.ask
+
+    def counting_ask(self, question, options):
+        calls.append(question)
+        return original_ask(self, question, options)
+
+    monkeypatch.setattr(main.ModelAgent, "ask", counting_ask)
+    resumed = main.resume_evaluation(
+        evaluation.evaluation_id, bypass_cache=True, token=config.ACCESS_TOKEN, db=db
+    )
+    assert resumed.answered == 1
+    main.job_runner.wait(evaluation.evaluation_id, timeout=5)
+    assert len(calls) == 2
+
+    db.refresh(record)
+    assert record.status == "completed"
+    assert record.answered == 3
+    assert record.results[0]["correct"] == 3
+    assert db.query(db_models.Answer).count() == 3
+
+
+def test_model_limits_are_reported(db):
+    qdata = main.QuestionCreate(text="Q?", options=["A", "B"], correct="A", ku="Networking")
+    main.create_question(qdata, token=config.ACCESS_TOKEN, db=db)
+    mdata = main.ModelCreate(name="m1", type="local", requests_per_minute=600, max_concurrency=2)
+    model = main.create_model(mdata, token=config.ACCESS_TOKEN, db=db)
+    assert model.requests_per_minute == 600
+
+    evaluation = main.create_evaluation(
+        main.EvaluationCreate(question_count=1, mode="auto", bypass_cache=True),
+        token=config.ACCESS_TOKEN,
+        db=db,
+    )
+    assert evaluation.limits[0]["model_id"] == model.id
+    main.job_runner.wait(evaluation.evaluation_id, timeout=5)
+
+    state = main.get_model_limits(model.id, token=config.ACCESS_TOKEN, db=db)
+    assert state["requests"]["per_minute"] == 600
+    assert state["concurrency"]["max"] == 2
+    assert state["calls"] >= 1
+
     with pytest.raises(HTTPException) as exc:
-        main.get_evaluation_results("missing", token=config.ACCESS_TOKEN)
+        main.get_model_limits(999, token=config.ACCESS_TOKEN, db=db)
     assert exc.value.status_code == 404
 
 
+def test_failing_model_is_degraded_by_its_circuit_breaker(db, monkeypatch):
+    from backend.agents import BreakerRegistry, ModelAgent
+
+    class Down(ModelAgent):
+        def ask(self, question, options):
+            raise RuntimeError("provider down")
+
+    monkeypatch.setitem(main.adapters.ADAPTERS, "local", Down)
+    monkeypatch.setattr(main, "breakers", BreakerRegistry(on_change=main._queue_mark_model))
+    for i in range(12):
+        qdata = main.QuestionCreate(text=f"Q{i}?", options=["A", "B"], correct="A", ku="Networking")
+        main.create_question(qdata, token=config.ACCESS_TOKEN, db=db)
+    model = main.create_model(
+        main.ModelCreate(name="m1", type="local", replica_urls=["http://replica:8000"]),
+        token=config.ACCESS_TOKEN,
+        db=db,
+    )
+    assert model.status == "active" and model.replica_urls == ["http://replica:8000"]
+    evaluation = main.create_evaluation(
+        main.EvaluationCreate(question_count=12, mode="auto", bypass_cache=True, config={"limits": {"retry_backoff": 0}}),
+        token=config.ACCESS_TOKEN,
+        db=db,
+    )
+    main.job_runner.wait(evaluation.evaluation_id, timeout=5)
+    main.status_executor.submit(lambda: None).result(timeout=5)  # status writes are queued
+
+    [listed] = call_async(main.list_models, token=config.ACCESS_TOKEN)
+    assert listed.status == "degraded"
+    breaker = main.get_model_limits(model.id, token=config.ACCESS_TOKEN, db=db)["breaker"]
+    assert breaker["state"] == "open" and breaker["opened"] == 1 and breaker["rejected"] > 0
+
+
+def test_model_adapters_and_probe(db, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    from backend import stub_server
+    from backend.agents import adapters
+
+    monkeypatch.setattr(adapters, "_client", TestClient(stub_server.app))
+    with pytest.raises(HTTPException) as exc:
+        main.create_model(main.ModelCreate(name="x", type="unknown"), token=config.ACCESS_TOKEN, db=db)
+    assert exc.value.status_code == 422
+
+    local = main.create_model(main.ModelCreate(name="m1", type="local"), token=config.ACCESS_TOKEN, db=db)
+    remote = main.create_model(
+        main.ModelCreate(name="m2", type="openai", base_url="http://testserver/v1", model_name="stub"),
+        token=config.ACCESS_TOKEN,
+        db=db,
+    )
+    assert remote.base_url == "http://testserver/v1"
+    assert main.test_model(local.id, token=config.ACCESS_TOKEN, db=db)["status"] == "ok"
+    probe = main.test_model(remote.id, token=config.ACCESS_TOKEN, db=db)
+    assert probe["status"] == "ok" and probe["answer"] == "yes"
+    assert len(probe["latency_ms"]) == 3
+
+    main.create_question(
+        main.QuestionCreate(text="Q?", options=["A", "B"], correct="A", ku="Networking"),
+        token=config.ACCESS_TOKEN,
+        db=db,
+    )
+    evaluation = main.create_evaluation(
+        main.EvaluationCreate(question_count=1, mode="auto", bypass_cache=True),
+        token=config.ACCESS_TOKEN,
+        db=db,
+    )
+    main.job_runner.wait(evaluation.evaluation_id, timeout=5)
+    results = call_async(main.get_evaluation_results, evaluation.evaluation_id, token=config.ACCESS_TOKEN)
+    assert [m["correct"] for m in results.models] == [1, 1]
+
+
+def test_evaluation_reuses_cached_answers(db, monkeypatch):
+    calls = []
+
+    def counting_ask(self, question, options):
+        calls.append(question)
+        return options[0]
+
+    monkeypatch.setattr(main.ModelAgent, "ask", counting_ask)
+    for i in range(3):
+        qdata = main.QuestionCreate(text=f"Q{i}?", options=["A", "B"], correct="A", ku="Networking")
+        main.create_question(qdata, token=config.ACCESS_TOKEN, db=db)
+    main.create_model(main.ModelCreate(name="m1", type="local"), token=config.ACCESS_TOKEN, db=db)
+
+    def run(**kwargs):
+        data = main.EvaluationCreate(question_count=3, mode="auto", **kwargs)
+        evaluation = main.create_evaluation(data, token=config.ACCESS_TOKEN, db=db)
+        main.job_runner.wait(evaluation.evaluation_id, timeout=5)
+        return call_async(main.get_evaluation_results, evaluation.evaluation_id, token=config.ACCESS_TOKEN)
+
+    assert run().cache == {"hits": 0, "misses": 3}
+    second = run()
+    assert second.cache == {"hits": 3, "misses": 0}
+    assert second.models[0]["correct"] == 3
+    assert len(calls) == 3
+    assert run(bypass_cache=True).cache == {"hits": 0, "misses": 3}
+    assert len(calls) == 6
+
+
+def test_sampling_is_stratified_and_reproducible(db):
+    from backend import models as db_models, sampling
+
+    rows = [db_models.Question(text=f"N{i}", options=["A"], correct="A", ku="Networking") for i in range(60)]
+    rows += [db_models.Question(text=f"C{i}", options=["A"], correct="A", ku="Cryptography") for i in range(30)]
+    rows += [db_models.Question(text=f"T{i}", options=["A"], correct="A", ku="Threat Analysis") for i in range(10)]
+    db.add_all(rows)
+    db.commit()
+
+    index = sampling.QuestionIdIndex()
+    sampler = sampling.QuestionSampler(index)
+    first = sampler.sample(db, 20, seed=7)
+    assert [q.id for q in first] == sampler.sample_ids(db, 20, seed=7)
+    assert [q.id for q in first] != sampler.sample_ids(db, 20, seed=8)
+    kus = [q.ku for q in first]
+    assert (kus.count("Networking"), kus.count("Cryptography"), kus.count("Threat Analysis")) == (12, 6, 2)
+    assert len(set(q.id for q in first)) == 20
+
+    scoped = sampler.sample(db, 100, seed=1, scope=["Cryptography", "Threat Analysis"])
+    assert len(scoped) == 40
+    assert {q.ku for q in scoped} == {"Cryptography", "Threat Analysis"}
+
+    equal = sampling.QuestionSampler(index, allocation="equal").sample(db, 30, seed=3)
+    assert sorted(q.ku for q in equal).count("Threat Analysis") == 10
+
+
+def test_create_question_rejects_duplicate_content(db):
+    qdata = main.QuestionCreate(text="Sample?", options=["yes", "no"], correct="yes", ku="Networking")
+    main.create_question(qdata, token=config.ACCESS_TOKEN, db=db)
+    again = main.QuestionCreate(text="  sample? ", options=["Yes", "no"], correct="Yes", ku="Networking")
+    with pytest.raises(HTTPException) as exc:
+        main.create_question(again, token=config.ACCESS_TOKEN, db=db)
+    assert exc.value.status_code == 409
+
+
+def test_bulk_import_file_dedups_and_reports(db):
+    from backend import database, importer, models as db_models
+
+    lines = [
+        '{"text": "Q1", "options": ["A", "B"], "correct": "A", "ku": "Networking"}',
+        "",
+        '{"text": "q1", "options": ["a", "b"], "correct": "a", "ku": "Networking"}',
+        '{"text": "Q2", "options": ["A", "B"], "correct": "C", "ku": "Networking"}',
+        "not json",
+        '{"text": "Q3", "options": ["A", "B"], "correct": "B", "ku": "Cryptography"}',
+    ]
+    bulk = importer.QuestionImporter(database.SessionLocal, chunk_size=2)
+    report = bulk.import_rows(importer.iter_jsonl(lines))
+    assert (report.inserted, report.duplicates, report.invalid) == (2, 1, 2)
+    assert [e["line"] for e in report.errors] == [4, 5]
+
+    csv_lines = ["text,options,correct,ku\n", "Q3,A|B,B,Cryptography\n", 'Q4,"[""X"", ""Y""]",Y,Networking\n']
+    report = importer.QuestionImporter(database.SessionLocal).import_rows(importer.iter_csv(csv_lines))
+    assert (report.inserted, report.duplicates, report.invalid) == (1, 1, 0)
+    assert db.query(db_models.Question).filter_by(text="Q4").one().options == ["X", "Y"]
+
+
+def test_bulk_import_endpoint():
+    from fastapi.testclient import TestClient
+
+    client = TestClient(main.app)
+    headers = {"Authorization": f"Bearer {config.ACCESS_TOKEN}"}
+    body = "\n".join(
+        '{"text": "Q%d", "options": ["A", "B"], "correct": "A", "ku": "Networking"}' % i
+        for i in range(10)
+    )
+    resp = client.post(
+        "/questions/import?chunk_size=3",
+        content=body.encode(),
+        headers={**headers, "Content-Type": "application/x-ndjson"},
+    )
+    assert resp.status_code == 200
+    assert resp.json()["inserted"] == 10
+
+    csv_body = b"text,options,correct,ku\nQ0,A|B,A,Networking\nNew,A|B,B,Cryptography\n"
+    resp = client.post(
+        "/questions/import",
+        files={"file": ("bank.csv", csv_body, "text/csv")},
+        headers=headers,
+    )
+    assert resp.status_code == 200
+    assert resp.json() == {"inserted": 1, "duplicates": 1, "similar": 0, "invalid": 0, "errors": []}
+
+
+def test_near_duplicate_clusters_imports_and_sampling(db):
+    from fastapi.testclient import TestClient
+
+    def create(text, options=("TCP", "UDP", "ICMP", "ARP")):
+        q = main.QuestionCreate(text=text, options=list(options), correct=options[0], ku="Networking")
+        return main.create_question(q, token=config.ACCESS_TOKEN, db=db).id
+
+    a = create("Which transport protocol provides reliable ordered delivery of a byte stream?")
+    b = create("Which transport protocol provides reliable, ordered delivery of a byte stream")
+    c = create("What is the capital city of France and its largest city?", ("Paris", "Lyon", "Nice", "Lille"))
+    d = create("Which transport protocol provides reliable ordered delivery of a byte-stream?")
+
+    found = main.list_duplicate_questions(token=config.ACCESS_TOKEN, db=db)
+    assert found["clusters"] == [{"ids": [a, b, d], "keep": a}]
+    assert (found["questions"], found["redundant"]) == (4, 2)
+    assert main.curation.review({"text": "Capital city of France?", "options": ["Paris"]})["status"] == "ok"
+
+    main.delete_question(b, token=config.ACCESS_TOKEN, db=db)
+    assert main.list_duplicate_questions(token=config.ACCESS_TOKEN, db=db)["clusters"][0]["ids"] == [a, d]
+
+    # Only the oldest question of the cluster is drawn.
+    evaluation = main.create_evaluation(
+        main.EvaluationCreate(question_count=10, mode="auto", skip_duplicates=True),
+        token=config.ACCESS_TOKEN,
+        db=db,
+    )
+    main.job_runner.wait(evaluation.evaluation_id, timeout=5)
+    assert evaluation.question_count == 2
+
+    client = TestClient(main.app)
+    body = "\n".join(
+        json.dumps({"text": text, "options": ["TCP", "UDP", "ICMP", "ARP"], "correct": "TCP", "ku": "Networking"})
+        for text in (
+            "Which transport protocol provides reliable ordered delivery of a byte stream?",
+            "which transport protocol provides reliable ordered delivery of a byte stream !",
+            "Which protocol resolves IPv4 addresses to MAC addresses on a local network?",
+            "Which protocol resolves IPv4 addresses to MAC addresses on a local network segment?",
+        )
+    )
+    resp = client.post(
+        "/questions/import?reject_similar=true",
+        content=body.encode(),
+        headers={"Authorization": f"Bearer {config.ACCESS_TOKEN}", "Content-Type": "application/x-ndjson"},
+    )
+    report = resp.json()
+    assert (report["inserted"], report["duplicates"], report["similar"]) == (1, 1, 2)
+    # Inserted rows join the index.
+    assert len(main.curation.index) == 4
+
+
+def test_list_questions_keyset_pagination_and_ndjson(db):
+    from fastapi.testclient import TestClient
+
+    for i in range(7):
+        ku = "Networking" if i % 2 else "Cryptography"
+        qdata = main.QuestionCreate(text=f"Q{i}?", options=["A", "B"], correct="A", ku=ku)
+        main.create_question(qdata, token=config.ACCESS_TOKEN, db=db)
+
+    page = call_async(main.list_questions, Response(), limit=2, token=config.ACCESS_TOKEN)
+    assert [q.id for q in page] == [1, 2]
+    page = call_async(main.list_questions, Response(), limit=2, after_id=page[-1].id, token=config.ACCESS_TOKEN)
+    assert [q.id for q in page] == [3, 4]
+    page = call_async(
+        main.list_questions, Response(), ku="Networking", limit=100, after_id=2, token=config.ACCESS_TOKEN
+    )
+    assert [q.id for q in page] == [4, 6]
+
+    client = TestClient(main.app)
+    headers = {"Authorization": f"Bearer {config.ACCESS_TOKEN}"}
+    resp = client.get("/questions?limit=3", headers=headers)
+    assert resp.headers["X-Next-Cursor"] == "3"
+    resp = client.get("/questions?after_id=6", headers=headers)
+    assert "X-Next-Cursor" not in resp.headers
+    assert client.get("/questions?limit=0", headers=headers).status_code == 422
+
+    resp = client.get("/questions?format=ndjson&after_id=2", headers=headers)
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in resp.text.splitlines()]
+    assert [r["id"] for r in rows] == [3, 4, 5, 6, 7]
+    assert rows[0]["options"] == ["A", "B"]
+
+
+def test_database_engines_use_wal_and_async_drivers(db):
+    import os
+
+    from sqlalchemy import event, text
+
+    from backend import database, metrics
+
+    assert db.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+    assert db.execute(text("PRAGMA busy_timeout")).scalar() == database.SQLITE_BUSY_TIMEOUT
+
+    async def async_pragma():
+        async with database.AsyncSessionLocal() as session:
+            return (await session.execute(text("PRAGMA journal_mode"))).scalar()
+
+    assert asyncio.run(async_pragma()) == "wal"
+    # The async engine is instrumented when it is created on first use.
+    async_engine = database.get_async_engine().sync_engine
+    assert event.contains(async_engine, "before_cursor_execute", metrics._before_cursor_execute)
+    assert database.async_database_url("sqlite:///./axiom.db") == "sqlite+aiosqlite:///./axiom.db"
+    assert database.async_database_url("postgresql+psycopg2://u@h/db") == "postgresql+asyncpg://u@h/db"
+    assert "pool_size" not in database.engine_options("sqlite://")
+    assert database.engine_options("postgresql://u@h/db")["pool_size"] == database.DB_POOL_SIZE
+
+    assert database.data_directory("sqlite:////srv/axiom/axiom.db") == "/srv/axiom"
+    assert database.data_directory("sqlite:///data/axiom.db") == os.path.abspath("data")
+    assert database.data_directory("sqlite://") == os.path.abspath(".")
+    cache = main.get_answer_cache()
+    assert cache is main.get_answer_cache()  # opened once
+    assert os.path.dirname(cache.path) == database.DATA_DIR
+
+
+# Schema of the first release, before any of the upgrades in ``migrations``.
+BASELINE_SCHEMA = [
+    "CREATE TABLE questions (id INTEGER NOT NULL, text TEXT NOT NULL, options JSON, "
+    "correct VARCHAR NOT NULL, ku VARCHAR NOT NULL, PRIMARY KEY (id))",
+    "CREATE INDEX ix_questions_id ON questions (id)",
+    "CREATE TABLE models (id INTEGER NOT NULL, name VARCHAR NOT NULL, type VARCHAR NOT NULL, "
+    "status VARCHAR NOT NULL, api_key VARCHAR, model_name VARCHAR, PRIMARY KEY (id))",
+    "CREATE INDEX ix_models_id ON models (id)",
+]
+
+
+def test_upgrade_brings_a_baseline_database_up_to_date(tmp_path):
+    from sqlalchemy import create_engine, inspect, text
+
+    from backend import importer, migrations
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'baseline.db'}")
+    with engine.begin() as conn:
+        for statement in BASELINE_SCHEMA:
+            conn.execute(text(statement))
+        for question in ("Q?", "Other?", "  q? "):
+            conn.execute(
+                text("INSERT INTO questions (text, options, correct, ku) VALUES (:t, :o, 'a', 'Networking')"),
+                {"t": question, "o": json.dumps(["a", "b"])},
+            )
+
+    steps = migrations.upgrade(engine)
+
+    assert "backfill questions.content_hash" in steps
+    schema = inspect(engine)
+    indexes = {i["name"]: i for i in schema.get_indexes("questions")}
+    assert "ix_questions_ku_id" in indexes
+    assert indexes["ix_questions_content_hash"]["unique"]
+    assert {"evaluations", "answers", "benchmarks"} <= set(schema.get_table_names())
+    model_columns = {c["name"] for c in schema.get_columns("models")}
+    assert {
+        "requests_per_minute", "tokens_per_minute", "max_concurrency", "base_url", "replica_urls"
+    } <= model_columns
+    with engine.connect() as conn:
+        hashes = conn.execute(text("SELECT content_hash FROM questions ORDER BY id")).scalars().all()
+    # The later copy of duplicated content keeps NULL so the index is unique.
+    assert hashes == [importer.content_hash("Q?", ["a", "b"]), importer.content_hash("Other?", ["a", "b"]), None]
+    # Running it again on the upgraded database changes nothing.
+    assert migrations.upgrade(engine) == []
+    engine.dispose()
+
+
+def test_benchmark_harness_reports_and_flags_regressions():
+    from benchmarks import harness
+
+    profile = harness.LatencyProfile.parse("fixed:0.001", error_rate=0.1)
+    scenarios = harness.grid(["agent", "api"], [2], [10], [4], [2])
+    report = harness.run(scenarios, profile, seed=1)
+
+    agent = report["scenarios"]["agent-m2-q10-c4-p2"]
+    api = report["scenarios"]["api-m2-q10-c4-p2"]
+    assert agent["answers"] == api["answers"] == 20
+    assert agent["calls"] > 20  # injected failures are retried
+    assert agent["p50_ms"] >= 1.0 and agent["throughput"] > 0
+    assert api["db_statements"] > 0 and api["db_seconds"] > 0
+    # Each scenario runs in its own process; in-process runs omit the peak.
+    assert agent["peak_rss_mb"] > 0 and api["peak_rss_mb"] > 0
+    in_process = harness.run(scenarios[:1], profile, seed=1, isolate=False)
+    assert "peak_rss_mb" not in in_process["scenarios"]["agent-m2-q10-c4-p2"]
+
+    assert harness.compare(report, report) == []
+    slower = json.loads(json.dumps(report))
+    slower["scenarios"]["agent-m2-q10-c4-p2"]["throughput"] = agent["throughput"] / 2
+    regressions = harness.compare(slower, report, threshold=0.25)
+    assert [(r["scenario"], r["metric"]) for r in regressions] == [("agent-m2-q10-c4-p2", "throughput")]
+
+
+def test_metrics_endpoint(db):
+    from fastapi.testclient import TestClient
+
+    main.create_question(
+        main.QuestionCreate(text="Q?", options=["A", "B"], correct="A", ku="Networking"),
+        token=config.ACCESS_TOKEN,
+        db=db,
+    )
+    main.create_model(main.ModelCreate(name="m1", type="local"), token=config.ACCESS_TOKEN, db=db)
+    evaluation = main.create_evaluation(
+        main.EvaluationCreate(question_count=1, mode="auto"), token=config.ACCESS_TOKEN, db=db
+    )
+    main.job_runner.wait(evaluation.evaluation_id, timeout=5)
+
+    client = TestClient(main.app)
+    client.get("/evaluations/ev1/status", headers={"Authorization": f"Bearer {config.ACCESS_TOKEN}"})
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain")
+    text = resp.text
+    assert 'axiom_http_request_seconds_count{method="GET",route="/evaluations/{evaluation_id}/status",status="200"}' in text
+    assert 'axiom_answers_total{model="1"}' in text
+    assert 'axiom_db_query_seconds_count{statement="INSERT"}' in text
+    assert 'axiom_evaluations{status="running"} 0' in text
+    assert "# TYPE axiom_model_ask_seconds histogram" in text
+
+
+def test_profiled_evaluation_stores_stages_and_cpu_profile(db, monkeypatch):
+    from backend.agents import ModelAgent
+
+    class Busy(ModelAgent):
+        def ask(self, question, options):
+            sum(i * i for i in range(200000))
+            return options[0]
+
+    monkeypatch.setitem(main.adapters.ADAPTERS, "local", Busy)
+    monkeypatch.setattr(config, "PROFILE_INTERVAL", 0.001)
+    for i in range(20):
+        main.create_question(
+            main.QuestionCreate(text=f"Q{i}?", options=["A", "B"], correct="A", ku="Networking"),
+            token=config.ACCESS_TOKEN,
+            db=db,
+        )
+    main.create_model(main.ModelCreate(name="m1", type="local"), token=config.ACCESS_TOKEN, db=db)
+    evaluation = main.create_evaluation(
+        main.EvaluationCreate(question_count=20, mode="auto", profile=True),
+        token=config.ACCESS_TOKEN,
+        db=db,
+    )
+    assert evaluation.trace_id
+    main.job_runner.wait(evaluation.evaluation_id, timeout=10)
+
+    results = call_async(main.get_evaluation_results, evaluation.evaluation_id, token=config.ACCESS_TOKEN)
+    profile = results.profile
+    assert profile["trace_id"] == evaluation.trace_id
+    for stage in ("select_questions", "load_models", "persist", "model_calls", "scoring", "write_results"):
+        assert stage in profile["stages"]
+    assert profile["stages"]["model.ask"]["count"] == 20
+    assert profile["cpu"]["samples"] > 0
+    assert any("test_backend.py" in f["function"] for f in profile["cpu"]["functions"])
+
+    trace = call_async(main.get_evaluation_trace, evaluation.evaluation_id, token=config.ACCESS_TOKEN)
+    names = {s["name"] for s in trace["spans"]}
+    assert {"create_evaluation", "evaluation", "model.ask"} <= names
+    assert trace["profile"] == profile
+
+    # Without the flag nothing is profiled.
+    plain = main.create_evaluation(
+        main.EvaluationCreate(question_count=1, mode="auto"), token=config.ACCESS_TOKEN, db=db
+    )
+    main.job_runner.wait(plain.evaluation_id, timeout=5)
+    assert call_async(main.get_evaluation_results, plain.evaluation_id, token=config.ACCESS_TOKEN).profile is None
+
+
+def test_peer_evaluation_reports_grading_matrix(db):
+    for i in range(3):
+        main.create_question(
+            main.QuestionCreate(text=f"Q{i}?", options=["A", "B"], correct="A", ku="Networking"),
+            token=config.ACCESS_TOKEN,
+            db=db,
+        )
+    for name in ("m1", "m2"):
+        main.create_model(main.ModelCreate(name=name, type="local"), token=config.ACCESS_TOKEN, db=db)
+    evaluation = main.create_evaluation(
+        main.EvaluationCreate(question_count=3, mode="peer", bypass_cache=True),
+        token=config.ACCESS_TOKEN,
+        db=db,
+    )
+    main.job_runner.wait(evaluation.evaluation_id, timeout=10)
+    status = call_async(main.get_evaluation_status, evaluation.evaluation_id, token=config.ACCESS_TOKEN)
+    assert status.answered == 6
+
+    peer = call_async(main.get_evaluation_results, evaluation.evaluation_id, token=config.ACCESS_TOKEN).peer
+    # Both local models answer "A", so each question has one answer to grade.
+    assert peer["kus"] == ["Networking"] and peer["items"] == 3 and peer["grader_calls"] == 6
+    assert peer["judged"] == [[[3, 3], [3, 3]]]
+    assert peer["approval"] == [[1.0, 1.0], [1.0, 1.0]]
+
+
+def test_adaptive_evaluation_reports_stopping_and_savings(db):
+    for i in range(60):
+        main.create_question(
+            main.QuestionCreate(text=f"Q{i}?", options=["A", "B"], correct="A", ku="Networking"),
+            token=config.ACCESS_TOKEN,
+            db=db,
+        )
+    for name in ("m1", "m2"):
+        main.create_model(main.ModelCreate(name=name, type="local"), token=config.ACCESS_TOKEN, db=db)
+    stopping = {"adaptive_precision": 0.1, "adaptive_confidence": 0.9, "adaptive_min_samples": 10}
+    with pytest.raises(HTTPException) as exc:
+        main.create_evaluation(
+            main.EvaluationCreate(
+                question_count=60, mode="adaptive", config={"evaluation": {"adaptive_rule": "sometimes"}}
+            ),
+            token=config.ACCESS_TOKEN,
+            db=db,
+        )
+    assert exc.value.status_code == 422
+    evaluation = main.create_evaluation(
+        main.EvaluationCreate(question_count=60, mode="adaptive", bypass_cache=True, config={"evaluation": stopping}),
+        token=config.ACCESS_TOKEN,
+        db=db,
+    )
+    main.job_runner.wait(evaluation.evaluation_id, timeout=10)
+    status = call_async(main.get_evaluation_status, evaluation.evaluation_id, token=config.ACCESS_TOKEN)
+    assert status.status == "completed" and status.total == 120
+
+    result = call_async(main.get_evaluation_results, evaluation.evaluation_id, token=config.ACCESS_TOKEN)
+    adaptive = result.adaptive
+    assert adaptive["precision"] == 0.1 and adaptive["pairs"] == 120
+    assert adaptive["asked"] == status.answered < 120 and adaptive["saved"] == 120 - status.answered
+    for model in adaptive["models"]:
+        assert model["accuracy"] == 1.0 and model["kus"]["Networking"]["stopped"] == "precision"
+
+
+def test_benchmark_runs_and_correlation(db, monkeypatch, tmp_path):
+    from backend.agents import ModelAgent
+
+    class Skilled(ModelAgent):
+        # Model n knows the answer to every n-th question.
+        def ask(self, question, options):
+            n = int(question.strip("Q?")) if question.startswith("Q") else 0
+            return options[0] if n % self.model_id == 0 else options[1]
+
+    monkeypatch.setitem(main.adapters.ADAPTERS, "local", Skilled)
+    monkeypatch.setattr(config, "BENCHMARK_DIR", str(tmp_path))
+    monkeypatch.setattr(config, "BENCHMARK_PROCESSES", 1)
+    monkeypatch.setattr(config, "BENCHMARK_CHECKPOINT_DIR", str(tmp_path / "ck"))
+    with open(tmp_path / "suite.jsonl", "w") as fh:
+        for i in range(60):
+            fh.write(json.dumps({"id": i, "question": f"Q{i}?", "options": ["a", "b"], "answer": "A"}) + "\n")
+    for i in range(12):
+        main.create_question(
+            main.QuestionCreate(text=f"Q{i}?", options=["A", "B"], correct="A", ku="Networking"),
+            token=config.ACCESS_TOKEN,
+            db=db,
+        )
+    for name in ("m1", "m2", "m3"):
+        main.create_model(main.ModelCreate(name=name, type="local"), token=config.ACCESS_TOKEN, db=db)
+
+    with pytest.raises(HTTPException) as exc:
+        main.create_benchmark(main.BenchmarkCreate(name="x", path="../etc/passwd"), token=config.ACCESS_TOKEN, db=db)
+    assert exc.value.status_code == 422
+    bench = main.create_benchmark(main.BenchmarkCreate(name="suite", path="suite.jsonl"), token=config.ACCESS_TOKEN, db=db)
+    assert [b.name for b in main.list_benchmarks(token=config.ACCESS_TOKEN, db=db)] == ["suite"]
+
+    runs = main.run_benchmark(bench.id, main.BenchmarkRunCreate(), token=config.ACCESS_TOKEN, db=db)
+    assert [r.status for r in runs] == ["queued"] * 3
+    main.benchmark_executor.submit(lambda: None).result(timeout=10)  # runs are serialized
+
+    evaluation = main.create_evaluation(
+        main.EvaluationCreate(question_count=12, mode="auto", benchmark_id=bench.id),
+        token=config.ACCESS_TOKEN,
+        db=db,
+    )
+    main.job_runner.wait(evaluation.evaluation_id, timeout=5)
+
+    db.expire_all()
+    results = main.get_benchmark_results(bench.id, token=config.ACCESS_TOKEN, db=db)
+    assert [r.status for r in results["runs"]] == ["completed"] * 3
+    assert results["runs"][0].accuracy == 1.0 and results["runs"][0].score == 1.0
+    assert results["runs"][1].accuracy == 0.5
+    assert results["correlation"]["n"] == 3
+    assert results["correlation"]["spearman"] == 1.0
+
+    evaluation_results = call_async(main.get_evaluation_results, evaluation.evaluation_id, token=config.ACCESS_TOKEN)
+    assert evaluation_results.benchmark["correlation"]["spearman"] == 1.0
+
+    with pytest.raises(HTTPException) as exc:
+        main.create_evaluation(
+            main.EvaluationCreate(question_count=1, mode="auto", benchmark_id=99), token=config.ACCESS_TOKEN, db=db
+        )
+    assert exc.value.status_code == 404
+
+
+def test_evaluation_export_streams_csv_tables(db):
+    import csv
+    import gzip
+    from fastapi.testclient import TestClient
+
+    for i in range(6):
+        main.create_question(
+            main.QuestionCreate(text=f"Q{i}?", options=["A", "B"], correct="A" if i % 2 else "B", ku=["Net", "Crypto"][i % 2]),
+            token=config.ACCESS_TOKEN,
+            db=db,
+        )
+    for name in ("m1", "m2"):
+        main.create_model(main.ModelCreate(name=name, type="local"), token=config.ACCESS_TOKEN, db=db)
+    evaluation = main.create_evaluation(
+        main.EvaluationCreate(question_count=6, mode="auto"), token=config.ACCESS_TOKEN, db=db
+    )
+    main.job_runner.wait(evaluation.evaluation_id, timeout=5)
+
+    client = TestClient(main.app)
+    headers = {"Authorization": f"Bearer {config.ACCESS_TOKEN}"}
+    url = f"/evaluations/{evaluation.evaluation_id}/export"
+    resp = client.get(url, params={"chunk_size": 5}, headers=headers)
+    assert resp.status_code == 200 and resp.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(resp.text.splitlines()))
+    assert len(rows) == 12 and rows[0]["model_name"] in ("m1", "m2")
+    assert sum(r["correct"] == "True" for r in rows) == 6
+    assert all(r["correct"] == str(r["answer"] == r["correct_answer"]) for r in rows)
+
+    resp = client.get(url, params={"table": "models", "compression": "gzip"}, headers=headers)
+    assert f'{evaluation.evaluation_id}-models.csv.gz' in resp.headers["content-disposition"]
+    models = list(csv.DictReader(gzip.decompress(resp.content).decode().splitlines()))
+    assert [(m["model_name"], m["accuracy"], m["accuracy[Net]"]) for m in models] == [
+        ("m1", "0.5", "0.0"),
+        ("m2", "0.5", "0.0"),
+    ]
+
+    assert client.get(url, params={"format": "xml"}, headers=headers).status_code == 422
+    assert client.get("/evaluations/ev999/export", headers=headers).status_code == 404
+
+
 def test_list_kus():
     kus = main.list_kus(token=config.ACCESS_TOKEN)
     assert kus == main._kus